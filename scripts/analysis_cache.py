@@ -0,0 +1,97 @@
+"""
+Persistent cache of post analysis results (recover_autopost.py).
+
+Maps (post id, sha256 of content.rendered, heuristic key) -> result, where the
+result is the should_fix_post flags plus the numbers the scan logs (words,
+images, plain title). The heuristic key is built by the caller from everything
+the flags depend on besides the content: HEURISTIC_VERSION, MIN_WORDS,
+TITLE_MATCH_MIN, the category's image target and the title. Any change there
+is a miss, so bumping a threshold re-analyzes exactly the affected posts.
+
+One row per post (an old content version is never looked up again); rows are
+evicted least-recently-used when the table grows past ANALYSIS_CACHE_MAX.
+
+File: $STATE_DIR/analysis_cache.sqlite (default state/analysis_cache.sqlite)
+
+Optional ENV:
+  ANALYSIS_CACHE=1|0        (default 1)
+  ANALYSIS_CACHE_PATH=      explicit sqlite path
+  ANALYSIS_CACHE_MAX=20000  max rows kept
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Optional
+
+STATE_DIR = os.environ.get("STATE_DIR", "state").strip() or "state"
+ANALYSIS_CACHE_PATH = (os.environ.get("ANALYSIS_CACHE_PATH", "").strip()
+                       or os.path.join(STATE_DIR, "analysis_cache.sqlite"))
+ANALYSIS_CACHE_MAX = int(os.environ.get("ANALYSIS_CACHE_MAX", "20000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis (
+    post_id INTEGER PRIMARY KEY,
+    content_sha TEXT NOT NULL,
+    hkey TEXT NOT NULL,
+    result TEXT NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_used ON analysis(used_at);
+"""
+
+
+def content_sha(content_html: str) -> str:
+    return hashlib.sha256((content_html or "").encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, path: str = ANALYSIS_CACHE_PATH, max_entries: int = ANALYSIS_CACHE_MAX,
+                 read: bool = True):
+        self.path = path
+        self.max_entries = max(max_entries, 1)
+        self.read = read  # False: recompute everything but still store (FULL_RESCAN)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, pid: int, sha: str, hkey: str) -> Optional[dict]:
+        if self.read:
+            row = self.db.execute(
+                "SELECT result FROM analysis WHERE post_id=? AND content_sha=? AND hkey=?",
+                (pid, sha, hkey),
+            ).fetchone()
+            if row:
+                self.hits += 1
+                self.db.execute("UPDATE analysis SET used_at=? WHERE post_id=?", (time.time(), pid))
+                return json.loads(row[0])
+        self.misses += 1
+        return None
+
+    def put(self, pid: int, sha: str, hkey: str, result: dict) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO analysis(post_id, content_sha, hkey, result, used_at) VALUES(?, ?, ?, ?, ?)",
+            (pid, sha, hkey, json.dumps(result, ensure_ascii=False), time.time()),
+        )
+
+    def _evict(self) -> int:
+        n = self.db.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+        extra = n - self.max_entries
+        if extra <= 0:
+            return 0
+        self.db.execute(
+            "DELETE FROM analysis WHERE post_id IN (SELECT post_id FROM analysis ORDER BY used_at LIMIT ?)",
+            (extra,),
+        )
+        return extra
+
+    def close(self) -> None:
+        evicted = self._evict()
+        self.db.commit()
+        n = self.db.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+        self.db.close()
+        print(f"[CACHE] analysis hits={self.hits} misses={self.misses} evicted={evicted} rows={n}")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for the recovery-scan analysis pool (post_analysis.AnalysisPool).
+
+Runs judge_content over a synthetic corpus (long comparison articles with big
+tables, short stubs, plain posts) with 1..N worker processes through
+ordered_results, checks that every worker count gives the same results in the
+same order, and prints time / speedup per worker count.
+
+Usage:
+  python scripts/bench_analysis_pool.py
+  BENCH_POSTS=2000 BENCH_WORKERS=1,2,4,8 python scripts/bench_analysis_pool.py
+"""
+
+import os
+import random
+import time
+
+from bench_price_scrub import comparison_article  # sets dummy env
+from post_analysis import AnalysisPool, judge_content, ordered_results
+
+BENCH_POSTS = int(os.environ.get("BENCH_POSTS", "400"))
+BENCH_WORKERS = [int(x) for x in os.environ.get(
+    "BENCH_WORKERS", ",".join(str(n) for n in sorted({1, 2, os.cpu_count() or 1}))).split(",") if x.strip()]
+
+
+def corpus(n: int):
+    rnd = random.Random(1234)
+    posts = []
+    for i in range(n):
+        kind = rnd.random()
+        if kind < 0.15:
+            body = "<p>Save or print checklist</p>"
+        elif kind < 0.6:
+            body = comparison_article(rnd, rnd.choice([30, 120, 400]))
+        else:
+            body = "".join(f"<h2>Part {k}</h2><p>{'tool workflow data ' * 60}</p><img src='x{k}.jpg'>" for k in range(6))
+        posts.append((f"Best AI workflow tools #{i}", body))
+    return posts
+
+
+def run(workers: int, posts):
+    items = ((i, judge_content, (title, body, 700, 0.25, 3)) for i, (title, body) in enumerate(posts))
+    with AnalysisPool(workers) as pool:
+        return [(k, r) for k, r in ordered_results(pool, items)]
+
+
+def main():
+    posts = corpus(BENCH_POSTS)
+    size_mb = sum(len(b) for _, b in posts) / 1e6
+    print(f"[BENCH] posts={len(posts)} size={size_mb:.1f}MB cpus={os.cpu_count()} workers={BENCH_WORKERS}")
+
+    base_t = None
+    base_out = None
+    for w in BENCH_WORKERS:
+        t0 = time.perf_counter()
+        out = run(w, posts)
+        dt = time.perf_counter() - t0
+        if base_out is None:
+            base_t, base_out = dt, out
+        same = out == base_out
+        print(f"[BENCH] workers={w:<3} time={dt:7.2f}s posts/s={len(posts) / dt:8.1f} "
+              f"speedup={base_t / dt:5.2f}x identical={same}")
+        if not same:
+            raise SystemExit(f"results differ with workers={w}")
+
+
+if __name__ == "__main__":
+    main()
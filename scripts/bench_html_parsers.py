@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Parse + serialize benchmark per HTML_PARSER backend (make_soup -> str(soup)).
+
+Corpus: synthetic long comparison articles with big tables (bench_price_scrub.py)
+plus every *.html under the given dirs (default: $BACKUP_DIR).
+
+Usage:
+  python scripts/bench_html_parsers.py [DIR ...]
+  BENCH_DOCS=40 BENCH_REPEAT=5 python scripts/bench_html_parsers.py backups
+"""
+
+import os
+import random
+import sys
+import time
+
+from bench_price_scrub import BENCH_REPEAT, BENCH_ROWS, BENCH_DOCS, comparison_article  # sets dummy env
+from check_html_pipeline import load_corpus
+
+from html_pipeline import PARSERS, check_parser, make_soup  # noqa: E402
+
+
+def best_of(fn, docs):
+    best = None
+    for _ in range(max(BENCH_REPEAT, 1)):
+        t0 = time.perf_counter()
+        for d in docs:
+            fn(d)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main(argv):
+    rnd = random.Random(7)
+    docs = [comparison_article(rnd, BENCH_ROWS) for _ in range(BENCH_DOCS)]
+    docs += [raw for _, raw in load_corpus(argv or [os.environ.get("BACKUP_DIR", "backups")])]
+    size_mb = sum(len(d) for d in docs) / 1e6
+    print(f"[BENCH] docs={len(docs)} size={size_mb:.2f}MB repeat={BENCH_REPEAT} (best of)")
+
+    base = None
+    for parser in PARSERS:
+        check_parser(parser)
+        soups = [make_soup(d, parser) for d in docs]
+        t_parse = best_of(lambda d: make_soup(d, parser), docs)
+        t_ser = best_of(str, soups)
+        total = t_parse + t_ser
+        base = base or total
+        print(f"[BENCH] {parser:<12} parse={t_parse * 1000:8.1f}ms serialize={t_ser * 1000:8.1f}ms "
+              f"total={total * 1000:8.1f}ms ({size_mb / max(total, 1e-9):.1f}MB/s, {base / max(total, 1e-9):.2f}x)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
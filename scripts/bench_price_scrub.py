@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark + equality check for the pricing scrubber.
+
+Compares the current strip_pricing of recover_autopost.py / wp_autopost_cluster.py
+(compiled patterns behind one combined gate regex, keyword alternations in the
+paragraph/row checks) with a verbatim copy of the previous implementation
+(re.sub per pattern per call, `any(k in t ...)` keyword loops).
+
+Corpus (timed separately): synthetic long comparison articles with big tables,
+price-free prose, and every *.html under the given dirs. All deterministic.
+
+Usage:
+  python scripts/bench_price_scrub.py [DIR ...]
+  BENCH_DOCS=40 BENCH_ROWS=300 BENCH_REPEAT=3 python scripts/bench_price_scrub.py
+
+Exit code 1 if any output differs.
+"""
+
+import glob
+import os
+import random
+import re
+import sys
+import time
+
+for k, v in {
+    "WP_BASE": "http://localhost.invalid", "WP_USER": "bench", "WP_PASS": "bench",
+    "OPENAI_API_KEY": "bench", "UNSPLASH_ACCESS_KEY": "", "WP_MIRROR": "0",
+}.items():
+    os.environ.setdefault(k, v)
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import recover_autopost as rec  # noqa: E402
+import wp_autopost_cluster as clu  # noqa: E402
+
+BENCH_DOCS = int(os.environ.get("BENCH_DOCS", "30"))
+BENCH_ROWS = int(os.environ.get("BENCH_ROWS", "200"))
+BENCH_REPEAT = int(os.environ.get("BENCH_REPEAT", "3"))
+# share of words replaced by a price-like token (generated posts rarely have any)
+BENCH_PRICE_RATE = float(os.environ.get("BENCH_PRICE_RATE", "0.01"))
+
+
+# -------------------------
+# previous implementation (reference)
+# -------------------------
+def legacy_regex(html_text: str, patterns) -> str:
+    for pat in patterns:
+        html_text = re.sub(pat, "", html_text, flags=re.IGNORECASE)
+    return html_text
+
+
+def legacy_recover_strip_pricing(html_text: str) -> str:
+    if not html_text:
+        return html_text
+
+    html_text = legacy_regex(html_text, rec.PRICE_PATTERNS)
+
+    soup = BeautifulSoup(html_text, "html.parser")
+
+    for p in list(soup.find_all(["p", "li"])):
+        t = p.get_text(" ", strip=True).lower()
+        if any(k in t for k in ["pricing", "price", "cost", "per month", "usd", "$", "krw", "원"]) and any(ch.isdigit() for ch in t):
+            p.decompose()
+
+    for table in soup.find_all("table"):
+        rows = table.find_all("tr")
+        if not rows:
+            continue
+        header_cells = rows[0].find_all(["th", "td"])
+        header_texts = [c.get_text(" ", strip=True).lower() for c in header_cells]
+        price_cols = [i for i, t in enumerate(header_texts) if any(k in t for k in ["price", "pricing", "cost", "plan"])]
+        if price_cols:
+            for tr in rows:
+                cells = tr.find_all(["th", "td"])
+                for idx in sorted(price_cols, reverse=True):
+                    if idx < len(cells):
+                        cells[idx].decompose()
+        for tr in list(table.find_all("tr")):
+            t = tr.get_text(" ", strip=True).lower()
+            if ("$" in t) or ("usd" in t) or ("/mo" in t) or ("per month" in t) or ("krw" in t):
+                tr.decompose()
+
+    return str(soup)
+
+
+# -------------------------
+# corpus
+# -------------------------
+WORDS = ("workflow automation team data model agent api setup review pilot tool "
+         "integration dashboard export sync report cost plan support from starting at").split()
+PRICES = ["$19", "$ 49.99", "USD 20", "USD1,200", "30 USD", "12 달러", "5,000원", "9900 KRW",
+          "from $5", "starting at $12.50", "Price: 30/mo", "pricing - see vendor<", "cost: 9", "²",
+          "US$5D 3", "uſd 7", "$USD 5 7", "from $$55", "PRICING:"]
+
+
+def sentence(rnd: random.Random, n: int) -> str:
+    out = []
+    for _ in range(n):
+        out.append(rnd.choice(PRICES) if rnd.random() < BENCH_PRICE_RATE else rnd.choice(WORDS))
+    return " ".join(out)
+
+
+def comparison_article(rnd: random.Random, rows: int) -> str:
+    parts = [f"<h2>{sentence(rnd, 5)}</h2>", f"<p>{sentence(rnd, 60)}</p>"]
+    for _ in range(3):
+        cols = rnd.sample(["Tool", "Best for", "Pricing", "Plan", "Cost", "Integrations", "Notes"], 5)
+        parts.append("<table><thead><tr>" + "".join(f"<th>{c}</th>" for c in cols) + "</tr></thead><tbody>")
+        for _ in range(rows // 3):
+            parts.append("<tr>" + "".join(f"<td>{sentence(rnd, 4)}</td>" for _ in cols) + "</tr>")
+        parts.append("</tbody></table>")
+        parts.append("<ul>" + "".join(f"<li>{sentence(rnd, 12)}</li>" for _ in range(8)) + "</ul>")
+        parts.append(f"<p>{sentence(rnd, 80)}</p>")
+    return "\n".join(parts)
+
+
+def load_corpus(dirs):
+    rnd = random.Random(20240601)
+    sets = {
+        "comparison": [comparison_article(rnd, BENCH_ROWS) for _ in range(BENCH_DOCS)],
+        # price-free prose: the common case for generated posts
+        "prose": [f"<p>{sentence(random.Random(i), 400).replace('$', '')}</p>" for i in range(BENCH_DOCS)],
+    }
+    files = []
+    for d in dirs:
+        for path in sorted(glob.glob(os.path.join(d, "**", "*.html"), recursive=True)):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                files.append(f.read())
+    if files:
+        sets["files"] = files
+    return sets
+
+
+def timed(fn, docs):
+    best = None
+    out = None
+    for _ in range(max(BENCH_REPEAT, 1)):
+        t0 = time.perf_counter()
+        out = [fn(d) for d in docs]
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best, out
+
+
+def main(argv):
+    sets = load_corpus(argv)
+    print(f"[BENCH] price_rate={BENCH_PRICE_RATE} rows={BENCH_ROWS} repeat={BENCH_REPEAT} (best of)")
+
+    cases = [
+        ("cluster regex", lambda d: legacy_regex(d, clu.PRICE_PATTERNS) if d else d, clu.strip_pricing),
+        ("recover regex", lambda d: legacy_regex(d, rec.PRICE_PATTERNS) if d else d, rec.scrub_price_text),
+        ("recover strip_pricing", legacy_recover_strip_pricing, rec.strip_pricing),
+    ]
+    bad = 0
+    for set_name, docs in sets.items():
+        size_mb = sum(len(d) for d in docs) / 1e6
+        print(f"[BENCH] corpus={set_name} docs={len(docs)} size={size_mb:.2f}MB")
+        for name, old_fn, new_fn in cases:
+            t_old, out_old = timed(old_fn, docs)
+            t_new, out_new = timed(new_fn, docs)
+            diff = sum(1 for a, b in zip(out_old, out_new) if a != b)
+            bad += diff
+            print(f"[BENCH]   {name:<22} legacy={t_old * 1000:8.1f}ms compiled={t_new * 1000:8.1f}ms "
+                  f"speedup={t_old / max(t_new, 1e-9):.2f}x diffs={diff}")
+    if bad:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Per-thumbnail benchmark + equality check for the cluster featured images.
+
+Compares, on a batch of BENCH_TITLES slot titles (default 14 = the two-week
+SLOTS_AHEAD_DAYS window):
+- legacy:   verbatim copy of the previous make_featured_image (everything redone per post)
+- renderer: thumbnail.ThumbnailRenderer (background decode/resize, static overlay
+            and fonts prepared once, only the text drawn per post)
+- pool:     thumbnail.ThumbnailPool.render_batch with THUMB_WORKERS processes
+            (pool startup included; first= is the time until the first JPEG is ready)
+All must produce the same JPEG bytes.
+
+Background: assets/thumbnail_bg.png, or the file given as the first argument.
+
+Usage:
+  python scripts/bench_thumbnails.py [BACKGROUND]
+  BENCH_TITLES=14 BENCH_REPEAT=3 THUMB_WORKERS=4 python scripts/bench_thumbnails.py
+
+Exit code 1 if any thumbnail differs.
+"""
+
+import io
+import os
+import sys
+import time
+
+for k, v in {
+    "WP_BASE": "http://localhost.invalid", "WP_USER": "bench", "WP_PASS": "bench",
+    "OPENAI_API_KEY": "bench", "UNSPLASH_ACCESS_KEY": "", "WP_MIRROR": "0",
+}.items():
+    os.environ.setdefault(k, v)
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+import thumbnail  # noqa: E402
+import wp_autopost_cluster as clu  # noqa: E402
+
+BENCH_TITLES = int(os.environ.get("BENCH_TITLES", "14"))
+BENCH_REPEAT = int(os.environ.get("BENCH_REPEAT", "3"))
+DEFAULT_BG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "thumbnail_bg.png")
+
+CATEGORIES = ["AI Tools", "Automation", "Marketing", "CRM", "Productivity", "Email Marketing", "Analytics"]
+
+
+# -------------------------
+# previous implementation (reference)
+# -------------------------
+def legacy_make_featured_image(bg_bytes: bytes, title: str, category: str) -> bytes:
+    base = Image.open(io.BytesIO(bg_bytes)).convert("RGBA")
+    base = base.resize((1200, 675))
+
+    overlay = Image.new("RGBA", base.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+
+    gold = (212, 175, 55, 220)
+    draw.line([(120, 90), (1080, 90)], fill=gold, width=3)
+    draw.line([(120, 585), (1080, 585)], fill=gold, width=3)
+
+    panel = (90, 140, 1110, 535)
+    draw.rounded_rectangle(panel, radius=28, fill=(0, 0, 0, 140), outline=(212, 175, 55, 140), width=2)
+
+    font_header = thumbnail.load_font(28)
+    font_title = thumbnail.load_font(56)
+    font_footer = thumbnail.load_font(24)
+
+    header = clu.HEADER_TEXT
+    footer_left = clu.SITE_BRAND
+    footer_right = (category or "").upper()
+
+    w = draw.textbbox((0, 0), header, font=font_header)[2]
+    draw.text(((1200 - w) / 2, 170), header, font=font_header, fill=gold)
+
+    lines = thumbnail.wrap_text(draw, title, font_title, 920)
+    y = 250
+    for line in lines[:3]:
+        w = draw.textbbox((0, 0), line, font=font_title)[2]
+        draw.text(((1200 - w) / 2, y), line, font=font_title, fill=(255, 255, 255, 235))
+        y += 70
+
+    draw.text((170, 500), footer_left, font=font_footer, fill=(255, 255, 255, 210))
+    if footer_right:
+        w = draw.textbbox((0, 0), footer_right, font=font_footer)[2]
+        draw.text((1200 - 170 - w, 500), footer_right, font=font_footer, fill=gold)
+
+    out = Image.alpha_composite(base, overlay).convert("RGB")
+    buf = io.BytesIO()
+    out.save(buf, format="JPEG", quality=92, optimize=True)
+    return buf.getvalue()
+
+
+# -------------------------
+# batch
+# -------------------------
+def slot_batch(n: int):
+    out = []
+    for i in range(n):
+        cat = CATEGORIES[i % len(CATEGORIES)]
+        if i % 3 == 2:
+            title = f"{cat}: Top Tools Compared — What to Choose in 2026"
+        else:
+            title = f"Best {cat} Tools (2026): A Practical Guide for Small Teams"
+        out.append((title, cat))
+    return out
+
+
+def timed(fn):
+    best = None
+    out = None
+    for _ in range(max(BENCH_REPEAT, 1)):
+        t0 = time.perf_counter()
+        out = fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best, out
+
+
+def main(argv):
+    path = argv[0] if argv else DEFAULT_BG
+    with open(path, "rb") as f:
+        bg_bytes = f.read()
+    batch = slot_batch(BENCH_TITLES)
+    with Image.open(io.BytesIO(bg_bytes)) as im:
+        print(f"[BENCH] background={os.path.basename(path)} {im.size[0]}x{im.size[1]} {len(bg_bytes) / 1e6:.2f}MB "
+              f"titles={len(batch)} repeat={BENCH_REPEAT} (best of)")
+
+    def legacy():
+        return [legacy_make_featured_image(bg_bytes, t, c) for t, c in batch]
+
+    def renderer():
+        r = thumbnail.ThumbnailRenderer(bg_bytes, clu.HEADER_TEXT, clu.SITE_BRAND)  # setup counted in the batch time
+        return [r.render(t, c) for t, c in batch]
+
+    first = []
+    peak = [0]
+
+    def pool():
+        out = [None] * len(batch)
+        t0 = time.perf_counter()
+        with thumbnail.ThumbnailPool(bg_bytes, clu.HEADER_TEXT, clu.SITE_BRAND) as p:
+            items = ((i, t, c) for i, (t, c) in enumerate(batch))
+            for n_done, (i, data, err) in enumerate(p.render_batch(items)):
+                if err is not None:
+                    raise err
+                if n_done == 0:
+                    first.append(time.perf_counter() - t0)
+                out[i] = data
+            peak[0] = p.max_in_flight
+        return out
+
+    n = max(len(batch), 1)
+    t_old, out_old = timed(legacy)
+    print(f"[BENCH] legacy   total={t_old * 1000:8.1f}ms per_thumb={t_old * 1000 / n:7.1f}ms")
+    bad = 0
+    for name, fn in (("renderer", renderer), ("pool", pool)):
+        t_new, out_new = timed(fn)
+        diff = sum(1 for a, b in zip(out_old, out_new) if a != b)
+        bad += diff
+        extra = ""
+        if name == "pool":
+            extra = f" workers={thumbnail.THUMB_WORKERS} first={min(first) * 1000:.1f}ms max_in_flight={peak[0]}"
+        print(f"[BENCH] {name:<8} total={t_new * 1000:8.1f}ms per_thumb={t_new * 1000 / n:7.1f}ms "
+              f"speedup={t_old / max(t_new, 1e-9):.2f}x diffs={diff}{extra}")
+    if bad:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
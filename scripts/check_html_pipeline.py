@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Golden check for html_pipeline: the single-parse pipelines used by
+regenerate_article (recover_autopost.py) and the cluster post flow
+(wp_autopost_cluster.py) must produce exactly the same bytes as chaining the
+old per-step functions (each of which parses + serializes on its own).
+
+The old functions are a frozen verbatim copy of the implementation before the
+pipeline (see "previous implementation" below), not the current wrappers in the
+scripts, so the check cannot end up comparing the new code with itself.
+
+Corpus: every *.html under the given dirs (default: $BACKUP_DIR, i.e. the
+original post HTML saved by recover runs) plus a few built-in samples that hit
+tables, pricing, fences, comments, <h1>, scripts, <br> runs and mixed <br>/<br/>
+(html.parser nests content in a <br> there, see html_pipeline.reparse_pass).
+Image search is replaced by a deterministic stub, so no network is used.
+
+Usage:
+  python scripts/check_html_pipeline.py [DIR ...]
+
+Exit code 1 if any document differs. Prints per-pass timing totals.
+"""
+
+import glob
+import html
+import os
+import re
+import sys
+import time
+
+# The scripts read their config at import time; give them harmless values.
+for k, v in {
+    "WP_BASE": "http://localhost.invalid", "WP_USER": "check", "WP_PASS": "check",
+    "OPENAI_API_KEY": "check", "UNSPLASH_ACCESS_KEY": "", "WP_MIRROR": "0",
+}.items():
+    os.environ.setdefault(k, v)
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bs4 import BeautifulSoup, Comment  # noqa: E402
+
+import recover_autopost as rec  # noqa: E402
+import wp_autopost_cluster as clu  # noqa: E402
+from html_pipeline import format_timing_totals  # noqa: E402
+
+SAMPLES = [
+    "",
+    "<p>Just text</p>",
+    "```html\n<h1>Title</h1>\n<p>Intro costs $49/mo or 5,000원.</p>\n```",
+    """<!-- wp:paragraph --><h2>Overview</h2><p>Starting at $19.99 per month</p>
+<table><tr><th>Tool</th><th>Pricing</th><th>Best for</th></tr>
+<tr><td>A</td><td>$10</td><td>Teams</td></tr><tr><td>B</td><td>USD 20</td><td>Solo</td></tr></table>
+<h3>Setup</h3><p>Use <a href="javascript:alert(1)">this</a> and <a target="_blank" href="https://x.test">that</a>.</p>
+<script>var x = 1;</script><br><br><br><br><p></p><div><span> </span></div>
+<h2>FAQ</h2><ul><li>Price: 30 KRW</li><li>Works offline</li></ul>""",
+    """<div class="table-scroll"><table><tr><td>wrapped</td></tr></table></div>
+<h2>One</h2><p>a &amp; b &lt; c</p><h2>Two</h2><figure><img src="x.jpg"></figure><h2>Three</h2>""",
+    "  leading space <p>pricing: see site</p> trailing ``` ",
+    "<br><br><p>a<br/>b</p>",
+    "<h2>Mixed</h2><p>one<br>two<br/>three <br /> four</p>\n<br>\n<ul><li>x<br/> </li><li>y<br/>z</li></ul><br/><br><br/>",
+    "<pre>a<br>\n  <br/>  b</pre><p>c<br> <br/>  d</p><table><tr><td>e<br><br/>f</td></tr></table>",
+]
+
+RELATED = [
+    {"id": 1, "link": "https://example.test/a", "title": {"rendered": "Alpha &amp; Beta"}},
+    {"id": 2, "link": "https://example.test/b", "title": {"rendered": "Gamma guide"}},
+]
+
+
+def fake_search(topic: str, count: int):
+    return [f"https://img.example/{abs(hash(topic)) % 1000}/{i}.jpg" for i in range(count)]
+
+
+def load_corpus(dirs):
+    docs = [(f"sample#{i}", s) for i, s in enumerate(SAMPLES)]
+    for d in dirs:
+        for path in sorted(glob.glob(os.path.join(d, "**", "*.html"), recursive=True)):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                docs.append((path, f.read()))
+    return docs
+
+
+# -------------------------
+# previous implementation (reference)
+# -------------------------
+# Verbatim copy of the per-step transforms before html_pipeline (recover_autopost.py
+# and wp_autopost_cluster.py). unsplash_search is the deterministic stub.
+LEGACY_REC_PRICE_PATTERNS = [
+    r"\$\s?\d[\d,]*(\.\d+)?",
+    r"USD\s?\d[\d,]*(\.\d+)?",
+    r"\b\d[\d,]*(\.\d+)?\s?(USD|달러)\b",
+    r"\b\d[\d,]*(\.\d+)?\s?(원|KRW)\b",
+    r"\b(?:price|pricing|cost)\s*[:\-]\s*.*?(<|$)",
+    r"\bfrom\s+\$\s?\d[\d,]*(\.\d+)?",
+    r"\bstarting\s+at\s+\$\s?\d[\d,]*(\.\d+)?",
+]
+
+LEGACY_CLU_PRICE_PATTERNS = [
+    r"\$\s?\d[\d,]*(\.\d+)?",
+    r"USD\s?\d[\d,]*(\.\d+)?",
+    r"\b\d[\d,]*(\.\d+)?\s?(USD|달러)\b",
+    r"\b\d[\d,]*(\.\d+)?\s?(원|KRW)\b",
+    r"\bfrom\s+\$\s?\d[\d,]*(\.\d+)?",
+    r"\bstarting\s+at\s+\$\s?\d[\d,]*(\.\d+)?",
+]
+
+LEGACY_REC_TABLE_CSS = """
+.table-scroll{overflow-x:auto;-webkit-overflow-scrolling:touch;margin:18px 0;border:1px solid rgba(0,0,0,.08);border-radius:12px}
+.table-scroll table{min-width:640px;width:100%;border-collapse:collapse}
+.table-scroll th,.table-scroll td{padding:10px 12px}
+"""
+
+LEGACY_CLU_TABLE_CSS = """
+.table-scroll{overflow-x:auto;-webkit-overflow-scrolling:touch;margin:18px 0;border:1px solid rgba(255,255,255,.08);border-radius:12px}
+.table-scroll table{min-width:640px;width:100%;border-collapse:collapse}
+.table-scroll th,.table-scroll td{padding:10px 12px}
+"""
+
+LEGACY_ALLOWED_TAGS = {
+    "p","br","hr","ul","ol","li",
+    "h2","h3","h4",
+    "strong","em","b","i","u",
+    "a","img","figure","figcaption",
+    "blockquote",
+    "table","thead","tbody","tr","th","td",
+    "code","pre",
+    "div","span",
+    "style",
+}
+
+LEGACY_ALLOWED_ATTRS = {
+    "a": {"href","title","rel","target"},
+    "img": {"src","alt","title","loading","width","height","srcset","sizes","style"},
+    "figure": {"class","style"},
+    "div": {"class","style"},
+    "span": {"class","style"},
+    "table": {"class","style"},
+    "th": {"colspan","rowspan"},
+    "td": {"colspan","rowspan"},
+    "style": {"id"},
+}
+
+
+def legacy_rec_strip_pricing(html_text: str) -> str:
+    if not html_text:
+        return html_text
+
+    for pat in LEGACY_REC_PRICE_PATTERNS:
+        html_text = re.sub(pat, "", html_text, flags=re.IGNORECASE)
+
+    soup = BeautifulSoup(html_text, "html.parser")
+
+    # Remove explicit pricing paragraphs
+    for p in list(soup.find_all(["p", "li"])):
+        t = p.get_text(" ", strip=True).lower()
+        if any(k in t for k in ["pricing", "price", "cost", "per month", "usd", "$", "krw", "원"]) and any(ch.isdigit() for ch in t):
+            p.decompose()
+
+    # Remove price columns / rows from tables
+    for table in soup.find_all("table"):
+        rows = table.find_all("tr")
+        if not rows:
+            continue
+        header_cells = rows[0].find_all(["th", "td"])
+        header_texts = [c.get_text(" ", strip=True).lower() for c in header_cells]
+        price_cols = [i for i, t in enumerate(header_texts) if any(k in t for k in ["price", "pricing", "cost", "plan"])]
+        if price_cols:
+            for tr in rows:
+                cells = tr.find_all(["th", "td"])
+                for idx in sorted(price_cols, reverse=True):
+                    if idx < len(cells):
+                        cells[idx].decompose()
+        for tr in list(table.find_all("tr")):
+            t = tr.get_text(" ", strip=True).lower()
+            if ("$" in t) or ("usd" in t) or ("/mo" in t) or ("per month" in t) or ("krw" in t):
+                tr.decompose()
+
+    return str(soup)
+
+
+def legacy_clu_strip_pricing(html_text: str) -> str:
+    if not html_text:
+        return html_text
+    for pat in LEGACY_CLU_PRICE_PATTERNS:
+        html_text = re.sub(pat, "", html_text, flags=re.IGNORECASE)
+    return html_text
+
+
+def legacy_fix_tables(html_text: str, css: str) -> str:
+    if not html_text:
+        return html_text
+    soup = BeautifulSoup(html_text, "html.parser")
+    changed = False
+    for table in soup.find_all("table"):
+        if table.parent and table.parent.name == "div" and "table-scroll" in (table.parent.get("class") or []):
+            continue
+        wrapper = soup.new_tag("div")
+        wrapper["class"] = ["table-scroll"]
+        table.wrap(wrapper)
+        changed = True
+
+    if changed:
+        style_id = "ri-table-scroll-style"
+        if not soup.find("style", attrs={"id": style_id}):
+            style = soup.new_tag("style")
+            style["id"] = style_id
+            style.string = css
+            soup.insert(0, style)
+    return str(soup)
+
+
+def legacy_strip_markdown_fences(s: str) -> str:
+    if not s:
+        return s
+    s = s.strip()
+    # Remove common fences (start/end)
+    s = re.sub(r"^\s*```[a-zA-Z0-9_-]*\s*", "", s)
+    s = re.sub(r"\s*```\s*$", "", s)
+    # Remove any remaining stray triple backticks
+    s = s.replace("```", "")
+    return s.strip()
+
+
+def legacy_clean_level2_html(html_text: str) -> str:
+    if not html_text:
+        return html_text
+
+    # Remove any fenced blocks quickly
+    html_text = legacy_strip_markdown_fences(html_text)
+
+    soup = BeautifulSoup(html_text, "html.parser")
+
+    # Remove HTML comments (incl Gutenberg <!-- wp:... -->)
+    for c in soup.find_all(string=lambda t: isinstance(t, Comment)):
+        c.extract()
+
+    # Drop scripts/iframes/forms entirely
+    for tag in soup.find_all(["script","iframe","form","input","button","textarea","noscript"]):
+        tag.decompose()
+
+    # Remove H1 (avoid duplicate title)
+    for h1 in soup.find_all("h1"):
+        h1.decompose()
+
+    # Flatten disallowed tags: unwrap or remove
+    for tag in list(soup.find_all(True)):
+        if tag.name not in LEGACY_ALLOWED_TAGS:
+            tag.unwrap()
+
+    # Remove dangerous attrs, normalize link rel
+    for tag in soup.find_all(True):
+        allowed = LEGACY_ALLOWED_ATTRS.get(tag.name, set())
+        if allowed:
+            tag.attrs = {k: v for k, v in tag.attrs.items() if k in allowed}
+        else:
+            tag.attrs = {}
+
+        if tag.name == "a":
+            href = (tag.get("href") or "").strip()
+            # Drop javascript: links
+            if href.lower().startswith("javascript:"):
+                tag.unwrap()
+                continue
+            # External links get noopener/noreferrer if target=_blank
+            if tag.get("target") == "_blank":
+                rel = (tag.get("rel") or [])
+                if isinstance(rel, str):
+                    rel = rel.split()
+                rel_set = set(rel)
+                rel_set.update({"noopener", "noreferrer"})
+                tag["rel"] = " ".join(sorted(rel_set))
+            # If empty anchor text, unwrap
+            if not tag.get_text(" ", strip=True) and not tag.find("img"):
+                tag.unwrap()
+
+        if tag.name == "img":
+            # Ensure loading=lazy
+            if not tag.get("loading"):
+                tag["loading"] = "lazy"
+
+    # Remove empty p/div/span (unless contains img)
+    for tag in list(soup.find_all(["p","div","span","figure"])):
+        if tag.find("img"):
+            continue
+        if not tag.get_text(" ", strip=True):
+            tag.decompose()
+
+    # Deduplicate consecutive <br> (more than 2)
+    out = str(soup)
+    out = re.sub(r"(<br\s*/?>\s*){3,}", "<br/><br/>", out, flags=re.IGNORECASE)
+
+    # Trim whitespace
+    return out.strip()
+
+
+def legacy_ensure_body_images(html_text: str, topic: str, body_image_count: int) -> str:
+    if body_image_count <= 0:
+        return html_text
+    soup = BeautifulSoup(html_text or "", "html.parser")
+    imgs = soup.find_all("img")
+    if len(imgs) >= body_image_count:
+        return str(soup)
+
+    need = body_image_count - len(imgs)
+    urls = fake_search(topic, max(need, body_image_count))
+    if not urls:
+        return str(soup)
+
+    h2s = soup.find_all(["h2", "h3"])
+    insert_points = []
+    if h2s:
+        insert_points = [h2s[0]]
+        if len(h2s) >= 2:
+            insert_points.append(h2s[len(h2s)//2])
+        if len(h2s) >= 3:
+            insert_points.append(h2s[-1])
+    else:
+        insert_points = [soup.find() or soup]
+
+    def make_img(url: str, alt: str):
+        fig = soup.new_tag("figure")
+        fig["class"] = ["wp-block-image", "size-large"]
+        img = soup.new_tag("img")
+        img["src"] = url
+        img["alt"] = alt
+        img["loading"] = "lazy"
+        img["style"] = "width:100%;border-radius:14px;margin:26px 0;"
+        fig.append(img)
+        return fig
+
+    for i in range(need):
+        fig = make_img(urls[i % len(urls)], f"{topic} illustration")
+        anchor = insert_points[i % len(insert_points)]
+        anchor.insert_before(fig)
+
+    return str(soup)
+
+
+def legacy_make_related_block(related) -> str:
+    if not related:
+        return ""
+    items = []
+    for p in related:
+        link = (p.get("link") or "").strip()
+        title = BeautifulSoup((p.get("title") or {}).get("rendered", ""), "html.parser").get_text(" ", strip=True)
+        if link and title:
+            items.append(f'<li><a href="{link}">{html.escape(title)}</a></li>')
+    if not items:
+        return ""
+    return '<hr/>\n<h2>Related posts</h2>\n<ul>\n' + "\n".join(items) + "\n</ul>\n"
+
+
+def legacy_make_print_checklist_block(title: str) -> str:
+    safe_title = html.escape(title.strip() or "This article")
+    return f"""
+<hr/>
+<h2>Quick checklist</h2>
+<p>Use this checklist to apply what you learned in <strong>{safe_title}</strong>.</p>
+<ol>
+  <li>Define the primary goal and success metric.</li>
+  <li>List required integrations and data sources.</li>
+  <li>Map the minimal workflow (inputs → processing → outputs).</li>
+  <li>Set governance: roles, review cadence, and data handling.</li>
+  <li>Run a small pilot, review results, then iterate.</li>
+</ol>
+<p><em>Print tip:</em> use your browser print function (Ctrl/Cmd + P).</p>
+""".strip()
+
+
+def legacy_recover(raw: str, title: str) -> str:
+    h = legacy_rec_strip_pricing(raw)
+    h = legacy_fix_tables(h, LEGACY_REC_TABLE_CSS)
+    h = legacy_ensure_body_images(h, title, rec.BODY_IMAGE_COUNT)
+    h = h + "\n" + legacy_make_related_block(RELATED)
+    h = h + "\n" + legacy_make_print_checklist_block(title)
+    return legacy_clean_level2_html(h)
+
+
+def legacy_cluster(raw: str, topic: str) -> str:
+    h = legacy_clu_strip_pricing(raw)
+    h = legacy_fix_tables(h, LEGACY_CLU_TABLE_CSS)
+    return legacy_ensure_body_images(h, topic, clu.BODY_IMAGE_COUNT)
+
+
+def outcome(fn, *args):
+    """Output string, or the exception type name (the old chain raises on some inputs too)."""
+    try:
+        return fn(*args)
+    except Exception as e:
+        return f"<raised {type(e).__name__}>"
+
+
+def main(argv):
+    rec._image_search = fake_search
+    clu._image_search = fake_search
+    dirs = argv or [os.environ.get("BACKUP_DIR", "backups")]
+    docs = load_corpus(dirs)
+
+    bad = 0
+    t_legacy = t_pipe = 0.0
+    for name, raw in docs:
+        # recover: input to the transforms is fence-stripped model output
+        src = rec.strip_markdown_fences(raw)
+        title = "Sample article"
+        t0 = time.perf_counter()
+        old = outcome(legacy_recover, src, title)
+        t1 = time.perf_counter()
+        new = outcome(rec.build_regen_pipeline(title, RELATED).run, src)
+        t2 = time.perf_counter()
+        t_legacy += t1 - t0
+        t_pipe += t2 - t1
+        if old != new:
+            bad += 1
+            print(f"[DIFF] recover {name}")
+
+        if outcome(clu.build_post_pipeline("AI INFO").run, raw) != outcome(legacy_cluster, raw, "AI INFO"):
+            bad += 1
+            print(f"[DIFF] cluster {name}")
+
+    print(f"[CHECK] docs={len(docs)} mismatches={bad}")
+    print(f"[CHECK] recover chain legacy={t_legacy * 1000:.1f}ms single-parse={t_pipe * 1000:.1f}ms")
+    print(f"[CHECK] pass timings (all runs): {format_timing_totals()}")
+    if bad:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
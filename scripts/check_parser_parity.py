@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Parser backend parity suite: runs every HTML transform of the scripts with
+HTML_PARSER=html.parser and with HTML_PARSER=lxml and flags each document whose
+output differs between the two.
+
+Corpus: the built-in samples of check_html_pipeline.py plus every *.html under
+the given dirs (default: $BACKUP_DIR, the original post HTML saved by recover
+runs). Image search is a deterministic stub, so no network is used.
+
+Usage:
+  python scripts/check_parser_parity.py [DIR ...]
+  PARITY_SHOW=20 python scripts/check_parser_parity.py backups
+
+Exit code 1 if any transform differs on any document.
+"""
+
+import os
+import sys
+
+from check_html_pipeline import RELATED, fake_search, load_corpus, outcome, rec, clu  # sets dummy env
+
+import html_pipeline  # noqa: E402
+
+PARITY_SHOW = int(os.environ.get("PARITY_SHOW", "5"))
+BACKENDS = ("html.parser", "lxml")
+
+
+def transforms():
+    title = "Sample article"
+    return [
+        ("soup_text", html_pipeline.soup_text),
+        ("classify_type_from_post", lambda d: clu.classify_type_from_post({"title": {"rendered": d[:300]}})),
+        ("strip_pricing", rec.strip_pricing),
+        ("fix_tables", rec.fix_tables),
+        ("ensure_body_images", lambda d: rec.ensure_body_images(d, title)),
+        ("clean_level2_html", rec.clean_level2_html),
+        ("regenerate pipeline", lambda d: rec.build_regen_pipeline(title, RELATED).run(rec.strip_markdown_fences(d))),
+        ("cluster post pipeline", lambda d: clu.build_post_pipeline("AI INFO").run(d)),
+    ]
+
+
+def run_with(parser: str, fn, doc: str) -> str:
+    prev = html_pipeline.HTML_PARSER
+    html_pipeline.HTML_PARSER = parser
+    try:
+        return outcome(fn, doc)
+    finally:
+        html_pipeline.HTML_PARSER = prev
+
+
+def first_diff(a: str, b: str, width: int = 60) -> str:
+    i = 0
+    n = min(len(a), len(b))
+    while i < n and a[i] == b[i]:
+        i += 1
+    lo = max(i - width // 2, 0)
+    return f"@{i}\n      {BACKENDS[0]}: {a[lo:i + width]!r}\n      {BACKENDS[1]}: {b[lo:i + width]!r}"
+
+
+def main(argv):
+    html_pipeline.check_parser("lxml")
+    rec._image_search = fake_search
+    clu._image_search = fake_search
+    docs = load_corpus(argv or [os.environ.get("BACKUP_DIR", "backups")])
+
+    total = 0
+    for name, fn in transforms():
+        bad = []
+        for doc_name, raw in docs:
+            a = run_with(BACKENDS[0], fn, raw)
+            b = run_with(BACKENDS[1], fn, raw)
+            if a != b:
+                bad.append((doc_name, a, b))
+        total += len(bad)
+        print(f"[PARITY] {name:<24} docs={len(docs)} differ={len(bad)}")
+        for doc_name, a, b in bad[:PARITY_SHOW]:
+            print(f"   - {doc_name} {first_diff(a, b)}")
+
+    print(f"[PARITY] total differences={total}")
+    if total:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
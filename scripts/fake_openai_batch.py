@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI files/batches endpoints, for testing
+REGEN_MODE=batch of recover_autopost.py offline (no API key, no cost).
+
+Endpoints (enough for the openai SDK calls in regen_batch.py):
+  POST /v1/files                 multipart upload (purpose=batch)
+  GET  /v1/files/{id}            file object
+  GET  /v1/files/{id}/content    raw bytes
+  POST /v1/batches               create a batch from an uploaded JSONL file
+  GET  /v1/batches/{id}          status; the batch completes after FAKE_BATCH_POLLS
+                                 retrieves and then gets an output (and error) file
+
+Every chat request is answered with a canned ~1400-word HTML article for the
+TITLE: line of the prompt (with the {INTERNAL_LINK_n} placeholders).
+
+Usage:
+  python scripts/fake_openai_batch.py [PORT]
+  # then, in another shell:
+  OPENAI_BASE_URL=http://127.0.0.1:PORT/v1 OPENAI_API_KEY=x REGEN_MODE=batch python scripts/recover_autopost.py
+
+Optional ENV:
+  FAKE_BATCH_POLLS=1              retrieves that still report in_progress
+  FAKE_BATCH_ERRORS=post-3,post-7 custom_ids answered with an error instead
+"""
+
+import email.parser
+import email.policy
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_BATCH_POLLS = int(os.environ.get("FAKE_BATCH_POLLS", "1"))
+FAKE_BATCH_ERRORS = {x.strip() for x in os.environ.get("FAKE_BATCH_ERRORS", "").split(",") if x.strip()}
+
+_lock = threading.RLock()
+FILES = {}    # id -> {"meta": {...}, "data": bytes}
+BATCHES = {}  # id -> {"meta": {...}, "polls": int}
+_seq = [0]
+
+
+def _next_id(prefix: str) -> str:
+    with _lock:
+        _seq[0] += 1
+        return f"{prefix}-fake{_seq[0]:05d}"
+
+
+def canned_article(title: str) -> str:
+    para = ("This section walks through how small teams evaluate the workflow, which integrations "
+            "matter day to day, and what to check during a one-week trial before committing. ") * 4
+    parts = [f"<p>{title} explained for small teams: what it is, who it fits and how to choose.</p>"]
+    for i in range(1, 9):
+        parts.append(f"<h2>Part {i}: {title}</h2><p>{para}</p>")
+        if i == 3:
+            parts.append('<p>See also <a href="{INTERNAL_LINK_1}">a related guide</a> and '
+                         '<a href="{INTERNAL_LINK_2}">another comparison</a>.</p>')
+    parts.append("<h2>FAQ</h2><h3>Is it worth it?</h3><p>It depends on the workflow.</p>")
+    parts.append("<h2>Conclusion</h2><p>Start with one real workflow and measure it.</p>")
+    return "\n".join(parts)
+
+
+def _answer(line: dict) -> dict:
+    cid = line.get("custom_id")
+    body = line.get("body") or {}
+    if cid in FAKE_BATCH_ERRORS:
+        return {"id": _next_id("batch_req"), "custom_id": cid, "response": None,
+                "error": {"code": "server_error", "message": "fake error"}}
+    prompt = " ".join(str(m.get("content", "")) for m in body.get("messages") or [])
+    m = re.search(r"TITLE:\s*(.+)", prompt)
+    title = m.group(1).strip() if m else "Untitled"
+    content = canned_article(title)
+    completion = {
+        "id": _next_id("chatcmpl"), "object": "chat.completion", "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                  "total_tokens": (len(prompt) + len(content)) // 4},
+    }
+    return {"id": _next_id("batch_req"), "custom_id": cid,
+            "response": {"status_code": 200, "request_id": _next_id("req"), "body": completion},
+            "error": None}
+
+
+def _store_file(data: bytes, filename: str, purpose: str) -> dict:
+    fid = _next_id("file")
+    meta = {"id": fid, "object": "file", "bytes": len(data), "created_at": int(time.time()),
+            "filename": filename, "purpose": purpose, "status": "processed"}
+    FILES[fid] = {"meta": meta, "data": data}
+    return meta
+
+
+def _complete(b: dict) -> None:
+    meta = b["meta"]
+    lines = [json.loads(x) for x in FILES[meta["input_file_id"]]["data"].decode("utf-8").splitlines() if x.strip()]
+    answers = [_answer(x) for x in lines]
+    ok = [a for a in answers if a["error"] is None]
+    bad = [a for a in answers if a["error"] is not None]
+    dump = lambda rows: "".join(json.dumps(r) + "\n" for r in rows).encode("utf-8")
+    if ok:
+        meta["output_file_id"] = _store_file(dump(ok), "output.jsonl", "batch_output")["id"]
+    if bad:
+        meta["error_file_id"] = _store_file(dump(bad), "errors.jsonl", "batch_output")["id"]
+    meta["status"] = "completed"
+    meta["completed_at"] = int(time.time())
+    meta["request_counts"] = {"total": len(answers), "completed": len(ok), "failed": len(bad)}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, code: int, obj=None, raw: bytes = None):
+        data = raw if raw is not None else json.dumps(obj).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/octet-stream" if raw is not None else "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path.endswith("/files"):
+            raw = self._body()
+            msg = email.parser.BytesParser(policy=email.policy.default).parsebytes(
+                b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + raw)
+            data, filename, purpose = b"", "upload.jsonl", "batch"
+            for part in msg.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                if name == "file":
+                    data = part.get_payload(decode=True) or b""
+                    filename = part.get_filename() or filename
+                elif name == "purpose":
+                    purpose = (part.get_payload(decode=True) or b"batch").decode()
+            return self._send(200, _store_file(data, filename, purpose))
+        if path.endswith("/batches"):
+            req = json.loads(self._body() or b"{}")
+            if req.get("input_file_id") not in FILES:
+                return self._send(404, {"error": {"message": "input file not found"}})
+            bid = _next_id("batch")
+            meta = {"id": bid, "object": "batch", "endpoint": req.get("endpoint"),
+                    "input_file_id": req["input_file_id"], "completion_window": req.get("completion_window", "24h"),
+                    "status": "validating", "created_at": int(time.time()), "metadata": req.get("metadata")}
+            BATCHES[bid] = {"meta": meta, "polls": 0}
+            return self._send(200, meta)
+        self._send(404, {"error": {"message": f"no route {path}"}})
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        m = re.search(r"/files/([^/]+)(/content)?$", path)
+        if m and m.group(1) in FILES:
+            f = FILES[m.group(1)]
+            return self._send(200, raw=f["data"]) if m.group(2) else self._send(200, f["meta"])
+        m = re.search(r"/batches/([^/]+)$", path)
+        if m and m.group(1) in BATCHES:
+            b = BATCHES[m.group(1)]
+            with _lock:
+                if b["meta"]["status"] != "completed":
+                    b["polls"] += 1
+                    if b["polls"] > FAKE_BATCH_POLLS:
+                        _complete(b)
+                    else:
+                        b["meta"]["status"] = "in_progress"
+            return self._send(200, b["meta"])
+        self._send(404, {"error": {"message": f"no route {path}"}})
+
+
+def serve(port: int = 0) -> ThreadingHTTPServer:
+    srv = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+if __name__ == "__main__":
+    srv = serve(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
+    print(f"OPENAI_BASE_URL=http://127.0.0.1:{srv.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
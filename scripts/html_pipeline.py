@@ -0,0 +1,453 @@
+"""
+Single-parse HTML transform pipeline.
+
+The article post-processing used to be a chain of functions that each did
+BeautifulSoup(html) -> edit -> str(soup). HtmlPipeline parses once, runs every
+transform as a pass over the same DOM and serializes once:
+
+    pipe = HtmlPipeline(
+        pre=[("price_regex", regex_remove(PRICE_PATTERNS))],   # str -> str, before parse
+        passes=[("strip_pricing", pricing_dom_pass),           # soup -> None, in place
+                ("fix_tables", table_scroll_pass(css))],
+        post=[("br_dedupe", dedupe_br)],                       # str -> str, after serialize
+    )
+    html = pipe.run(html)
+    pipe.timings   # {"price_regex": s, "parse": s, "strip_pricing": s, ..., "serialize": s}
+
+The old per-step functions in the scripts are thin wrappers around one-pass
+pipelines, so chaining them gives the same bytes as the combined pipeline
+(check with scripts/check_html_pipeline.py).
+
+timing_totals() aggregates pass timings over every run in the process so a
+script can print which transform dominates.
+
+Parser backend: HTML_PARSER=html.parser (default) | lxml, used by every
+BeautifulSoup parse in the scripts via make_soup()/soup_text(). With lxml,
+fragments are unwrapped from the <html><head>/<body> that lxml adds, so the
+output stays a post body. Compare backends with scripts/check_parser_parity.py
+before switching.
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from bs4 import BeautifulSoup, Comment
+from bs4.element import NavigableString, Stylesheet, Tag
+
+StrPass = Tuple[str, Callable[[str], str]]
+DomPass = Tuple[str, Callable[[BeautifulSoup], None]]
+
+_TOTALS: Dict[str, float] = {}
+_RUNS = 0
+_TOTALS_LOCK = threading.Lock()  # pipelines may run in worker threads
+
+PARSERS = ("html.parser", "lxml")
+HTML_PARSER = os.environ.get("HTML_PARSER", "html.parser").strip().lower() or "html.parser"
+
+
+def check_parser(name: str) -> str:
+    if name not in PARSERS:
+        raise SystemExit(f"HTML_PARSER must be one of {', '.join(PARSERS)} (got {name!r})")
+    if name == "lxml":
+        try:
+            import lxml  # noqa: F401
+        except ImportError:
+            raise SystemExit("HTML_PARSER=lxml but lxml is not installed (pip install -r requirements.txt)")
+    return name
+
+
+check_parser(HTML_PARSER)
+
+# input that is a whole document keeps lxml's html/head/body as parsed
+_DOCUMENT_RE = re.compile(r"<(?:!doctype|html|head|body)[\s>/]", re.IGNORECASE)
+
+
+def make_soup(html_text: str, parser: Optional[str] = None) -> BeautifulSoup:
+    """BeautifulSoup with the configured backend (HTML_PARSER unless `parser` is given)."""
+    parser = parser or HTML_PARSER
+    html_text = html_text or ""
+    soup = BeautifulSoup(html_text, parser)
+    if parser == "lxml" and not _DOCUMENT_RE.search(html_text):
+        root = soup.find("html", recursive=False)
+        if root is not None:
+            for part in root.find_all(["head", "body"], recursive=False):
+                part.unwrap()
+            root.unwrap()
+    return soup
+
+
+def soup_text(html_text: str, parser: Optional[str] = None) -> str:
+    """get_text(" ", strip=True) of an HTML snippet (titles etc.)."""
+    return make_soup(html_text, parser).get_text(" ", strip=True)
+
+
+class HtmlPipeline:
+    def __init__(self, passes: Sequence[DomPass] = (), pre: Sequence[StrPass] = (),
+                 post: Sequence[StrPass] = (), parser: Optional[str] = None):
+        self.pre = list(pre)
+        self.passes = list(passes)
+        self.post = list(post)
+        self.parser = parser  # None -> HTML_PARSER at run time
+        self.timings: Dict[str, float] = {}
+
+    def _timed(self, name: str, fn, arg):
+        t0 = time.perf_counter()
+        out = fn(arg)
+        self.timings[name] = self.timings.get(name, 0.0) + (time.perf_counter() - t0)
+        return out
+
+    def run(self, html_text: str) -> str:
+        global _RUNS
+        self.timings = {}
+        s = html_text or ""
+        for name, fn in self.pre:
+            s = self._timed(name, fn, s)
+
+        soup = self._timed("parse", lambda x: make_soup(x, self.parser), s)
+        for name, fn in self.passes:
+            self._timed(name, fn, soup)
+        out = self._timed("serialize", str, soup)
+
+        for name, fn in self.post:
+            out = self._timed(name, fn, out)
+
+        with _TOTALS_LOCK:
+            _RUNS += 1
+            for k, v in self.timings.items():
+                _TOTALS[k] = _TOTALS.get(k, 0.0) + v
+        return out
+
+    def format_timings(self) -> str:
+        return " ".join(f"{k}={v * 1000:.1f}ms" for k, v in self.timings.items())
+
+
+def timing_totals() -> Dict[str, float]:
+    with _TOTALS_LOCK:
+        return dict(_TOTALS)
+
+
+def format_timing_totals() -> str:
+    totals = timing_totals()
+    if not totals:
+        return "no pipeline runs"
+    items = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+    return f"runs={_RUNS} " + " ".join(f"{k}={v * 1000:.1f}ms" for k, v in items)
+
+
+# -------------------------
+# string passes
+# -------------------------
+def regex_remove(patterns: Sequence[str],
+                 keywords: Optional[Sequence[Sequence[str]]] = None) -> Callable[[str], str]:
+    """
+    Delete every match of each pattern (IGNORECASE), pattern by pattern in order.
+
+    keywords[i] lists literals of which every match of patterns[i] contains at
+    least one (e.g. "$" for r"\$\s?\d..."). A pattern only runs when one of its
+    literals is present in the current text, and one alternation of all the
+    literals gates the whole call, so text without prices costs one cheap scan.
+    Literal checks are IGNORECASE regexes too, so case folding is identical.
+    The removal itself stays ordered: a single combined sub would differ, e.g.
+    on "from $5" where the first pattern takes only "$5".
+    """
+    compiled = [re.compile(p, re.IGNORECASE) for p in patterns]
+    kws = list(keywords) if keywords is not None else [()] * len(compiled)
+    if len(kws) != len(compiled):
+        raise ValueError("regex_remove: keywords must be given per pattern")
+
+    def _literal_re(words):
+        return re.compile("|".join(re.escape(w) for w in words), re.IGNORECASE) if words else None
+
+    guards = [_literal_re(k) for k in kws]
+    gate = _literal_re([w for k in kws for w in k]) if all(guards) else None
+
+    def _run(s: str) -> str:
+        if not s or (gate is not None and not gate.search(s)):
+            return s
+        for rx, guard in zip(compiled, guards):
+            if guard is not None and not guard.search(s):
+                continue
+            s = rx.sub("", s)
+        return s
+    return _run
+
+
+def dedupe_br(s: str) -> str:
+    # Deduplicate consecutive <br> (more than 2)
+    return re.sub(r"(<br\s*/?>\s*){3,}", "<br/><br/>", s, flags=re.IGNORECASE)
+
+
+def strip_ws(s: str) -> str:
+    return s.strip()
+
+
+# -------------------------
+# DOM passes
+# -------------------------
+# keyword sets of the pricing checks as single-scan alternations (same result as `any(k in t ...)`)
+_PRICE_TEXT_KW = re.compile(r"pricing|price|cost|per month|usd|\$|krw|원")
+_PRICE_HEADER_KW = re.compile(r"price|pricing|cost|plan")
+_PRICE_ROW_KW = re.compile(r"\$|usd|/mo|per month|krw")
+
+
+def _tags(node, names: set) -> List[Tag]:
+    """node.find_all(names) without bs4's generic matcher (same nodes, same order)."""
+    return [d for d in node.descendants if type(d) is Tag and d.name in names]
+
+
+_P_LI = {"p", "li"}
+_CELL = {"th", "td"}
+_TR = {"tr"}
+_ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+_PRESERVE_WS = {"pre", "textarea"}
+
+
+def _reparse_unstable(soup: BeautifulSoup) -> bool:
+    """True if str(soup) does not parse back to the same bytes (html.parser quirks)."""
+    for node in soup.descendants:
+        t = type(node)
+        if t is Tag:
+            # "<br><br><p>a<br/>b</p>" parses to "<br/><br/><p>a<br>b</br></p>"
+            if node.name == "br" and node.contents:
+                return True
+        elif t is NavigableString and type(node.next_sibling) is NavigableString:
+            # "x</br> </br>\n": text split at stray end tags merges (and collapses) on reparse
+            return True
+    return False
+
+
+def reparse_pass(soup: BeautifulSoup) -> None:
+    """
+    Reparse the document in place where the old chain parsed again, but only when
+    that changes anything: html.parser nests content into a <br> after mixed
+    <br>/<br/> and splits text at stray </br>, and each parse of that output gives
+    different bytes again. A no-op for every other document (and with lxml).
+    """
+    if not _reparse_unstable(soup):
+        return
+    fresh = make_soup(str(soup))
+    soup.clear()
+    for node in list(fresh.contents):
+        soup.append(node.extract())
+
+
+def pricing_dom_pass(soup: BeautifulSoup) -> None:
+    # Remove explicit pricing paragraphs
+    for p in _tags(soup, _P_LI):
+        t = p.get_text(" ", strip=True).lower()
+        if _PRICE_TEXT_KW.search(t) and any(ch.isdigit() for ch in t):
+            p.decompose()
+
+    # Remove price columns / rows from tables
+    for table in soup.find_all("table"):
+        rows = _tags(table, _TR)
+        if not rows:
+            continue
+        header_cells = _tags(rows[0], _CELL)
+        price_cols = [i for i, c in enumerate(header_cells)
+                      if _PRICE_HEADER_KW.search(c.get_text(" ", strip=True).lower())]
+        if price_cols:
+            for tr in rows:
+                cells = _tags(tr, _CELL)
+                for idx in sorted(price_cols, reverse=True):
+                    if idx < len(cells):
+                        cells[idx].decompose()
+        for tr in _tags(table, _TR):
+            if _PRICE_ROW_KW.search(tr.get_text(" ", strip=True).lower()):
+                tr.decompose()
+
+
+def table_scroll_pass(css: str) -> Callable[[BeautifulSoup], None]:
+    """Wrap tables in div.table-scroll and add the scroll style once."""
+    def _run(soup: BeautifulSoup) -> None:
+        changed = False
+        for table in soup.find_all("table"):
+            if table.parent and table.parent.name == "div" and "table-scroll" in (table.parent.get("class") or []):
+                continue
+            wrapper = soup.new_tag("div")
+            wrapper["class"] = ["table-scroll"]
+            table.wrap(wrapper)
+            changed = True
+        if changed:
+            style_id = "ri-table-scroll-style"
+            if not soup.find("style", attrs={"id": style_id}):
+                style = soup.new_tag("style")
+                style["id"] = style_id
+                # Stylesheet (not NavigableString) so get_text() treats it like a reparsed <style>
+                style.append(Stylesheet(css))
+                soup.insert(0, style)
+    return _run
+
+
+def body_images_pass(target: int, search: Callable[[str, int], List[str]],
+                     topic: str) -> Callable[[BeautifulSoup], None]:
+    """Insert up to `target` figure/img blocks before the first/middle/last h2/h3."""
+    def _run(soup: BeautifulSoup) -> None:
+        if target <= 0:
+            return
+        imgs = soup.find_all("img")
+        if len(imgs) >= target:
+            return
+
+        need = target - len(imgs)
+        urls = search(topic, max(need, target))
+        if not urls:
+            return
+
+        h2s = soup.find_all(["h2", "h3"])
+        if h2s:
+            insert_points = [h2s[0]]
+            if len(h2s) >= 2:
+                insert_points.append(h2s[len(h2s)//2])
+            if len(h2s) >= 3:
+                insert_points.append(h2s[-1])
+        else:
+            insert_points = [soup.find() or soup]
+
+        for i in range(need):
+            fig = soup.new_tag("figure")
+            fig["class"] = ["wp-block-image", "size-large"]
+            img = soup.new_tag("img")
+            img["src"] = urls[i % len(urls)]
+            img["alt"] = f"{topic} illustration"
+            img["loading"] = "lazy"
+            img["style"] = "width:100%;border-radius:14px;margin:26px 0;"
+            fig.append(img)
+            anchor = insert_points[i % len(insert_points)]
+            anchor.insert_before(fig)
+    return _run
+
+
+def _reparsed_text(s: NavigableString, text: str) -> str:
+    """What a text run would become after str(soup) -> BeautifulSoup(): a whitespace-only
+    run collapses to a single newline/space unless it sits inside <pre>/<textarea>."""
+    if text.strip(_ASCII_SPACES) or not text:
+        return text
+    if any(p.name in _PRESERVE_WS for p in s.parents if p is not None):
+        return text
+    return "\n" if "\n" in text else " "
+
+
+def append_html_pass(fragments: Sequence[str], sep: str = "\n",
+                     parser: Optional[str] = None) -> Callable[[BeautifulSoup], None]:
+    """Same as `str(soup) + sep + fragment` for each fragment, without reparsing the document."""
+    def _append_text(soup: BeautifulSoup, text: str) -> None:
+        # adjacent text runs merge into one string on reparse
+        last = soup.contents[-1] if soup.contents else None
+        if type(last) is NavigableString:
+            merged = NavigableString(str(last) + text)
+            last.replace_with(merged)
+        else:
+            merged = NavigableString(text)
+            soup.append(merged)
+        fixed = _reparsed_text(merged, str(merged))
+        if fixed != str(merged):
+            merged.replace_with(NavigableString(fixed))
+
+    def _run(soup: BeautifulSoup) -> None:
+        for frag in fragments:
+            _append_text(soup, sep)
+            if frag:
+                for node in list(make_soup(frag, parser).contents):
+                    node = node.extract()
+                    if type(node) is NavigableString:
+                        _append_text(soup, str(node))
+                    else:
+                        soup.append(node)
+    return _run
+
+
+_LEAD_FENCE = re.compile(r"^\s*```[a-zA-Z0-9_-]*\s*")
+_TRAIL_FENCE = re.compile(r"\s*```\s*$")
+
+
+def strip_fences_pass(soup: BeautifulSoup) -> None:
+    """
+    DOM form of strip_markdown_fences(str(soup)): drop ``` from text and attribute
+    values and trim whitespace/fences at the very start and end of the document.
+    """
+    while soup.contents and type(soup.contents[0]) is NavigableString:
+        first = soup.contents[0]
+        txt = _LEAD_FENCE.sub("", first.lstrip())
+        if txt:
+            first.replace_with(NavigableString(txt))
+            break
+        first.extract()
+    while soup.contents and type(soup.contents[-1]) is NavigableString:
+        last = soup.contents[-1]
+        txt = _TRAIL_FENCE.sub("", last.rstrip()).rstrip()
+        if txt:
+            last.replace_with(NavigableString(txt))
+            break
+        last.extract()
+
+    for s in list(soup.find_all(string=lambda t: "```" in t)):
+        s.replace_with(type(s)(_reparsed_text(s, s.replace("```", ""))))
+    for tag in soup.find_all(True):
+        for k, v in list(tag.attrs.items()):
+            if isinstance(v, str) and "```" in v:
+                tag[k] = v.replace("```", "")
+            elif isinstance(v, list) and any("```" in x for x in v):
+                tag[k] = [x.replace("```", "") for x in v]
+
+
+def clean_level2_pass(allowed_tags: set, allowed_attrs: Dict[str, set]) -> Callable[[BeautifulSoup], None]:
+    def _run(soup: BeautifulSoup) -> None:
+        # Remove HTML comments (incl Gutenberg <!-- wp:... -->)
+        for c in soup.find_all(string=lambda t: isinstance(t, Comment)):
+            c.extract()
+
+        # Drop scripts/iframes/forms entirely
+        for tag in soup.find_all(["script","iframe","form","input","button","textarea","noscript"]):
+            tag.decompose()
+
+        # Remove H1 (avoid duplicate title)
+        for h1 in soup.find_all("h1"):
+            h1.decompose()
+
+        # Flatten disallowed tags: unwrap or remove
+        for tag in list(soup.find_all(True)):
+            if tag.name not in allowed_tags:
+                tag.unwrap()
+
+        # Remove dangerous attrs, normalize link rel
+        for tag in soup.find_all(True):
+            allowed = allowed_attrs.get(tag.name, set())
+            if allowed:
+                tag.attrs = {k: v for k, v in tag.attrs.items() if k in allowed}
+            else:
+                tag.attrs = {}
+
+            if tag.name == "a":
+                href = (tag.get("href") or "").strip()
+                # Drop javascript: links
+                if href.lower().startswith("javascript:"):
+                    tag.unwrap()
+                    continue
+                # External links get noopener/noreferrer if target=_blank
+                if tag.get("target") == "_blank":
+                    rel = (tag.get("rel") or [])
+                    if isinstance(rel, str):
+                        rel = rel.split()
+                    rel_set = set(rel)
+                    rel_set.update({"noopener", "noreferrer"})
+                    tag["rel"] = " ".join(sorted(rel_set))
+                # If empty anchor text, unwrap
+                if not tag.get_text(" ", strip=True) and not tag.find("img"):
+                    tag.unwrap()
+
+            if tag.name == "img":
+                # Ensure loading=lazy
+                if not tag.get("loading"):
+                    tag["loading"] = "lazy"
+
+        # Remove empty p/div/span (unless contains img)
+        for tag in list(soup.find_all(["p","div","span","figure"])):
+            if tag.find("img"):
+                continue
+            if not tag.get_text(" ", strip=True):
+                tag.decompose()
+    return _run
@@ -0,0 +1,253 @@
+"""
+Shared Unsplash image search for the autopost scripts (cluster, recover, new).
+
+The free Unsplash tier allows 50 requests per hour, and every post used to
+cost 1-3 calls, so long recovery runs silently fell back to no images / picsum.
+
+- query -> URLs cache on disk (TTL + LRU size cap). One search/photos call always
+  asks for a full page, so later calls for the same query with any count are hits.
+- search_many() runs several queries concurrently (wp_autopost_new inline images).
+- every URL found is also added to a per-category pool. Once the quota is
+  exhausted (X-Ratelimit-Remaining, or a 403/429), or a search fails, images are
+  drawn from that pool (then from all pools) instead of giving up.
+- hit ratio, pool draws and the remaining quota are printed by print_stats().
+
+File: $STATE_DIR/unsplash_cache.sqlite
+
+Optional ENV:
+  UNSPLASH_CACHE=1|0          (default 1; 0 = no disk cache/pool, every lookup calls the API)
+  UNSPLASH_CACHE_TTL_HOURS=168
+  UNSPLASH_CACHE_MAX=2000     max cached queries (oldest used evicted first)
+  UNSPLASH_POOL_MAX=200       max URLs kept per category pool
+  UNSPLASH_MIN_REMAINING=0    stop calling the API once the remaining quota is <= this
+  UNSPLASH_WORKERS=3          concurrent lookups in search_many()
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Set
+
+STATE_DIR = os.environ.get("STATE_DIR", "state").strip() or "state"
+USE_UNSPLASH_CACHE = os.environ.get("UNSPLASH_CACHE", "1").strip() != "0"
+UNSPLASH_CACHE_TTL_HOURS = float(os.environ.get("UNSPLASH_CACHE_TTL_HOURS", "168"))
+UNSPLASH_CACHE_MAX = int(os.environ.get("UNSPLASH_CACHE_MAX", "2000"))
+UNSPLASH_POOL_MAX = int(os.environ.get("UNSPLASH_POOL_MAX", "200"))
+UNSPLASH_MIN_REMAINING = int(os.environ.get("UNSPLASH_MIN_REMAINING", "0"))
+UNSPLASH_WORKERS = int(os.environ.get("UNSPLASH_WORKERS", "3"))
+
+SEARCH_URL = "https://api.unsplash.com/search/photos"
+PER_PAGE = 10  # 같은 1회 호출로 최대치를 받아 캐시 (count가 달라도 hit)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    key TEXT PRIMARY KEY,
+    urls TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pool (
+    category TEXT NOT NULL,
+    url TEXT NOT NULL,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (category, url)
+);
+CREATE INDEX IF NOT EXISTS idx_searches_used ON searches(used_at);
+"""
+
+
+def query_key(query: str) -> str:
+    return " ".join((query or "").lower().split())
+
+
+def _int_header(r, name: str) -> Optional[int]:
+    try:
+        return int(r.headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class UnsplashSearch:
+    def __init__(self, session, access_key: str, timeout: int = 30, path: Optional[str] = None,
+                 use_cache: bool = USE_UNSPLASH_CACHE):
+        self.session = session
+        self.access_key = (access_key or "").strip()
+        self.timeout = timeout
+        self.path = path or os.path.join(STATE_DIR, "unsplash_cache.sqlite")
+        self.use_cache = use_cache
+        self.ttl = UNSPLASH_CACHE_TTL_HOURS * 3600
+        self._lock = threading.Lock()  # 스테이지 워커/검색 스레드에서 동시에 호출
+        self.db = None
+        self.served: Set[str] = set()  # 이번 실행에서 pool로 나간 URL (같은 이미지 반복 방지)
+
+        self.hits = 0
+        self.misses = 0
+        self.api_calls = 0
+        self.api_errors = 0
+        self.pool_draws = 0
+        self.remaining: Optional[int] = None
+        self.limit: Optional[int] = None
+        self.exhausted = False
+
+    def _conn(self):
+        # 첫 검색 때 연다 (이미지 없는 실행은 파일을 만들지 않음)
+        if self.db is None and self.use_cache:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.executescript(SCHEMA)
+        return self.db
+
+    # -------------------------
+    # cache / pool
+    # -------------------------
+    def _get(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                return None
+            row = db.execute("SELECT urls, created_at FROM searches WHERE key=?", (key,)).fetchone()
+            if not row or time.time() - row[1] > self.ttl:
+                return None
+            db.execute("UPDATE searches SET used_at=? WHERE key=?", (time.time(), key))
+            return json.loads(row[0])
+
+    def _put(self, key: str, urls: List[str], pool: str) -> None:
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                return
+            db.execute("INSERT OR REPLACE INTO searches(key, urls, created_at, used_at) VALUES(?, ?, ?, ?)",
+                       (key, json.dumps(urls), now, now))
+            db.executemany("INSERT OR REPLACE INTO pool(category, url, added_at) VALUES(?, ?, ?)",
+                           [(pool, u, now) for u in urls])
+            db.commit()
+
+    def _draw(self, pool: str, count: int) -> List[str]:
+        """count URLs from the category pool (then any pool), not yet served in this run."""
+        with self._lock:
+            db = self._conn()
+            if db is None or count <= 0:
+                return []
+            out: List[str] = []
+            for where, args in (("category=?", (pool,)), ("1=1", ())):
+                rows = [r[0] for r in db.execute(f"SELECT DISTINCT url FROM pool WHERE {where}", args)]
+                rows = [u for u in rows if u not in self.served and u not in out]
+                out.extend(random.sample(rows, min(len(rows), count - len(out))))
+                if len(out) >= count:
+                    break
+            self.served.update(out)
+            self.pool_draws += len(out)
+            return out
+
+    # -------------------------
+    # API
+    # -------------------------
+    def _fetch(self, query: str) -> Optional[List[str]]:
+        """search/photos page for `query`; None if the call failed (quota, network, 5xx)."""
+        try:
+            r = self.session.get(
+                SEARCH_URL,
+                params={"query": query, "per_page": PER_PAGE, "orientation": "landscape", "content_filter": "high"},
+                headers={"Authorization": f"Client-ID {self.access_key}"},
+                timeout=self.timeout,
+            )
+        except Exception:
+            with self._lock:
+                self.api_calls += 1
+                self.api_errors += 1
+            return None
+
+        with self._lock:
+            self.api_calls += 1
+            remaining, limit = _int_header(r, "X-Ratelimit-Remaining"), _int_header(r, "X-Ratelimit-Limit")
+            if remaining is not None:
+                self.remaining = remaining if self.remaining is None else min(self.remaining, remaining)
+            if limit is not None:
+                self.limit = limit
+            if r.status_code in (403, 429) or (self.remaining is not None and self.remaining <= UNSPLASH_MIN_REMAINING):
+                if not self.exhausted:
+                    print(f"[IMG ] unsplash quota exhausted (status={r.status_code} remaining={self.remaining}), using image pool")
+                self.exhausted = True
+            if r.status_code != 200:
+                self.api_errors += 1
+                return None
+        try:
+            results = r.json().get("results", [])
+        except ValueError:
+            return None
+        urls: List[str] = []
+        for item in results:
+            u = (item.get("urls") or {}).get("regular")
+            if u:
+                urls.append(u)
+        return urls
+
+    def search(self, query: str, count: int = 3, pool: str = "") -> List[str]:
+        key = query_key(query)
+        urls = self._get(key)
+        with self._lock:
+            if urls is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if urls is None and self.access_key and not self.exhausted:
+            urls = self._fetch(query)
+            if urls:
+                self._put(key, urls, pool)
+        urls = (urls or [])[:count]
+        if len(urls) < count:
+            urls += self._draw(pool, count - len(urls))
+        return urls
+
+    def random(self, query: str, pool: str = "") -> str:
+        """One URL for `query` (a random pick of the cached page, replaces photos/random)."""
+        urls = self.search(query, PER_PAGE, pool=pool)
+        return random.choice(urls) if urls else ""
+
+    def search_many(self, queries: Sequence[str], count: int = 3, pool: str = "") -> List[List[str]]:
+        """search() for every query concurrently; results in query order."""
+        if len(queries) <= 1 or UNSPLASH_WORKERS <= 1:
+            return [self.search(q, count, pool) for q in queries]
+        with ThreadPoolExecutor(max_workers=min(UNSPLASH_WORKERS, len(queries))) as ex:
+            return list(ex.map(lambda q: self.search(q, count, pool), queries))
+
+    # -------------------------
+    # stats / eviction
+    # -------------------------
+    def _evict(self) -> int:
+        db = self.db
+        n = db.execute("DELETE FROM searches WHERE created_at < ?", (time.time() - self.ttl,)).rowcount or 0
+        total = db.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+        extra = total - max(UNSPLASH_CACHE_MAX, 1)
+        if extra > 0:
+            db.execute("DELETE FROM searches WHERE key IN (SELECT key FROM searches ORDER BY used_at LIMIT ?)", (extra,))
+            n += extra
+        # pool: 카테고리별 최신 UNSPLASH_POOL_MAX개만
+        db.execute(
+            "DELETE FROM pool WHERE rowid IN (SELECT rowid FROM (SELECT rowid, ROW_NUMBER() OVER "
+            "(PARTITION BY category ORDER BY added_at DESC) AS rn FROM pool) WHERE rn > ?)",
+            (max(UNSPLASH_POOL_MAX, 1),),
+        )
+        return n
+
+    def print_stats(self) -> None:
+        lookups = self.hits + self.misses
+        evicted = rows = 0
+        with self._lock:
+            if self.db is not None:
+                evicted = self._evict()
+                self.db.commit()
+                rows = self.db.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+                self.db.close()
+                self.db = None
+        if not lookups:
+            return
+        quota = f"{self.remaining}/{self.limit}" if self.remaining is not None else "n/a"
+        print(f"[IMG ] unsplash lookups={lookups} hits={self.hits} misses={self.misses} "
+              f"hit_ratio={self.hits / lookups:.0%} api_calls={self.api_calls} api_errors={self.api_errors} "
+              f"pool_draws={self.pool_draws} quota_remaining={quota} evicted={evicted} rows={rows}")
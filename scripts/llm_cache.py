@@ -0,0 +1,203 @@
+"""
+Persistent prompt -> response cache for the OpenAI chat calls of the autopost scripts.
+
+A run that dies after generation but before the WP write (timeout, 5xx, crash)
+used to pay for the same article again on the next run. cached_chat() stores
+the raw completion + token usage under sha256(model, messages, temperature); the
+next run with the same prompt gets it back for free.
+
+Entries are tagged by the caller (slot date, post id, title) and consume(tag)
+is called once the result is safely in WP: a consumed entry is never served
+again in normal mode, so a template title (cluster) or a re-flagged post
+(recover) gets a fresh generation instead of the old article.
+
+File: $STATE_DIR/llm_cache.sqlite (default state/llm_cache.sqlite)
+
+Optional ENV:
+  LLM_CACHE=1|0|replay   (default 1; replay = offline: never call OpenAI, serve
+                          any stored entry incl. consumed/expired, miss -> error)
+  LLM_CACHE_PATH=        explicit sqlite path
+  LLM_CACHE_TTL_HOURS=72
+  LLM_CACHE_MAX=500      max rows kept (oldest used evicted first)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+from openai_stream import StreamValidator, stream_chat
+
+STATE_DIR = os.environ.get("STATE_DIR", "state").strip() or "state"
+LLM_CACHE = os.environ.get("LLM_CACHE", "1").strip().lower()
+LLM_CACHE_PATH = (os.environ.get("LLM_CACHE_PATH", "").strip()
+                  or os.path.join(STATE_DIR, "llm_cache.sqlite"))
+LLM_CACHE_TTL_HOURS = float(os.environ.get("LLM_CACHE_TTL_HOURS", "72"))
+LLM_CACHE_MAX = int(os.environ.get("LLM_CACHE_MAX", "500"))
+
+if LLM_CACHE not in ("1", "0", "replay"):
+    raise SystemExit(f"LLM_CACHE must be 1, 0 or replay, got {LLM_CACHE!r}")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    tag TEXT NOT NULL,
+    response TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    consumed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_responses_tag ON responses(tag);
+CREATE INDEX IF NOT EXISTS idx_responses_used ON responses(used_at);
+"""
+
+
+def request_key(kwargs: dict, scope: str = "") -> str:
+    ident = {k: kwargs.get(k) for k in ("model", "messages", "temperature")}
+    if scope:
+        ident["scope"] = scope
+    return hashlib.sha256(json.dumps(ident, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path: str = LLM_CACHE_PATH, mode: str = LLM_CACHE,
+                 ttl_hours: float = LLM_CACHE_TTL_HOURS, max_entries: int = LLM_CACHE_MAX):
+        self.path = path
+        self.mode = mode
+        self.ttl = ttl_hours * 3600
+        self.max_entries = max(max_entries, 1)
+        self._lock = threading.Lock()  # cluster/new generate in worker threads
+        self.db = None
+        if mode != "0":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+
+    @property
+    def replay(self) -> bool:
+        return self.mode == "replay"
+
+    def get(self, key: str) -> Optional[Tuple[str, int]]:
+        """(response, prompt+completion tokens) or None."""
+        if self.db is None:
+            return None
+        with self._lock:
+            row = self.db.execute(
+                "SELECT response, prompt_tokens + completion_tokens, created_at, consumed FROM responses WHERE key=?",
+                (key,),
+            ).fetchone()
+            if row and not self.replay and (row[3] or time.time() - row[2] > self.ttl):
+                row = None
+            if not row:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_tokens += row[1]
+            self.db.execute("UPDATE responses SET used_at=? WHERE key=?", (time.time(), key))
+            return row[0], row[1]
+
+    def put(self, key: str, tag: str, response: str, usage: dict) -> None:
+        if self.db is None or self.replay:
+            return
+        now = time.time()
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses(key, tag, response, prompt_tokens, completion_tokens, "
+                "created_at, used_at, consumed) VALUES(?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, tag or "", response, int(usage.get("prompt_tokens") or 0),
+                 int(usage.get("completion_tokens") or 0), now, now),
+            )
+            self.db.commit()  # 크래시 대비: 생성 직후 바로 디스크에
+
+    def consume(self, tag: str) -> None:
+        """The result for `tag` reached WP: never serve its entries again (except replay)."""
+        if self.db is None or self.replay or not tag:
+            return
+        with self._lock:
+            self.db.execute("UPDATE responses SET consumed=1 WHERE tag=?", (tag,))
+            self.db.commit()
+
+    def _evict(self) -> int:
+        cur = self.db.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+        n = cur.rowcount or 0
+        total = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        extra = total - self.max_entries
+        if extra > 0:
+            self.db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY used_at LIMIT ?)",
+                (extra,),
+            )
+            n += extra
+        return n
+
+    def close(self) -> None:
+        if self.db is None:
+            return
+        with self._lock:
+            evicted = 0 if self.replay else self._evict()
+            self.db.commit()
+            rows = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            self.db.close()
+            self.db = None
+        print(f"[LLM ] cache mode={self.mode} hits={self.hits} misses={self.misses} "
+              f"tokens_saved={self.saved_tokens} evicted={evicted} rows={rows}")
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> LLMCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
+
+
+def cached_chat(client, label: str, validator: Optional[StreamValidator] = None, tag: str = "",
+                fresh: bool = False, scope: str = "", **kwargs) -> str:
+    """
+    client.chat.completions.create(**kwargs) through the cache. With a validator
+    the call streams (openai_stream.stream_chat). fresh=True skips the lookup
+    (e.g. a retry that needs a different answer) but still stores the result.
+    scope is added to the key: the same prompt for another scope (slot) is a miss.
+    """
+    cache = get_cache()
+    key = request_key(kwargs, scope)
+    if not fresh or cache.replay:
+        hit = cache.get(key)
+        if hit is not None:
+            print(f"[LLM ] {label} cache hit (tokens saved={hit[1]})")
+            return hit[0]
+    if cache.replay:
+        raise SystemExit(f"[LLM ] {label} not in cache (LLM_CACHE=replay)")
+
+    usage: dict = {}
+    if validator is not None:
+        out = stream_chat(client, label, validator, usage=usage, **kwargs)
+    else:
+        resp = client.chat.completions.create(**kwargs)
+        out = resp.choices[0].message.content or ""
+        u = getattr(resp, "usage", None)
+        usage = {"prompt_tokens": getattr(u, "prompt_tokens", 0), "completion_tokens": getattr(u, "completion_tokens", 0)}
+    cache.put(key, tag, out, usage)
+    return out
+
+
+def consume(tag: str) -> None:
+    if _cache is not None:
+        _cache.consume(tag)
+
+
+def print_stats() -> None:
+    if _cache is not None:
+        _cache.close()
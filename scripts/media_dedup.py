@@ -0,0 +1,302 @@
+"""
+Content-addressed media uploads + duplicate sweep for the WP media library.
+
+wp_client.upload_media always creates a new attachment, so a rerun or a run that
+died after uploading left another copy of the same thumb_auto_*.jpg behind.
+MediaIndex.upload() keys every upload by sha256 of the payload:
+
+  - local index $STATE_DIR/media_index.sqlite: sha256 -> media id
+  - a hit is verified with one small GET (deleted in WP -> forgotten, uploaded again)
+    and returned without uploading
+  - optionally the hash is also written to attachment meta (MEDIA_HASH_META, a meta
+    key registered with show_in_rest on the site); the sweep reads it back so the
+    index can be rebuilt without downloading those files
+
+The sweep finds duplicates that already exist: media is listed with concurrent page
+fetches, files are pre-grouped by size (media_details.filesize) so only size
+collisions are downloaded + hashed (concurrently), and every group of identical
+files keeps its oldest attachment. With --apply, posts using a duplicate as
+featured image are repointed to the kept one and the duplicates are deleted.
+
+Usage:
+  python scripts/media_dedup.py sweep           # report only
+  python scripts/media_dedup.py sweep --apply   # repoint featured_media + delete duplicates
+
+Optional ENV:
+  STATE_DIR=state
+  MEDIA_INDEX_PATH=         explicit sqlite path
+  MEDIA_HASH_META=          registered attachment meta key for the sha256 ("" = local index only)
+  MEDIA_SWEEP_PREFIX=thumb_auto_  only files whose name starts with this ("" = all media)
+  MEDIA_SWEEP_WORKERS=4     concurrent downloads while hashing
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+STATE_DIR = os.environ.get("STATE_DIR", "state").strip() or "state"
+MEDIA_INDEX_PATH = os.environ.get("MEDIA_INDEX_PATH", "").strip() or os.path.join(STATE_DIR, "media_index.sqlite")
+MEDIA_HASH_META = os.environ.get("MEDIA_HASH_META", "").strip()
+MEDIA_SWEEP_PREFIX = os.environ.get("MEDIA_SWEEP_PREFIX", "thumb_auto_").strip()
+MEDIA_SWEEP_WORKERS = int(os.environ.get("MEDIA_SWEEP_WORKERS", "4"))
+
+# posts whose featured_media is repointed before a duplicate is deleted
+SWEEP_POST_STATUSES = ("publish", "future", "draft", "pending", "private")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media_hash (
+    sha256 TEXT PRIMARY KEY,
+    media_id INTEGER NOT NULL,
+    filename TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_media_hash_id ON media_hash(media_id);
+"""
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class MediaIndex:
+    def __init__(self, wp, path: str = MEDIA_INDEX_PATH):
+        self.wp = wp
+        self.path = path
+        self.db = None
+        self._lock = threading.Lock()  # upload 스테이지 워커 여러 개
+        self._sha_locks: Dict[str, threading.Lock] = {}  # 같은 바이트 동시 업로드 방지
+        self._verified: Dict[int, bool] = {}
+        self.hits = 0
+        self.uploads = 0
+        self.stale = 0
+        self.bytes_saved = 0
+
+    def _conn(self):
+        # 첫 조회/업로드 때 연다 (import만 하거나 업로드 없는 실행은 파일을 만들지 않음)
+        if self.db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.executescript(SCHEMA)
+        return self.db
+
+    # -------------------------
+    # index
+    # -------------------------
+    def get(self, sha: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn().execute("SELECT media_id FROM media_hash WHERE sha256=?", (sha,)).fetchone()
+        return row[0] if row else None
+
+    def sha_of(self, media_id: int) -> Optional[str]:
+        with self._lock:
+            row = self._conn().execute("SELECT sha256 FROM media_hash WHERE media_id=?", (media_id,)).fetchone()
+        return row[0] if row else None
+
+    def remember(self, sha: str, media_id: int, filename: str = "") -> None:
+        with self._lock:
+            db = self._conn()
+            db.execute("INSERT OR REPLACE INTO media_hash(sha256, media_id, filename, created_at) VALUES(?, ?, ?, ?)",
+                       (sha, media_id, filename, time.time()))
+            db.commit()
+
+    def forget(self, media_id: int) -> None:
+        with self._lock:
+            db = self._conn()
+            db.execute("DELETE FROM media_hash WHERE media_id=?", (media_id,))
+            db.commit()
+
+    def exists(self, media_id: int) -> Optional[bool]:
+        """True/False if WP says so, None if it could not tell (WAF, 5xx, network)."""
+        if media_id in self._verified:
+            return self._verified[media_id]
+        try:
+            r = self.wp.request("GET", f"/wp-json/wp/v2/media/{media_id}", params={"_fields": "id"},
+                                check_json=False, raise_for_status=False)
+        except Exception:
+            return None
+        if r.status_code == 200:
+            ok = True
+        elif r.status_code in (404, 410):
+            ok = False
+        else:
+            return None
+        self._verified[media_id] = ok
+        return ok
+
+    # -------------------------
+    # upload
+    # -------------------------
+    def _sha_lock(self, sha: str) -> threading.Lock:
+        with self._lock:
+            return self._sha_locks.setdefault(sha, threading.Lock())
+
+    def upload(self, file_bytes: bytes, filename: str, mime: str = "image/jpeg") -> int:
+        sha = sha256_hex(file_bytes)
+        with self._sha_lock(sha):
+            mid = self.get(sha)
+            if mid is not None:
+                ok = self.exists(mid)
+                if ok:
+                    with self._lock:
+                        self.hits += 1
+                        self.bytes_saved += len(file_bytes)
+                    print(f"[MEDIA] reuse id={mid} sha={sha[:12]} ({filename})")
+                    return mid
+                if ok is False:
+                    # WP에서 지워진 첨부: 인덱스에서 빼고 새로 업로드
+                    self.forget(mid)
+                    with self._lock:
+                        self.stale += 1
+
+            mid = self.wp.upload_media(file_bytes, filename, mime=mime)
+            self.remember(sha, mid, filename)
+            self._verified[mid] = True
+            with self._lock:
+                self.uploads += 1
+            if MEDIA_HASH_META:
+                try:
+                    self.wp.update_item(f"/wp-json/wp/v2/media/{mid}", {"meta": {MEDIA_HASH_META: sha}})
+                except Exception as e:
+                    print(f"[WARN] media id={mid} hash meta not saved: {str(e)[:200]}")
+            return mid
+
+    def close(self) -> None:
+        with self._lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+        if self.hits or self.uploads or self.stale:
+            print(f"[MEDIA] dedup hits={self.hits} uploads={self.uploads} stale={self.stale} "
+                  f"bytes_saved={self.bytes_saved}")
+
+
+# -------------------------
+# sweep
+# -------------------------
+def _filename(m: dict) -> str:
+    return (m.get("source_url") or "").rsplit("/", 1)[-1]
+
+
+def _filesize(m: dict) -> Optional[int]:
+    size = (m.get("media_details") or {}).get("filesize")
+    return size if isinstance(size, int) else None
+
+
+def hash_media(index: MediaIndex, items: List[dict], workers: int = MEDIA_SWEEP_WORKERS) -> Tuple[Dict[int, str], int]:
+    """{media id: sha256} for `items` (meta / local index first, else download). Returns (hashes, downloaded)."""
+    hashes: Dict[int, str] = {}
+    todo: List[dict] = []
+    for m in items:
+        sha = ((m.get("meta") or {}).get(MEDIA_HASH_META) if MEDIA_HASH_META else None) or index.sha_of(m["id"])
+        if sha:
+            hashes[m["id"]] = sha
+        else:
+            todo.append(m)
+
+    def _one(m: dict) -> Tuple[int, Optional[str]]:
+        try:
+            r = index.wp.session.get(m.get("source_url") or "", timeout=index.wp.timeout)
+            r.raise_for_status()
+            return m["id"], sha256_hex(r.content)
+        except Exception as e:
+            print(f"[WARN] media id={m['id']} download failed: {str(e)[:200]}")
+            return m["id"], None
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(todo)))) as ex:
+            for mid, sha in ex.map(_one, todo):
+                if sha:
+                    hashes[mid] = sha
+    return hashes, len(todo)
+
+
+def sweep(index: MediaIndex, apply: bool = False, prefix: str = MEDIA_SWEEP_PREFIX) -> Dict[str, int]:
+    wp = index.wp
+    fields = ["id", "date_gmt", "source_url", "media_details.filesize"]
+    if MEDIA_HASH_META:
+        fields.append("meta")
+    media = wp.get_all_pages("/wp-json/wp/v2/media", {"orderby": "id", "order": "asc"}, fields=fields)
+    items = [m for m in media if isinstance(m.get("id"), int) and _filename(m).startswith(prefix)]
+
+    # 크기가 유일한 파일은 중복일 수 없으니 내려받지 않음 (크기 모르면 전부 해시)
+    by_size: Dict[Optional[int], List[dict]] = {}
+    for m in items:
+        by_size.setdefault(_filesize(m), []).append(m)
+    need = [m for size, ms in by_size.items() for m in ms if size is None or len(ms) > 1]
+    hashes, downloaded = hash_media(index, need)
+
+    groups: Dict[str, List[int]] = {}
+    for mid, sha in hashes.items():
+        groups.setdefault(sha, []).append(mid)
+
+    dups: Dict[int, int] = {}  # duplicate id -> kept id
+    dup_bytes = 0
+    sizes = {m["id"]: _filesize(m) or 0 for m in items}
+    for sha, ids in sorted(groups.items(), key=lambda kv: min(kv[1])):
+        ids.sort()
+        keep = ids[0]
+        index.remember(sha, keep)  # 이후 같은 바이트 업로드는 keep 재사용
+        if len(ids) > 1:
+            print(f"[SWEEP] sha={sha[:12]} keep={keep} duplicates={ids[1:]}")
+            for d in ids[1:]:
+                dups[d] = keep
+                dup_bytes += sizes.get(d, 0)
+
+    report = {"media": len(media), "candidates": len(items), "hashed": len(hashes), "downloaded": downloaded,
+              "groups": sum(1 for ids in groups.values() if len(ids) > 1), "duplicates": len(dups),
+              "repointed": 0, "deleted": 0}
+
+    if apply and dups:
+        posts: List[dict] = []
+        for st in SWEEP_POST_STATUSES:
+            # status 콤마 리스트를 거부하는 환경이 있어 status별로 따로 조회
+            posts += wp.get_all_pages("/wp-json/wp/v2/posts", {"status": st}, fields=("id", "featured_media"))
+        for p in posts:
+            keep = dups.get(p.get("featured_media") or 0)
+            if keep:
+                wp.update_item(f"/wp-json/wp/v2/posts/{p['id']}", {"featured_media": keep})
+                report["repointed"] += 1
+        for d in sorted(dups):
+            r = wp.request("DELETE", f"/wp-json/wp/v2/media/{d}", params={"force": "true"},
+                           check_json=False, raise_for_status=False)
+            if r.status_code == 200:
+                report["deleted"] += 1
+                index.forget(d)
+            else:
+                print(f"[WARN] delete media id={d} failed: HTTP {r.status_code}")
+
+    print(
+        f"[SWEEP] media={report['media']} candidates={report['candidates']} (prefix={prefix!r}) "
+        f"hashed={report['hashed']} downloaded={report['downloaded']} groups={report['groups']} "
+        f"duplicates={report['duplicates']} dup_bytes={dup_bytes} repointed={report['repointed']} "
+        f"deleted={report['deleted']} (apply={apply})"
+    )
+    return report
+
+
+def main(argv: List[str]) -> None:
+    if not argv or argv[0] != "sweep":
+        raise SystemExit("usage: media_dedup.py sweep [--apply]")
+    from wp_client import WPClient
+
+    base = os.environ.get("WP_BASE", "").rstrip("/")
+    user = os.environ.get("WP_USER", "")
+    password = os.environ.get("WP_PASS", "")
+    if not (base and user and password):
+        raise SystemExit("Missing env: WP_BASE, WP_USER, WP_PASS")
+    wp = WPClient(base, user, password, timeout=int(os.environ.get("HTTP_TIMEOUT", "30")))
+    index = MediaIndex(wp)
+    try:
+        sweep(index, apply="--apply" in argv[1:])
+    finally:
+        index.close()
+        wp.print_stats()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,286 @@
+"""
+One-pass post analysis for the recovery scan (recover_autopost.py).
+
+should_fix_post used to build four BeautifulSoup trees of the same content
+(word count, print-stub check, title coverage, image count) and main() parsed
+it twice more for logging. PostAnalysis parses the content once with lxml and
+keeps everything the heuristics and the log lines need:
+
+    a = PostAnalysis(content_html, title_html)
+    a.words, a.images, a.text, a.stub, a.title_plain, a.title_coverage
+
+Text is extracted like BeautifulSoup.get_text(" ", strip=True): comments and
+<script>/<style>/<template> content are skipped, every text run is stripped
+and the runs are joined with a single space.
+
+PostScan gives the same numbers without building a tree: lxml's parser runs
+with a target (SAX-style events) and only the counters, the found title
+tokens and the first STUB_MAX_CHARS of text are kept. (The content is parsed
+in one call, not fed in chunks: libxml2's push mode recovers differently from
+the DOM parse on some broken input, e.g. a leading end tag.)
+The recovery scan uses it for every post and builds a PostAnalysis only for
+posts it flags (judge_content).
+
+judge_content() is a plain module-level function of its arguments (thresholds
+included) so it can run in worker processes; AnalysisPool feeds posts to a
+ProcessPoolExecutor as they arrive and hands results back in input order.
+"""
+
+import html
+import re
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Set
+
+from lxml import etree
+
+PRINT_STUB_PATTERNS = [
+    r"save\s*(and|or)\s*print\s*checklist",
+    r"print\s*(this)?\s*page",
+    r"print\s*window",
+    r"\bchecklist\b",
+]
+_STUB_RES = [re.compile(p, re.IGNORECASE) for p in PRINT_STUB_PATTERNS]
+# 본문이 이 길이 이상이면 checklist 문구가 있어도 stub 으로 보지 않음
+STUB_MAX_CHARS = 2500
+
+_WORD_RE = re.compile(r"\w+")
+_TITLE_TOKEN_RE = re.compile(r"[a-z0-9가-힣]+")
+_NO_TEXT_TAGS = ("script", "style", "template")
+
+
+def _parse(html_text: str):
+    """lxml root element, or None for empty / comment-only input."""
+    if not html_text or not html_text.strip():
+        return None
+    try:
+        return etree.HTML(html_text)
+    except (etree.ParserError, ValueError):
+        return None
+
+
+def _collect(el, out: List[str]) -> None:
+    # comments / PIs (non-str tag) and script/style/template contribute no text of their own
+    if isinstance(el.tag, str) and el.tag not in _NO_TEXT_TAGS:
+        if el.text:
+            out.append(el.text)
+        for child in el:
+            _collect(child, out)
+            if child.tail:
+                out.append(child.tail)
+
+
+def _text_of(root) -> str:
+    if root is None:
+        return ""
+    runs: List[str] = []
+    _collect(root, runs)
+    return " ".join(t for t in (r.strip() for r in runs) if t)
+
+
+def plain_text(html_text: str) -> str:
+    return _text_of(_parse(html_text))
+
+
+def looks_like_print_stub(text: str) -> bool:
+    t = text.lower()
+    if not t:
+        return True
+    if len(t) >= STUB_MAX_CHARS:
+        return False
+    return any(r.search(t) for r in _STUB_RES)
+
+
+def _title_tokens(title_plain: str) -> List[str]:
+    title_plain = html.unescape(title_plain).lower().strip()
+    return [t for t in _TITLE_TOKEN_RE.findall(title_plain) if len(t) >= 3]
+
+
+def title_coverage(title_plain: str, body_lower: str) -> float:
+    """Share of title tokens (len >= 3) found in the lowercase body text."""
+    toks = _title_tokens(title_plain)
+    if not toks:
+        return 1.0
+    hit = sum(1 for t in toks if t in body_lower)
+    return hit / max(len(toks), 1)
+
+
+class PostAnalysis:
+    __slots__ = ("words", "images", "text", "stub", "title_plain", "title_coverage")
+
+    def __init__(self, content_html: str, title_html: str = ""):
+        root = _parse(content_html)
+        self.images = len(root.findall(".//img")) if root is not None else 0
+        self.text = _text_of(root)
+        self.words = len(_WORD_RE.findall(self.text))
+        body_lower = self.text.lower()
+        self.stub = looks_like_print_stub(body_lower)
+        self.title_plain = plain_text(title_html)
+        self.title_coverage = title_coverage(self.title_plain, body_lower)
+
+    def __repr__(self) -> str:
+        return (f"PostAnalysis(words={self.words}, images={self.images}, stub={self.stub}, "
+                f"title_coverage={self.title_coverage:.2f})")
+
+
+
+class _ScanTarget:
+    """lxml parser target: text runs are split exactly where the DOM has separate text/tail nodes."""
+
+    def __init__(self, title_tokens: List[str]):
+        self.words = 0
+        self.images = 0
+        self.length = 0          # len(" ".join(runs)) without keeping the text
+        self.prefix: List[str] = []
+        self._prefix_len = 0
+        self._todo: Set[str] = set(title_tokens)
+        self.found: Set[str] = set()
+        self._buf: List[str] = []
+        self._skip = 0
+
+    def _flush(self) -> None:
+        if not self._buf:
+            return
+        run = "".join(self._buf).strip()
+        self._buf = []
+        if not run:
+            return
+        self.words += len(_WORD_RE.findall(run))
+        self.length += len(run) + (1 if self.length else 0)
+        if self._prefix_len < STUB_MAX_CHARS:
+            self.prefix.append(run)
+            self._prefix_len += len(run) + 1
+        if self._todo:
+            low = run.lower()
+            hit = {t for t in self._todo if t in low}
+            self.found |= hit
+            self._todo -= hit
+
+    def start(self, tag, attrib) -> None:
+        self._flush()
+        if tag == "img":
+            self.images += 1
+        if tag in _NO_TEXT_TAGS:
+            self._skip += 1
+
+    def end(self, tag) -> None:
+        self._flush()
+        if tag in _NO_TEXT_TAGS:
+            self._skip -= 1
+
+    def data(self, text) -> None:
+        if not self._skip:
+            self._buf.append(text)
+
+    def comment(self, text) -> None:
+        self._flush()
+
+    def pi(self, target, data=None) -> None:
+        self._flush()
+
+    def close(self) -> "_ScanTarget":
+        self._flush()
+        return self
+
+
+class PostScan:
+    """
+    Streaming counterpart of PostAnalysis (same words/images/stub/title_coverage,
+    constant memory). `text` is only the first STUB_MAX_CHARS of the plain text.
+    """
+    __slots__ = ("words", "images", "text", "stub", "title_plain", "title_coverage")
+
+    def __init__(self, content_html: str, title_html: str = ""):
+        self.title_plain = plain_text(title_html)
+        toks = _title_tokens(self.title_plain)
+        t = _ScanTarget(toks)
+        if content_html and content_html.strip():
+            try:
+                etree.fromstring(content_html, etree.HTMLParser(target=t))
+            except (etree.ParserError, etree.XMLSyntaxError, ValueError):
+                t.close()
+        self.words = t.words
+        self.images = t.images
+        self.text = " ".join(t.prefix)[:STUB_MAX_CHARS]
+        # whole text is known when it is shorter than the stub limit
+        self.stub = looks_like_print_stub(self.text) if t.length < STUB_MAX_CHARS else False
+        self.title_coverage = sum(1 for k in toks if k in t.found) / len(toks) if toks else 1.0
+
+    def __repr__(self) -> str:
+        return (f"PostScan(words={self.words}, images={self.images}, stub={self.stub}, "
+                f"title_coverage={self.title_coverage:.2f})")
+
+
+# -------------------------
+# judging (runs in worker processes)
+# -------------------------
+def flags_for(a, min_words: int, title_match_min: float, target_images: int) -> Dict[str, bool]:
+    return {
+        "short": a.words < min_words,
+        "stub": bool(a.stub),
+        "title_mismatch": a.title_coverage < title_match_min,
+        "few_images": a.images < target_images,
+    }
+
+
+def judge_content(title_html: str, content_html: str, min_words: int,
+                  title_match_min: float, target_images: int) -> dict:
+    """
+    Streaming scan first; a post it flags is re-judged on the full DOM.
+    Returns {"flags", "words", "images", "title_plain"} (JSON-able, picklable).
+    """
+    a = PostScan(content_html, title_html)
+    flags = flags_for(a, min_words, title_match_min, target_images)
+    if any(flags.values()):
+        flags = flags_for(PostAnalysis(content_html, title_html), min_words, title_match_min, target_images)
+    return {"flags": flags, "words": a.words, "images": a.images, "title_plain": a.title_plain}
+
+
+class AnalysisPool:
+    """
+    submit() now, collect in submission order. workers <= 1 runs inline (no
+    processes); otherwise a ProcessPoolExecutor with `workers` processes.
+    Results do not depend on the worker count.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(int(workers), 1)
+        self._ex = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+
+    def submit(self, fn, *args) -> Future:
+        if self._ex is not None:
+            return self._ex.submit(fn, *args)
+        f: Future = Future()
+        f.set_result(fn(*args))
+        return f
+
+    def close(self) -> None:
+        if self._ex is not None:
+            self._ex.shutdown(wait=True, cancel_futures=True)
+            self._ex = None
+
+    def __enter__(self) -> "AnalysisPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def ordered_results(pool: AnalysisPool, items, window: int = 0):
+    """
+    items: iterable of (key, fn, args) or (key, None, ready_result); consumed lazily.
+    Yields (key, result) in input order, keeping at most `window` tasks in flight.
+    """
+    window = window or pool.workers * 4
+    pending: deque = deque()
+    for key, fn, arg in items:
+        if fn is None:
+            pending.append((key, None, arg))
+        else:
+            pending.append((key, pool.submit(fn, *arg), None))
+        while pending and (len(pending) > window or pending[0][1] is None or pending[0][1].done()):
+            k, fut, ready = pending.popleft()
+            yield k, (fut.result() if fut is not None else ready)
+    while pending:
+        k, fut, ready = pending.popleft()
+        yield k, (fut.result() if fut is not None else ready)
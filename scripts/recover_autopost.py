@@ -39,17 +39,46 @@ Optional ENV:
   BACKUP_DIR=backups
   MODEL=gpt-4.1-mini
   HTTP_TIMEOUT=30
+  CONTENT_BATCH=50   (post bodies are loaded lazily, this many ids per include= request)
+  STATE_DIR=state    (incremental scan state: modified_after watermark + healthy hashes)
+  FULL_RESCAN=1|0    (default 0; 1 ignores the scan state and re-analyzes everything)
+  WP_MIRROR=1|0      (default 1; categories/related posts come from the local SQLite mirror)
+  UPDATE_MODE=batch|single (default batch; batch groups updates into /wp-json/batch/v1)
+  HTML_PARSER=html.parser|lxml (default html.parser; check scripts/check_parser_parity.py first)
+  ANALYSIS_CACHE=1|0 (default 1; flags/word/image counts per (post id, content sha256, thresholds))
+  ANALYSIS_WORKERS=1 (processes for post analysis; results stay in scan order)
+  OPENAI_STREAM=1|0  (default 1; stream regenerations and abort early on fences/<h1>/prices, see openai_stream.py)
+  STREAM_PRICE_MAX=3, STREAM_RETRIES=1
+  LLM_CACHE=1|0|replay (default 1; generated articles cached until written to WP, see llm_cache.py)
+  REGEN_MODE=sync|batch (default sync; batch submits regenerations to the OpenAI Batch API and
+                     applies finished batches on a later run, see regen_batch.py)
+  UNSPLASH_CACHE=1|0 (default 1; query->URLs disk cache + per-category image pool used once the
+                     hourly quota is gone, see image_search.py)
+  JOURNAL=1|0        (default 1; regenerated HTML + finished updates journaled per post so a
+                     crashed run resumes without regenerating, see run_journal.py)
 """
 
 import os
 import re
 import html
 from datetime import datetime, timedelta, timezone
-from typing import Optional, List, Dict
-
-import requests
-from requests.auth import HTTPBasicAuth
-from bs4 import BeautifulSoup, Comment
+from typing import Optional, List, Dict, Tuple
+
+from wp_client import WPClient
+from openai_stream import GenerationAborted, StreamValidator, check_output
+import llm_cache
+from post_analysis import PostAnalysis, PostScan, AnalysisPool, flags_for, judge_content, ordered_results
+from html_pipeline import (
+    HtmlPipeline, soup_text, regex_remove, dedupe_br, strip_ws, pricing_dom_pass, table_scroll_pass,
+    body_images_pass, append_html_pass, strip_fences_pass, clean_level2_pass, reparse_pass,
+    format_timing_totals,
+)
+from wp_mirror import WPMirror
+from scan_state import ScanState, post_hash, config_fingerprint, ids_not_in
+from analysis_cache import AnalysisCache, content_sha
+from run_journal import Journal, USE_JOURNAL
+from image_search import UnsplashSearch
+from regen_batch import BATCH_GIVE_UP_HOURS, FINAL_STATUSES, BatchState, batch_file_path, fetch_results, submit_batch, write_jsonl
 
 try:
     from zoneinfo import ZoneInfo
@@ -96,12 +125,27 @@ TITLE_MATCH_MIN = float(os.environ.get("TITLE_MATCH_MIN", "0.25"))
 MODEL = os.environ.get("MODEL", "gpt-4.1-mini")
 TIMEOUT = int(os.environ.get("HTTP_TIMEOUT", "30"))
 BACKUP_DIR = os.environ.get("BACKUP_DIR", "backups").strip() or "backups"
+CONTENT_BATCH = int(os.environ.get("CONTENT_BATCH", "50"))
+FULL_RESCAN = os.environ.get("FULL_RESCAN", "0").strip() == "1"
+USE_MIRROR = os.environ.get("WP_MIRROR", "1").strip() != "0"
+UPDATE_MODE = os.environ.get("UPDATE_MODE", "batch").strip().lower()
+USE_ANALYSIS_CACHE = os.environ.get("ANALYSIS_CACHE", "1").strip() != "0"
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", "1"))
+REGEN_MODE = os.environ.get("REGEN_MODE", "sync").strip().lower()
+if REGEN_MODE not in ("sync", "batch"):
+    raise SystemExit(f"REGEN_MODE must be sync or batch, got {REGEN_MODE!r}")
+
+# Bump when should_fix_post logic changes so saved "healthy" judgments are dropped
+HEURISTIC_VERSION = 2
 
 if not (WP_BASE and WP_USER and WP_PASS):
     raise SystemExit("Missing env: WP_BASE, WP_USER, WP_PASS")
 
-auth = HTTPBasicAuth(WP_USER, WP_PASS)
+wp = WPClient(WP_BASE, WP_USER, WP_PASS, timeout=TIMEOUT)
+mirror = WPMirror(wp) if USE_MIRROR else None
 client = OpenAI(api_key=OPENAI_API_KEY) if (OpenAI and OPENAI_API_KEY) else None
+journal = Journal("recover") if USE_JOURNAL else None
+images = UnsplashSearch(wp.session, UNSPLASH_ACCESS_KEY, timeout=TIMEOUT)
 
 
 # -------------------------
@@ -121,43 +165,50 @@ def parse_after_dt_utc(date_ymd_kst: str) -> datetime:
 
 
 # -------------------------
-# WP REST helpers (GET-safe)
+# WP REST helpers (GET-safe, pooled via wp_client)
 # -------------------------
-def _wp_get(path: str, params: Optional[dict] = None):
-    url = f"{WP_BASE}{path}"
-    headers = {"Accept": "application/json"}
-    r = requests.get(url, params=params or {}, headers=headers, auth=auth, timeout=TIMEOUT)
-    ct = (r.headers.get("content-type") or "").lower()
-    if "application/json" not in ct:
-        print("NON-JSON RESPONSE:", r.status_code, ct, "URL:", r.url)
-        print("BODY(head):", (r.text or "")[:300])
-        r.raise_for_status()
-        raise SystemExit("WP did not return JSON (blocked/redirected/WAF).")
-    r.raise_for_status()
-    return r.json()
-
-
-def _wp_list(path: str, params: Optional[dict] = None) -> List[dict]:
-    data = _wp_get(path, params=params)
-    if isinstance(data, dict):
-        raise SystemExit(f"WP API error at {path}: {data.get('code')} / {data.get('message')}")
-    if not isinstance(data, list):
-        raise SystemExit(f"Unexpected WP response type at {path}: {type(data)}")
-    cleaned = [x for x in data if isinstance(x, dict)]
-    if len(cleaned) != len(data):
-        bad = [x for x in data if not isinstance(x, dict)]
-        raise SystemExit(f"Non-dict items in list response at {path}: sample={bad[:2]}")
-    return cleaned
+def _wp_get(path: str, params: Optional[dict] = None, fields: Optional[tuple] = None):
+    return wp.get_json(path, params, fields=fields)
+
+
+def _wp_list(path: str, params: Optional[dict] = None, fields: Optional[tuple] = None) -> List[dict]:
+    return wp.get_list(path, params, fields=fields)
 
 
 def _wp_update_post(post_id: int, payload: dict):
-    url = f"{WP_BASE}/wp-json/wp/v2/posts/{post_id}"
-    headers = {"Accept": "application/json", "Content-Type": "application/json"}
-    r = requests.post(url, json=payload, headers=headers, auth=auth, timeout=TIMEOUT)
-    if r.status_code >= 400:
-        r = requests.put(url, json=payload, headers=headers, auth=auth, timeout=TIMEOUT)
-    r.raise_for_status()
-    return r.json()
+    # POST, or PUT if the server rejected POST on the first update of this run
+    return wp.update_item(f"/wp-json/wp/v2/posts/{post_id}", payload)
+
+
+def _wp_update_posts(updates: List[tuple]) -> Dict[int, Optional[str]]:
+    """
+    Apply [(post_id, payload)] and return {post_id: None on success | error text}.
+    Batch mode sends them through /wp-json/batch/v1 (size probed once per run);
+    only items the batch rejected are retried one by one.
+    """
+    results: Dict[int, Optional[str]] = {}
+    retry = list(updates)
+    if UPDATE_MODE == "batch" and len(updates) > 1 and wp.batch_limit() > 0:
+        items = [("POST", f"/wp-json/wp/v2/posts/{pid}", payload) for pid, payload in updates]
+        retry = []
+        for (pid, payload), (status, body) in zip(updates, wp.batch(items)):
+            if 200 <= status < 300:
+                results[pid] = None
+                print(f"[OK  ] Updated post id={pid} (batch)")
+            else:
+                msg = body.get("message") if isinstance(body, dict) else ""
+                print(f"[WARN] batch update failed id={pid} status={status} {msg}")
+                retry.append((pid, payload))
+
+    for pid, payload in retry:
+        try:
+            _wp_update_post(pid, payload)
+            results[pid] = None
+            print(f"[OK  ] Updated post id={pid}")
+        except Exception as e:
+            results[pid] = str(e)[:300]
+            print(f"[FAIL] Update failed id={pid}: {results[pid]}")
+    return results
 
 
 # -------------------------
@@ -170,7 +221,7 @@ def _safe_filename(s: str) -> str:
 
 def backup_post_html(post_id: int, title_html: str, content_html: str) -> str:
     os.makedirs(BACKUP_DIR, exist_ok=True)
-    title_plain = BeautifulSoup(title_html or "", "html.parser").get_text(" ", strip=True)
+    title_plain = soup_text(title_html or "")
     title_plain = html.unescape(title_plain)
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     fname = f"{ts}_id{post_id}_{_safe_filename(title_plain)}.html"
@@ -185,62 +236,72 @@ def backup_post_html(post_id: int, title_html: str, content_html: str) -> str:
 # -------------------------
 # Detection heuristics
 # -------------------------
-PRINT_STUB_PATTERNS = [
-    r"save\s*(and|or)\s*print\s*checklist",
-    r"print\s*(this)?\s*page",
-    r"print\s*window",
-    r"\bchecklist\b",
-]
-
-def _plain_words(html_text: str) -> int:
-    soup = BeautifulSoup(html_text or "", "html.parser")
-    text = soup.get_text(" ", strip=True)
-    if not text:
-        return 0
-    return len(re.findall(r"\w+", text))
-
-def _looks_like_print_stub(html_text: str) -> bool:
-    t = BeautifulSoup(html_text or "", "html.parser").get_text(" ", strip=True).lower()
-    if not t:
-        return True
-    for pat in PRINT_STUB_PATTERNS:
-        if re.search(pat, t, flags=re.IGNORECASE):
-            if len(t) < 2500:
-                return True
-    return False
-
-def _title_coverage_score(title_html: str, html_text: str) -> float:
-    title_plain = BeautifulSoup(title_html or "", "html.parser").get_text(" ", strip=True)
-    title_plain = html.unescape(title_plain).lower().strip()
-    body_plain = BeautifulSoup(html_text or "", "html.parser").get_text(" ", strip=True).lower()
-    toks = [t for t in re.findall(r"[a-z0-9가-힣]+", title_plain) if len(t) >= 3]
-    if not toks:
-        return 1.0
-    hit = sum(1 for t in toks if t in body_plain)
-    return hit / max(len(toks), 1)
-
-def _body_image_count(html_text: str) -> int:
-    soup = BeautifulSoup(html_text or "", "html.parser")
-    return len(soup.find_all("img"))
-
-def should_fix_post(title_html: str, content_html: str, category_name: str) -> Dict[str, bool]:
-    flags = {"short": False, "stub": False, "title_mismatch": False, "few_images": False}
-    words = _plain_words(content_html)
-    imgc = _body_image_count(content_html)
-
-    if words < MIN_WORDS:
-        flags["short"] = True
-    if _looks_like_print_stub(content_html):
-        flags["stub"] = True
-    if _title_coverage_score(title_html, content_html) < TITLE_MATCH_MIN:
-        flags["title_mismatch"] = True
+def should_fix_post(title_html: str, content_html: str, category_name: str,
+                    analysis=None) -> Dict[str, bool]:
+    """
+    Streaming scan (PostScan, no tree) first; only a post it flags is re-checked
+    on the full DOM (PostAnalysis) and judged on that.
+    analysis: a PostScan/PostAnalysis already built for this post.
+    """
     target_images = get_image_target_by_category(category_name)
-    if imgc < target_images:
-        flags["few_images"] = True
-
+    if analysis is None:
+        return judge_content(title_html, content_html, MIN_WORDS, TITLE_MATCH_MIN, target_images)["flags"]
+    flags = flags_for(analysis, MIN_WORDS, TITLE_MATCH_MIN, target_images)
+    if any(flags.values()) and not isinstance(analysis, PostAnalysis):
+        flags = flags_for(PostAnalysis(content_html, title_html), MIN_WORDS, TITLE_MATCH_MIN, target_images)
     return flags
 
 
+def analysis_key(title_html: str, category_name: str) -> str:
+    """Everything besides the content that the flags depend on (see analysis_cache.py)."""
+    return config_fingerprint({
+        "v": HEURISTIC_VERSION,
+        "min_words": MIN_WORDS,
+        "title_match_min": TITLE_MATCH_MIN,
+        "target_images": get_image_target_by_category(category_name),
+        "title": title_html,
+    })
+
+def post_category(p: dict, cat_map: Dict[int, str]):
+    cat_ids = p.get("categories") or []
+    cat_id = cat_ids[0] if cat_ids else None
+    cat_name = cat_map.get(cat_id, "") if cat_id else ""
+    return cat_id, cat_name
+
+def iter_judged(items, cat_map: Dict[int, str], state: ScanState,
+                cache: Optional[AnalysisCache], pool: AnalysisPool):
+    """
+    (post, content_html, digest, result) in scan order for (post, content_html) items.
+    result is None for a post already judged healthy with the same hash, comes from
+    the analysis cache when content and heuristics are unchanged, and otherwise is
+    judge_content() run on the pool (then stored in the cache).
+    """
+    def tasks():
+        for p, content_html in items:
+            pid = int(p["id"])
+            title_html = (p.get("title") or {}).get("rendered", "")
+            _, cat_name = post_category(p, cat_map)
+            digest = post_hash(title_html, content_html, cat_name)
+            if state.is_known_healthy(pid, digest):
+                yield (p, content_html, digest, None, None), None, None
+                continue
+            sha = hkey = None
+            if cache:
+                sha = content_sha(content_html)
+                hkey = analysis_key(title_html, cat_name)
+                hit = cache.get(pid, sha, hkey)
+                if hit is not None:
+                    yield (p, content_html, digest, None, None), None, hit
+                    continue
+            args = (title_html, content_html, MIN_WORDS, TITLE_MATCH_MIN, get_image_target_by_category(cat_name))
+            yield (p, content_html, digest, sha, hkey), judge_content, args
+
+    for (p, content_html, digest, sha, hkey), res in ordered_results(pool, tasks()):
+        if cache and hkey:
+            cache.put(int(p["id"]), sha, hkey, res)
+        yield p, content_html, digest, res
+
+
 # -------------------------
 # Content transforms (pricing, tables, fences)
 # -------------------------
@@ -253,68 +314,29 @@ PRICE_PATTERNS = [
     r"\bfrom\s+\$\s?\d[\d,]*(\.\d+)?",
     r"\bstarting\s+at\s+\$\s?\d[\d,]*(\.\d+)?",
 ]
+# literals every match of the pattern above contains (same order) - keep in sync
+PRICE_KEYWORDS = [("$",), ("usd",), ("usd", "달러"), ("원", "krw"), ("pric", "cost"), ("$",), ("$",)]
+# compiled once per process (see html_pipeline.regex_remove)
+scrub_price_text = regex_remove(PRICE_PATTERNS, PRICE_KEYWORDS)
 
 def strip_pricing(html_text: str) -> str:
     if not html_text:
         return html_text
+    return HtmlPipeline(
+        pre=[("price_regex", scrub_price_text)],
+        passes=[("strip_pricing", pricing_dom_pass)],
+    ).run(html_text)
 
-    for pat in PRICE_PATTERNS:
-        html_text = re.sub(pat, "", html_text, flags=re.IGNORECASE)
-
-    soup = BeautifulSoup(html_text, "html.parser")
-
-    # Remove explicit pricing paragraphs
-    for p in list(soup.find_all(["p", "li"])):
-        t = p.get_text(" ", strip=True).lower()
-        if any(k in t for k in ["pricing", "price", "cost", "per month", "usd", "$", "krw", "원"]) and any(ch.isdigit() for ch in t):
-            p.decompose()
-
-    # Remove price columns / rows from tables
-    for table in soup.find_all("table"):
-        rows = table.find_all("tr")
-        if not rows:
-            continue
-        header_cells = rows[0].find_all(["th", "td"])
-        header_texts = [c.get_text(" ", strip=True).lower() for c in header_cells]
-        price_cols = [i for i, t in enumerate(header_texts) if any(k in t for k in ["price", "pricing", "cost", "plan"])]
-        if price_cols:
-            for tr in rows:
-                cells = tr.find_all(["th", "td"])
-                for idx in sorted(price_cols, reverse=True):
-                    if idx < len(cells):
-                        cells[idx].decompose()
-        for tr in list(table.find_all("tr")):
-            t = tr.get_text(" ", strip=True).lower()
-            if ("$" in t) or ("usd" in t) or ("/mo" in t) or ("per month" in t) or ("krw" in t):
-                tr.decompose()
-
-    return str(soup)
-
-def fix_tables(html_text: str) -> str:
-    if not html_text:
-        return html_text
-    soup = BeautifulSoup(html_text, "html.parser")
-    changed = False
-    for table in soup.find_all("table"):
-        if table.parent and table.parent.name == "div" and "table-scroll" in (table.parent.get("class") or []):
-            continue
-        wrapper = soup.new_tag("div")
-        wrapper["class"] = ["table-scroll"]
-        table.wrap(wrapper)
-        changed = True
-
-    if changed:
-        style_id = "ri-table-scroll-style"
-        if not soup.find("style", attrs={"id": style_id}):
-            style = soup.new_tag("style")
-            style["id"] = style_id
-            style.string = """
+TABLE_SCROLL_CSS = """
 .table-scroll{overflow-x:auto;-webkit-overflow-scrolling:touch;margin:18px 0;border:1px solid rgba(0,0,0,.08);border-radius:12px}
 .table-scroll table{min-width:640px;width:100%;border-collapse:collapse}
 .table-scroll th,.table-scroll td{padding:10px 12px}
 """
-            soup.insert(0, style)
-    return str(soup)
+
+def fix_tables(html_text: str) -> str:
+    if not html_text:
+        return html_text
+    return HtmlPipeline([("fix_tables", table_scroll_pass(TABLE_SCROLL_CSS))]).run(html_text)
 
 def strip_markdown_fences(s: str) -> str:
     if not s:
@@ -358,165 +380,45 @@ ALLOWED_ATTRS = {
 def clean_level2_html(html_text: str) -> str:
     if not html_text:
         return html_text
-
-    # Remove any fenced blocks quickly
-    html_text = strip_markdown_fences(html_text)
-
-    soup = BeautifulSoup(html_text, "html.parser")
-
-    # Remove HTML comments (incl Gutenberg <!-- wp:... -->)
-    for c in soup.find_all(string=lambda t: isinstance(t, Comment)):
-        c.extract()
-
-    # Drop scripts/iframes/forms entirely
-    for tag in soup.find_all(["script","iframe","form","input","button","textarea","noscript"]):
-        tag.decompose()
-
-    # Remove H1 (avoid duplicate title)
-    for h1 in soup.find_all("h1"):
-        h1.decompose()
-
-    # Flatten disallowed tags: unwrap or remove
-    for tag in list(soup.find_all(True)):
-        if tag.name not in ALLOWED_TAGS:
-            tag.unwrap()
-
-    # Remove dangerous attrs, normalize link rel
-    for tag in soup.find_all(True):
-        allowed = ALLOWED_ATTRS.get(tag.name, set())
-        if allowed:
-            tag.attrs = {k: v for k, v in tag.attrs.items() if k in allowed}
-        else:
-            tag.attrs = {}
-
-        if tag.name == "a":
-            href = (tag.get("href") or "").strip()
-            # Drop javascript: links
-            if href.lower().startswith("javascript:"):
-                tag.unwrap()
-                continue
-            # External links get noopener/noreferrer if target=_blank
-            if tag.get("target") == "_blank":
-                rel = (tag.get("rel") or [])
-                if isinstance(rel, str):
-                    rel = rel.split()
-                rel_set = set(rel)
-                rel_set.update({"noopener", "noreferrer"})
-                tag["rel"] = " ".join(sorted(rel_set))
-            # If empty anchor text, unwrap
-            if not tag.get_text(" ", strip=True) and not tag.find("img"):
-                tag.unwrap()
-
-        if tag.name == "img":
-            # Ensure loading=lazy
-            if not tag.get("loading"):
-                tag["loading"] = "lazy"
-
-    # Remove empty p/div/span (unless contains img)
-    for tag in list(soup.find_all(["p","div","span","figure"])):
-        if tag.find("img"):
-            continue
-        if not tag.get_text(" ", strip=True):
-            tag.decompose()
-
-    # Deduplicate consecutive <br> (more than 2)
-    out = str(soup)
-    out = re.sub(r"(<br\s*/?>\s*){3,}", "<br/><br/>", out, flags=re.IGNORECASE)
-
-    # Trim whitespace
-    return out.strip()
+    return HtmlPipeline(
+        pre=[("strip_fences", strip_markdown_fences)],
+        passes=[("clean_level2", clean_level2_pass(ALLOWED_TAGS, ALLOWED_ATTRS))],
+        post=[("br_dedupe", dedupe_br), ("strip", strip_ws)],
+    ).run(html_text)
 
 
 # -------------------------
 # Unsplash images
 # -------------------------
-def unsplash_search(query: str, count: int = 3) -> List[str]:
-    if not UNSPLASH_ACCESS_KEY:
-        return []
-    try:
-        url = "https://api.unsplash.com/search/photos"
-        params = {
-            "query": query,
-            "per_page": min(max(count, 3), 10),
-            "orientation": "landscape",
-            "content_filter": "high",
-        }
-        headers = {"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"}
-        r = requests.get(url, params=params, headers=headers, timeout=TIMEOUT)
-        r.raise_for_status()
-        data = r.json()
-        results = data.get("results", [])
-        urls = []
-        for item in results:
-            u = item.get("urls", {}).get("regular")
-            if u:
-                urls.append(u)
-        return urls[:count]
-    except Exception:
-        return []
+def unsplash_search(query: str, count: int = 3, pool: str = "") -> List[str]:
+    # 디스크 캐시(TTL/LRU) + 카테고리별 풀: 쿼터 소진 후에도 풀에서 채움 (image_search.py)
+    return images.search(query, count, pool=pool)
+
+def _image_search(topic: str, count: int, pool: str = "") -> List[str]:
+    return unsplash_search(topic, count=count, pool=pool)
 
 def ensure_body_images(html_text: str, topic: str) -> str:
     if BODY_IMAGE_COUNT <= 0:
         return html_text
-    soup = BeautifulSoup(html_text or "", "html.parser")
-    imgs = soup.find_all("img")
-    if len(imgs) >= BODY_IMAGE_COUNT:
-        return str(soup)
-
-    need = BODY_IMAGE_COUNT - len(imgs)
-    urls = unsplash_search(topic, count=max(need, BODY_IMAGE_COUNT))
-    if not urls:
-        return str(soup)
-
-    h2s = soup.find_all(["h2", "h3"])
-    insert_points = []
-    if h2s:
-        insert_points = [h2s[0]]
-        if len(h2s) >= 2:
-            insert_points.append(h2s[len(h2s)//2])
-        if len(h2s) >= 3:
-            insert_points.append(h2s[-1])
-    else:
-        insert_points = [soup.find() or soup]
-
-    def make_img(url: str, alt: str):
-        fig = soup.new_tag("figure")
-        fig["class"] = ["wp-block-image", "size-large"]
-        img = soup.new_tag("img")
-        img["src"] = url
-        img["alt"] = alt
-        img["loading"] = "lazy"
-        img["style"] = "width:100%;border-radius:14px;margin:26px 0;"
-        fig.append(img)
-        return fig
-
-    for i in range(need):
-        fig = make_img(urls[i % len(urls)], f"{topic} illustration")
-        anchor = insert_points[i % len(insert_points)]
-        anchor.insert_before(fig)
-
-    return str(soup)
+    return HtmlPipeline(
+        [("ensure_body_images", body_images_pass(BODY_IMAGE_COUNT, _image_search, topic))]
+    ).run(html_text)
 
 
 # -------------------------
 # Internal links
 # -------------------------
 def get_categories_map() -> Dict[int, str]:
-    cats: List[dict] = []
-    page = 1
-    while True:
-        chunk = _wp_list("/wp-json/wp/v2/categories", {"per_page": 100, "page": page})
-        if not chunk:
-            break
-        cats.extend(chunk)
-        if len(chunk) < 100:
-            break
-        page += 1
+    if mirror:
+        return mirror.category_map()
+    cats = wp.get_all_pages("/wp-json/wp/v2/categories", fields=("id", "name"))
     return {c["id"]: c.get("name", "") for c in cats}
 
 def get_related_posts(cat_id: Optional[int], exclude_id: int, k: int) -> List[dict]:
     if not cat_id or k <= 0:
         return []
+    if mirror:
+        return mirror.related_posts(cat_id, exclude_id, k)
     rel = _wp_list(
         "/wp-json/wp/v2/posts",
         {
@@ -527,6 +429,7 @@ def get_related_posts(cat_id: Optional[int], exclude_id: int, k: int) -> List[di
             "orderby": "date",
             "order": "desc",
         },
+        fields=("id", "link", "title"),
     )
     out = []
     for p in rel:
@@ -543,7 +446,7 @@ def make_related_block(related: List[dict]) -> str:
     items = []
     for p in related:
         link = (p.get("link") or "").strip()
-        title = BeautifulSoup((p.get("title") or {}).get("rendered", ""), "html.parser").get_text(" ", strip=True)
+        title = soup_text((p.get("title") or {}).get("rendered", ""))
         if link and title:
             items.append(f'<li><a href="{link}">{html.escape(title)}</a></li>')
     if not items:
@@ -574,16 +477,43 @@ def make_print_checklist_block(title: str) -> str:
 # -------------------------
 # Regeneration
 # -------------------------
-def regenerate_article(title_html: str, category_name: str, related: List[dict]) -> str:
-    if not client:
-        raise SystemExit("OPENAI_API_KEY not set (required).")
+def build_regen_pipeline(title: str, related: List[dict], category: str = "") -> HtmlPipeline:
+    """
+    strip_pricing -> fix_tables -> ensure_body_images -> + related/checklist blocks
+    -> clean_level2_html, as passes over one parse (same bytes as chaining them).
+    """
+    # reparse: wherever the chain parsed again (only acts when a reparse changes the bytes)
+    passes = [
+        ("strip_pricing", pricing_dom_pass),
+        ("reparse", reparse_pass),
+        ("fix_tables", table_scroll_pass(TABLE_SCROLL_CSS)),
+    ]
+    if BODY_IMAGE_COUNT > 0:
+        search = (lambda q, n: _image_search(q, n, pool=category)) if category else _image_search
+        passes += [
+            ("reparse", reparse_pass),
+            ("ensure_body_images", body_images_pass(BODY_IMAGE_COUNT, search, title)),
+        ]
+    passes += [
+        ("append_blocks", append_html_pass([make_related_block(related), make_print_checklist_block(title)])),
+        ("strip_fences", strip_fences_pass),
+        ("reparse", reparse_pass),
+        ("clean_level2", clean_level2_pass(ALLOWED_TAGS, ALLOWED_ATTRS)),
+    ]
+    return HtmlPipeline(
+        passes,
+        pre=[("price_regex", scrub_price_text)],
+        post=[("br_dedupe", dedupe_br), ("strip", strip_ws)],
+    )
 
-    title = BeautifulSoup(title_html or "", "html.parser").get_text(" ", strip=True)
+def regen_request(title_html: str, category_name: str, related: List[dict]) -> Tuple[str, dict]:
+    """(plain title, chat.completions request body) for one regeneration (sync or batch)."""
+    title = soup_text(title_html or "")
     title = html.unescape(title).strip()
 
     related_titles = []
     for p in related:
-        t = BeautifulSoup((p.get("title") or {}).get("rendered", ""), "html.parser").get_text(" ", strip=True)
+        t = soup_text((p.get("title") or {}).get("rendered", ""))
         if t:
             related_titles.append(t)
     related_titles = related_titles[:INTERNAL_LINKS]
@@ -615,13 +545,39 @@ Hard requirements (must follow):
 Return HTML only.
 """.strip()
 
-    resp = client.chat.completions.create(
-        model=MODEL,
-        messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
-        temperature=0.6,
-    )
-    html_out = (resp.choices[0].message.content or "")
-    html_out = strip_markdown_fences(html_out)
+    return title, {
+        "model": MODEL,
+        "messages": [{"role": "system", "content": system}, {"role": "user", "content": user}],
+        "temperature": 0.6,
+    }
+
+
+def regen_validator() -> StreamValidator:
+    # ```html 래퍼는 strip_markdown_fences가 지우므로 허용, 본문 안 fence/h1/가격이면 중단
+    return StreamValidator(wrapper_ok=True)
+
+
+def regenerate_article(title_html: str, category_name: str, related: List[dict], tag: str = "") -> str:
+    if not client:
+        raise SystemExit("OPENAI_API_KEY not set (required).")
+
+    title, body = regen_request(title_html, category_name, related)
+    # scope=post-<id>: 제목/카테고리/관련글이 같은 다른 글과 생성 결과를 공유하지 않도록
+    html_out = llm_cache.cached_chat(client, f"recover:{title[:40]}", regen_validator(), tag=tag, scope=tag, **body)
+    return finish_regenerated(html_out, title, related, category=category_name)
+
+
+def journaled_html(key: str, src_sha: str) -> Optional[str]:
+    """HTML regenerated by an earlier run that died before the update, if the original is unchanged."""
+    rec = journal.get(key, "html") if journal else None
+    if not rec or rec.get("src_sha") != src_sha:
+        return None
+    return journal.get_html(rec["sha"])
+
+
+def finish_regenerated(html_out: str, title: str, related: List[dict], category: str = "") -> str:
+    """Post-processing of a generated article (shared by sync and batch mode)."""
+    html_out = strip_markdown_fences(html_out or "")
 
     # Fill placeholders with real URLs (best-effort)
     placeholders = {}
@@ -631,116 +587,347 @@ Return HTML only.
     for ph, url in placeholders.items():
         html_out = html_out.replace(ph, url if url else "#")
 
-    # Normalize & add features
-    html_out = strip_pricing(html_out)
-    html_out = fix_tables(html_out)
-    html_out = ensure_body_images(html_out, title)
+    # Normalize & add features + CLEAN LEVEL 2, all on one parsed DOM
+    return build_regen_pipeline(title, related, category=category).run(html_out)
 
-    html_out = html_out + "\n" + make_related_block(related)
-    html_out = html_out + "\n" + make_print_checklist_block(title)
 
-    # CLEAN LEVEL 2
-    html_out = clean_level2_html(html_out)
+# -------------------------
+# Batch regeneration (REGEN_MODE=batch, see regen_batch.py)
+# -------------------------
+def collect_batches(bstate: BatchState) -> int:
+    """
+    Phase 2: apply every batch that reached a final status. Returns the number of
+    posts regenerated. In DRY_RUN nothing is written and statuses stay "submitted".
+    """
+    applied = 0
+    for bid in list(bstate.batches):
+        b = bstate.batches[bid]
+        waiting = [int(pid) for pid, meta in b["posts"].items() if meta.get("status") == "submitted"]
+        try:
+            status, results = fetch_results(client, bid)
+        except Exception as e:
+            age = bstate.age_hours(bid)
+            print(f"[WARN] batch {bid} lookup failed (age={age:.0f}h): {str(e)[:200]}")
+            if age >= BATCH_GIVE_UP_HOURS and not DRY_RUN:
+                for pid in waiting:
+                    bstate.set_status(bid, pid, "failed")
+                bstate.save()
+            continue
+        b["status"] = status
+        print(f"[BATCH] {bid} status={status} waiting={len(waiting)} results={len(results)}")
+        if status not in FINAL_STATUSES or not waiting:
+            continue
 
-    return html_out
+        # 제출 이후 글이 바뀌었으면 (수동 수정 등) 덮어쓰지 않음
+        metas = get_posts_by_ids(waiting)
+        contents = load_contents(metas)
+
+        updates: List[tuple] = []
+        for pid in waiting:
+            meta = b["posts"][str(pid)]
+            out, err = results.get(pid, (None, f"no output (batch {status})"))
+            reason = check_output(regen_validator(), out) if out is not None else None
+            if out is None:
+                verdict = "failed"
+                print(f"[BATCH] id={pid} failed: {err[:200]}")
+            elif pid not in contents or content_sha(contents[pid]) != meta.get("content_sha"):
+                verdict = "stale"
+                print(f"[BATCH] id={pid} changed since submit -> skipped (re-checked by the next scan)")
+            elif reason:
+                verdict = "rejected"
+                print(f"[BATCH] id={pid} rejected: {reason}")
+            else:
+                new_html = finish_regenerated(out, meta["title"], meta.get("related") or [], category=meta.get("cat_name") or "")
+                new_a = PostScan(new_html)
+                print(f"[GEN ] id={pid} regenerated_words={new_a.words} regenerated_imgs={new_a.images} (batch)")
+                applied += 1
+                if DRY_RUN:
+                    print(f"[DRY ] Would update post id={pid}")
+                    continue
+                backup_path = backup_post_html(pid, meta["title_html"], contents[pid])
+                print(f"[BAK ] Saved original HTML -> {backup_path}")
+                updates.append((pid, {"content": new_html}))
+                continue
+            if not DRY_RUN:
+                bstate.set_status(bid, pid, verdict)
+
+        if updates:
+            for pid, err in _wp_update_posts(updates).items():
+                bstate.set_status(bid, pid, "failed" if err else "updated")
+        if not DRY_RUN:
+            bstate.save()
+    if not DRY_RUN:
+        bstate.save()
+    return applied
+
+
+def submit_regen_batch(bstate: BatchState, reqs: List[Tuple[int, dict]], metas: Dict[int, dict]) -> None:
+    """Phase 1: write the prompts of this run's flagged posts as one JSONL batch and submit it."""
+    if not reqs:
+        return
+    path = batch_file_path()
+    size = write_jsonl(path, reqs)
+    if DRY_RUN:
+        print(f"[DRY ] Would submit batch requests={len(reqs)} file={path} ({size} bytes)")
+        return
+    batch_id, file_id = submit_batch(client, path)
+    bstate.add(batch_id, file_id, metas)
+    bstate.save()
+    print(f"[BATCH] submitted {batch_id} requests={len(reqs)} file={path} ({size} bytes)")
 
 
 # -------------------------
 # Post iteration
 # -------------------------
-def get_posts(status: str, after_dt_utc: datetime) -> List[dict]:
-    posts: List[dict] = []
-    page = 1
+# The scan only needs metadata; content.rendered is loaded lazily (see iter_with_content)
+SCAN_FIELDS = ("id", "status", "date", "modified_gmt", "title", "categories")
+CONTENT_FIELDS = ("id", "content")
+
+def get_posts(status: str, after_dt_utc: datetime, fields: Optional[tuple] = SCAN_FIELDS,
+              modified_after: Optional[str] = None) -> List[dict]:
     after_iso = after_dt_utc.isoformat().replace("+00:00", "Z")
-    while True:
-        chunk = _wp_list(
-            "/wp-json/wp/v2/posts",
-            {
-                "per_page": 100,
-                "page": page,
-                "status": status,
-                "orderby": "date",
-                "order": "asc",
-                "after": after_iso,
-            },
-        )
-        if not chunk:
-            break
-        posts.extend(chunk)
-        if len(chunk) < 100:
-            break
-        page += 1
-    return posts
+    params = {
+        "status": status,
+        "orderby": "date",
+        "order": "asc",
+        "after": after_iso,
+    }
+    if modified_after:
+        params["modified_after"] = modified_after
+    # Pages 2..N are fetched concurrently once X-WP-TotalPages is known (order preserved)
+    return wp.get_all_pages("/wp-json/wp/v2/posts", params, fields=fields)
+
+
+def get_posts_by_ids(ids: List[int]) -> List[dict]:
+    """Scan metadata for specific ids (pending posts from the last run), any status."""
+    out: List[dict] = []
+    for st in ("publish", "future"):
+        items = wp.get_by_ids("/wp-json/wp/v2/posts", ids, {"status": st}, fields=SCAN_FIELDS)
+        out.extend(items[i] for i in ids if i in items)
+    return out
+
+
+def load_contents(posts: List[dict]) -> Dict[int, str]:
+    """Fetch content.rendered for the given posts in id-batched include= requests."""
+    out: Dict[int, str] = {}
+    by_status: Dict[str, List[int]] = {}
+    for p in posts:
+        by_status.setdefault(p.get("status") or "publish", []).append(int(p["id"]))
+    for st, ids in by_status.items():
+        # status 콤마 리스트를 거부하는 환경이 있어 status별로 따로 요청
+        items = wp.get_by_ids("/wp-json/wp/v2/posts", ids, {"status": st},
+                              fields=CONTENT_FIELDS, batch_size=CONTENT_BATCH)
+        for pid, it in items.items():
+            out[pid] = (it.get("content") or {}).get("rendered", "")
+    # 스캔 이후 상태가 바뀐 글 (future -> publish 등): 다른 status로 한 번 더 조회
+    for st in ("publish", "future"):
+        missing = [pid for sst, ids in by_status.items() if sst != st for pid in ids if pid not in out]
+        if not missing:
+            continue
+        items = wp.get_by_ids("/wp-json/wp/v2/posts", missing, {"status": st},
+                              fields=CONTENT_FIELDS, batch_size=CONTENT_BATCH)
+        for pid, it in items.items():
+            out[pid] = (it.get("content") or {}).get("rendered", "")
+    return out
+
+
+def iter_with_content(posts: List[dict]):
+    """
+    Yield (post, content_html) in scan order, loading bodies one batch ahead of use.
+    Stopping early (MAX_FIX) means later bodies are never downloaded. A post whose
+    body could not be loaded (trashed / made private since the scan) is not yielded,
+    so it is never judged on an empty body and stays pending for the next run.
+    """
+    n = max(CONTENT_BATCH, 1)
+    for i in range(0, len(posts), n):
+        batch = posts[i:i + n]
+        contents = load_contents(batch)
+        for p in batch:
+            pid = int(p["id"])
+            if pid not in contents:
+                print(f"[SKIP] id={pid} body not loaded (status changed since scan?) -> pending")
+                continue
+            yield p, contents[pid]
 
 
 def main():
     after_dt_utc = parse_after_dt_utc(AFTER_DATE_KST)
     print(f"[INFO] AFTER_DATE_KST={AFTER_DATE_KST} => AFTER_UTC={after_dt_utc.isoformat()}")
     print(f"[INFO] DRY_RUN={DRY_RUN} MAX_FIX={MAX_FIX} MIN_WORDS={MIN_WORDS} INTERNAL_LINKS={INTERNAL_LINKS} BODY_IMAGE_COUNT={BODY_IMAGE_COUNT} TITLE_MATCH_MIN={TITLE_MATCH_MIN} MODEL={MODEL}")
-    print(f"[INFO] UNSPLASH={'ON' if bool(UNSPLASH_ACCESS_KEY) else 'OFF'} BACKUP_DIR={BACKUP_DIR}")
+    print(f"[INFO] UNSPLASH={'ON' if bool(UNSPLASH_ACCESS_KEY) else 'OFF'} BACKUP_DIR={BACKUP_DIR} ANALYSIS_WORKERS={ANALYSIS_WORKERS}")
+
+    if mirror:
+        mirror.sync(media=False)
 
     cat_map = get_categories_map()
+    if journal:
+        journal.load()
+
+    bstate = BatchState().load() if REGEN_MODE == "batch" else None
+    batch_applied = 0
+    if bstate is not None and client:
+        batch_applied = collect_batches(bstate)
+    in_flight = bstate.in_flight() if bstate is not None else {}
+    batch_reqs: List[Tuple[int, dict]] = []
+    batch_metas: Dict[int, dict] = {}
+
+    state = ScanState(config_fingerprint({
+        "v": HEURISTIC_VERSION,
+        "after": AFTER_DATE_KST,
+        "min_words": MIN_WORDS,
+        "body_images": BODY_IMAGE_COUNT,
+        "title_match_min": TITLE_MATCH_MIN,
+    }))
+    if not FULL_RESCAN:
+        state.load()
+    modified_after = state.query_after() if state.loaded else None
+    print(f"[SCAN] mode={'incremental' if modified_after else 'full'} modified_after={modified_after} FULL_RESCAN={FULL_RESCAN}")
 
     candidates: List[dict] = []
     for st in ("publish", "future"):
-        ps = get_posts(st, after_dt_utc)
+        ps = get_posts(st, after_dt_utc, modified_after=modified_after)
         print(f"[SCAN] status={st} posts={len(ps)}")
         candidates.extend(ps)
 
-    fixed = 0
-    for p in candidates:
-        pid = int(p["id"])
-        title_html = (p.get("title") or {}).get("rendered", "")
-        content_html = (p.get("content") or {}).get("rendered", "")
-
-        cat_ids = p.get("categories") or []
-        cat_id = cat_ids[0] if cat_ids else None
-        cat_name = cat_map.get(cat_id, "") if cat_id else ""
+    if modified_after:
+        missing = ids_not_in(candidates, state.pending)
+        if missing:
+            ps = get_posts_by_ids(missing)
+            # 휴지통/삭제/비공개 전환된 글은 다시 조회해도 안 나온다 -> pending에서 제거
+            gone = ids_not_in(ps, set(missing))
+            state.forget(gone)
+            print(f"[SCAN] pending from last run={len(missing)} found={len(ps)} dropped={len(gone)}")
+            candidates.extend(ps)
 
-        flags = should_fix_post(title_html, content_html, cat_name)
-        if not any(flags.values()):
-            continue
-
-        related = get_related_posts(cat_id, exclude_id=pid, k=INTERNAL_LINKS)
+    for p in candidates:
+        state.seen(p)
 
-        title_plain = BeautifulSoup(title_html, "html.parser").get_text(" ", strip=True)
-        words = _plain_words(content_html)
-        imgc = _body_image_count(content_html)
-        target_imgs = get_image_target_by_category(cat_name)
-        print(f"[FLAG] id={pid} words={words} imgs={imgc} target_imgs={target_imgs} cat={cat_name} flags={flags} title={title_plain!r}")
+    fixed = 0
+    update_queue: List[tuple] = []
+    update_failed: List[int] = []
+
+    def flush_updates():
+        if not update_queue:
+            return
+        res = _wp_update_posts(update_queue)
+        update_failed.extend(pid for pid, err in res.items() if err)
+        for pid, err in res.items():
+            if not err:
+                llm_cache.consume(f"post-{pid}")
+                if journal:
+                    journal.finish(f"post-{pid}")
+        update_queue.clear()
+
+    cache = AnalysisCache(read=not FULL_RESCAN) if USE_ANALYSIS_CACHE else None
+
+    judged = set()
+    skipped_same = 0
+    pool = AnalysisPool(ANALYSIS_WORKERS)
+    try:
+        for p, content_html, digest, res in iter_judged(iter_with_content(candidates), cat_map, state, cache, pool):
+            pid = int(p["id"])
+            title_html = (p.get("title") or {}).get("rendered", "")
+            cat_id, cat_name = post_category(p, cat_map)
+
+            judged.add(pid)
+            if res is None:
+                skipped_same += 1
+                continue
 
+            flags = res["flags"]
+            if not any(flags.values()):
+                state.mark_healthy(pid, digest)
+                continue
+            # flagged: re-check next run until it is fixed (or judged healthy)
+            state.mark_pending(pid)
 
-        related = get_related_posts(cat_id, exclude_id=pid, k=INTERNAL_LINKS)
+            related = get_related_posts(cat_id, exclude_id=pid, k=INTERNAL_LINKS)
 
-        title_plain = BeautifulSoup(title_html, "html.parser").get_text(" ", strip=True)
-        words = _plain_words(content_html)
-        imgc = _body_image_count(content_html)
-        print(f"[FLAG] id={pid} words={words} imgs={imgc} cat={cat_name} flags={flags} title={title_plain!r}")
+            target_imgs = get_image_target_by_category(cat_name)
+            print(f"[FLAG] id={pid} words={res['words']} imgs={res['images']} target_imgs={target_imgs} cat={cat_name} flags={flags} title={res['title_plain']!r}")
 
-        if not client:
-            print("[SKIP] No OPENAI_API_KEY. Cannot regenerate.")
-            continue
+            if not client:
+                print("[SKIP] No OPENAI_API_KEY. Cannot regenerate.")
+                continue
 
-        new_html = regenerate_article(title_html, cat_name, related)
-        new_words = _plain_words(new_html)
-        new_imgc = _body_image_count(new_html)
-        print(f"[GEN ] id={pid} regenerated_words={new_words} regenerated_imgs={new_imgc}")
-
-        if DRY_RUN:
-            print(f"[DRY ] Would update post id={pid}")
-        else:
-            backup_path = backup_post_html(pid, title_html, content_html)
-            print(f"[BAK ] Saved original HTML -> {backup_path}")
-            _wp_update_post(pid, {"content": new_html})
-            print(f"[OK  ] Updated post id={pid}")
+            if bstate is not None:
+                if pid in in_flight:
+                    print(f"[BATCH] id={pid} already submitted in {in_flight[pid]}")
+                    continue
+                title, body = regen_request(title_html, cat_name, related)
+                batch_reqs.append((pid, body))
+                batch_metas[pid] = {
+                    "title": title,
+                    "title_html": title_html,
+                    "cat_name": cat_name,
+                    "related": [{"title": p.get("title") or {}, "link": p.get("link") or ""} for p in related],
+                    "content_sha": content_sha(content_html),
+                }
+                fixed += 1
+                if fixed >= MAX_FIX:
+                    print("[DONE] Reached MAX_FIX limit.")
+                    break
+                continue
 
-        fixed += 1
-        if fixed >= MAX_FIX:
-            print("[DONE] Reached MAX_FIX limit.")
-            break
+            key = f"post-{pid}"
+            src_sha = content_sha(content_html)
+            new_html = journaled_html(key, src_sha)
+            if new_html is not None:
+                print(f"[JOURNAL] id={pid} resume regenerated html (no OpenAI call)")
+            else:
+                try:
+                    new_html = regenerate_article(title_html, cat_name, related, tag=key)
+                except GenerationAborted as e:
+                    # 다음 실행에서 다시 시도 (pending 유지)
+                    print(f"[ABORT] id={pid} {e}")
+                    continue
+                if journal:
+                    journal.record(key, "html", sha=journal.put_html(new_html), src_sha=src_sha)
+            new_a = PostScan(new_html)
+            print(f"[GEN ] id={pid} regenerated_words={new_a.words} regenerated_imgs={new_a.images}")
+
+            if DRY_RUN:
+                print(f"[DRY ] Would update post id={pid}")
+            else:
+                backup_path = backup_post_html(pid, title_html, content_html)
+                print(f"[BAK ] Saved original HTML -> {backup_path}")
+                update_queue.append((pid, {"content": new_html}))
+                if UPDATE_MODE != "batch" or len(update_queue) >= max(wp.batch_limit(), 1):
+                    flush_updates()
+
+            fixed += 1
+            if fixed >= MAX_FIX:
+                print("[DONE] Reached MAX_FIX limit.")
+                break
+    finally:
+        pool.close()
+
+    flush_updates()
+    if bstate is not None:
+        submit_regen_batch(bstate, batch_reqs, batch_metas)
+    if cache:
+        cache.close()
+
+    # posts never reached (MAX_FIX) or whose body did not load stay pending so the watermark can still advance
+    for p in candidates:
+        if int(p["id"]) not in judged:
+            state.mark_pending(int(p["id"]))
+    state.save()
 
-    print(f"[DONE] fixed={fixed} (DRY_RUN={DRY_RUN})")
+    print(f"[HTML] pipeline timings: {format_timing_totals()}")
+    if bstate is not None:
+        print(f"[DONE] batch: applied={batch_applied} submitted={len(batch_reqs)} in_flight={len(bstate.in_flight())}")
+    print(f"[DONE] fixed={fixed} unchanged_skipped={skipped_same} (DRY_RUN={DRY_RUN})")
+    if update_failed:
+        raise SystemExit(f"Updates failed for post ids: {sorted(update_failed)}")
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        wp.print_stats()
+        llm_cache.print_stats()
+        images.print_stats()
+        if journal:
+            journal.close()
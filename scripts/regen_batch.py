@@ -0,0 +1,190 @@
+"""
+Two-phase OpenAI Batch API regeneration for recover_autopost.py (REGEN_MODE=batch).
+
+Phase 1 (run N): every flagged post's regenerate_article prompt becomes one line
+of a JSONL batch (custom_id "post-<id>"), uploaded with purpose=batch and
+submitted to /v1/chat/completions with a 24h window.
+Phase 2 (run N+k): batches that reached a final status are downloaded; each
+output goes through the same post-processing as a synchronous regeneration and
+is written back to WP. Posts still in flight are not submitted again.
+
+Batch requests are billed at half the synchronous price and the workflow no
+longer waits on generation.
+
+File: $STATE_DIR/recover_batch.json (default state/recover_batch.json)
+  {
+    "batches": {
+      "batch_abc": {
+        "created": "2026-03-01T01:00:00Z", "status": "in_progress", "input_file": "file-..",
+        "posts": {
+          "123": {"status": "submitted", "title_html": "..", "cat_name": "..",
+                  "related": [{"title": {"rendered": ".."}, "link": ".."}],
+                  "content_sha": "<sha256 of content at submit>"}
+        }
+      }
+    }
+  }
+
+Per-post status: submitted -> updated | dry | stale (post changed since submit)
+| rejected (failed validation) | failed (request error / missing output / WP error).
+A batch is dropped from the file once none of its posts is still "submitted";
+failed/stale/rejected posts stay pending in the scan state and are resubmitted
+by a later scan.
+
+Offline testing: scripts/fake_openai_batch.py serves the files/batches endpoints
+(OPENAI_BASE_URL=http://127.0.0.1:<port>/v1).
+"""
+
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+STATE_DIR = os.environ.get("STATE_DIR", "state").strip() or "state"
+# 이 시간이 지나도 조회가 안 되는 배치는 포기 (글은 다음 스캔에서 다시 제출)
+BATCH_GIVE_UP_HOURS = float(os.environ.get("BATCH_GIVE_UP_HOURS", "72"))
+
+# 이 상태가 되면 더 기다려도 결과가 안 바뀜 (expired/cancelled도 부분 결과는 있을 수 있음)
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def custom_id(pid: int) -> str:
+    return f"post-{pid}"
+
+
+def pid_from_custom_id(cid: str) -> Optional[int]:
+    try:
+        return int(str(cid).rsplit("-", 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+class BatchState:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(STATE_DIR, "recover_batch.json")
+        self.batches: Dict[str, dict] = {}
+
+    def load(self) -> "BatchState":
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return self
+        if isinstance(data, dict):
+            self.batches = data.get("batches") or {}
+        return self
+
+    def save(self) -> None:
+        # 끝난 배치는 정리 (submitted가 하나도 없으면)
+        self.batches = {bid: b for bid, b in self.batches.items()
+                        if any(p.get("status") == "submitted" for p in (b.get("posts") or {}).values())}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"batches": self.batches}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def in_flight(self) -> Dict[int, str]:
+        """post id -> batch id for every post still waiting on a batch."""
+        out: Dict[int, str] = {}
+        for bid, b in self.batches.items():
+            for pid, p in (b.get("posts") or {}).items():
+                if p.get("status") == "submitted":
+                    out[int(pid)] = bid
+        return out
+
+    def add(self, batch_id: str, input_file: str, posts: Dict[int, dict]) -> None:
+        self.batches[batch_id] = {
+            "created": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "status": "validating",
+            "input_file": input_file,
+            "posts": {str(pid): dict(meta, status="submitted") for pid, meta in posts.items()},
+        }
+
+    def age_hours(self, batch_id: str) -> float:
+        try:
+            created = datetime.strptime(self.batches[batch_id]["created"], "%Y-%m-%dT%H:%M:%SZ")
+        except (KeyError, ValueError):
+            return 0.0
+        return (datetime.now(timezone.utc).replace(tzinfo=None) - created).total_seconds() / 3600
+
+    def set_status(self, batch_id: str, pid: int, status: str) -> None:
+        self.batches[batch_id]["posts"][str(pid)]["status"] = status
+
+
+def write_jsonl(path: str, requests: List[Tuple[int, dict]]) -> int:
+    """requests: (post id, chat.completions body). Returns bytes written."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for pid, body in requests:
+            f.write(json.dumps({
+                "custom_id": custom_id(pid),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body,
+            }, ensure_ascii=False))
+            f.write("\n")
+    return os.path.getsize(path)
+
+
+def submit_batch(client, path: str) -> Tuple[str, str]:
+    """Uploads the JSONL file and creates the batch. Returns (batch id, input file id)."""
+    with open(path, "rb") as f:
+        up = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=up.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+        metadata={"source": "recover_autopost"},
+    )
+    return batch.id, up.id
+
+
+def _read_file(client, file_id: Optional[str]) -> List[dict]:
+    if not file_id:
+        return []
+    text = client.files.content(file_id).text
+    out = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            try:
+                out.append(json.loads(line))
+            except ValueError:
+                continue
+    return out
+
+
+def fetch_results(client, batch_id: str) -> Tuple[str, Dict[int, Tuple[Optional[str], str]]]:
+    """
+    Returns (batch status, {post id: (content or None, error)}).
+    Results are only read once the batch is in a final status.
+    """
+    batch = client.batches.retrieve(batch_id)
+    results: Dict[int, Tuple[Optional[str], str]] = {}
+    if batch.status not in FINAL_STATUSES:
+        return batch.status, results
+
+    for line in _read_file(client, batch.output_file_id) + _read_file(client, batch.error_file_id):
+        pid = pid_from_custom_id(line.get("custom_id", ""))
+        if pid is None:
+            continue
+        resp = line.get("response") or {}
+        err = line.get("error")
+        if err or resp.get("status_code") != 200:
+            msg = (err or {}).get("message") if isinstance(err, dict) else err
+            results[pid] = (None, str(msg or f"status_code={resp.get('status_code')}"))
+            continue
+        try:
+            content = resp["body"]["choices"][0]["message"]["content"] or ""
+        except (KeyError, IndexError, TypeError):
+            results[pid] = (None, "malformed response body")
+            continue
+        results[pid] = (content, "")
+    return batch.status, results
+
+
+def batch_file_path(ts: Optional[float] = None) -> str:
+    stamp = time.strftime("%Y%m%d_%H%M%S", time.gmtime(ts or time.time()))
+    return os.path.join(STATE_DIR, "batches", f"regen_{stamp}.jsonl")
@@ -0,0 +1,167 @@
+"""
+Append-only checkpoint journal for multi-post runs (wp_autopost_cluster.py,
+recover_autopost.py).
+
+Every completed stage of an item (a cluster slot, a recovered post) is appended
+as one JSON line the moment it finishes, so a run that dies halfway (WAF block,
+OpenAI timeout, runner preemption) resumes from the last finished stage:
+
+  {"item": "2026-03-01T09:00:00+09:00|12|INFO", "stage": "html", "at": 1767..., "sha": "<sha256>"}
+  {"item": "2026-03-01T09:00:00+09:00|12|INFO", "stage": "upload", "at": 1767..., "media_id": 345}
+  {"item": "2026-03-01T09:00:00+09:00|12|INFO", "stage": "done", "at": 1767..., "post_id": 678}
+
+Generated HTML is stored next to the journal as a content-addressed blob
+($STATE_DIR/journal_blobs/<name>/<sha256>.html); the journal line only carries the
+hash. Each journal has its own blob dir, so compacting one never touches another's.
+An uploaded media id whose post was never created is reused by the next run
+instead of uploading the same thumbnail again.
+
+On load the file is compacted: finished items ("done"), items older than
+JOURNAL_MAX_AGE_DAYS and their blobs are dropped.
+
+Files: $STATE_DIR/journal_<name>.jsonl, $STATE_DIR/journal_blobs/<name>/
+
+Optional ENV:
+  JOURNAL=1|0             (default 1)
+  JOURNAL_MAX_AGE_DAYS=7
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+STATE_DIR = os.environ.get("STATE_DIR", "state").strip() or "state"
+USE_JOURNAL = os.environ.get("JOURNAL", "1").strip() != "0"
+JOURNAL_MAX_AGE_DAYS = float(os.environ.get("JOURNAL_MAX_AGE_DAYS", "7"))
+
+DONE = "done"
+
+
+class Journal:
+    def __init__(self, name: str, path: Optional[str] = None):
+        self.path = path or os.path.join(STATE_DIR, f"journal_{name}.jsonl")
+        self.blob_dir = os.path.join(os.path.dirname(self.path) or ".", "journal_blobs", name)
+        self.items: Dict[str, Dict[str, dict]] = {}
+        self._lock = threading.Lock()  # cluster stages append from worker threads
+        self._f = None
+        self.resumed = 0
+        self.recorded = 0
+
+    # -------------------------
+    # load / compact
+    # -------------------------
+    def load(self) -> "Journal":
+        items: Dict[str, Dict[str, dict]] = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # 중간에 죽어서 잘린 마지막 줄
+                    if isinstance(rec, dict) and rec.get("item") and rec.get("stage"):
+                        items.setdefault(rec["item"], {})[rec["stage"]] = rec
+        except OSError:
+            pass
+
+        cutoff = time.time() - JOURNAL_MAX_AGE_DAYS * 86400
+        keep = {k: v for k, v in items.items()
+                if DONE not in v and max(r.get("at", 0) for r in v.values()) >= cutoff}
+        self.items = keep
+        self._rewrite()
+        if items:
+            print(f"[JOURNAL] {self.path} items={len(items)} open={len(keep)}")
+        return self
+
+    def retain(self, keys: Iterable[str]) -> None:
+        """Drops open items that are not part of this run (slot already filled, plan changed)."""
+        keys = set(keys)
+        with self._lock:
+            dropped = [k for k in self.items if k not in keys]
+            for k in dropped:
+                del self.items[k]
+            if dropped:
+                self._rewrite()
+
+    def _rewrite(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if self._f:
+            self._f.close()
+            self._f = None
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for stages in self.items.values():
+                for rec in stages.values():
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+        self._gc_blobs()
+
+    def _gc_blobs(self) -> None:
+        live = {r.get("sha") for stages in self.items.values() for r in stages.values()}
+        try:
+            names = os.listdir(self.blob_dir)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(".html") and name[:-5] not in live:
+                try:
+                    os.remove(os.path.join(self.blob_dir, name))
+                except OSError:
+                    pass
+
+    # -------------------------
+    # stages
+    # -------------------------
+    def get(self, item: str, stage: str) -> Optional[dict]:
+        rec = self.items.get(item, {}).get(stage)
+        if rec is not None:
+            self.resumed += 1
+        return rec
+
+    def record(self, item: str, stage: str, **data) -> None:
+        rec = dict(data, item=item, stage=stage, at=time.time())
+        line = json.dumps(rec, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.items.setdefault(item, {})[stage] = rec
+            if self._f is None:
+                self._f = open(self.path, "a", encoding="utf-8")
+            self._f.write(line)
+            self._f.flush()  # 프로세스가 죽어도 남도록 한 줄씩 바로
+            self.recorded += 1
+
+    def finish(self, item: str, **data) -> None:
+        self.record(item, DONE, **data)
+
+    # -------------------------
+    # HTML blobs
+    # -------------------------
+    def put_html(self, html: str) -> str:
+        sha = hashlib.sha256(html.encode("utf-8")).hexdigest()
+        path = os.path.join(self.blob_dir, sha + ".html")
+        if not os.path.exists(path):
+            os.makedirs(self.blob_dir, exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(html)
+            os.replace(tmp, path)
+        return sha
+
+    def get_html(self, sha: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.blob_dir, sha + ".html"), "r", encoding="utf-8") as f:
+                html = f.read()
+        except OSError:
+            return None
+        if hashlib.sha256(html.encode("utf-8")).hexdigest() != sha:
+            return None
+        return html
+
+    def close(self) -> None:
+        with self._lock:
+            if self._f:
+                self._f.close()
+                self._f = None
+        print(f"[JOURNAL] {os.path.basename(self.path)} resumed_stages={self.resumed} recorded={self.recorded}")
@@ -0,0 +1,127 @@
+"""
+Persisted state for incremental recovery scans (recover_autopost.py).
+
+File: $STATE_DIR/recover_scan.json (default state/recover_scan.json)
+  {
+    "config": "<fingerprint of thresholds / AFTER_DATE_KST>",
+    "modified_after": "2026-03-01T01:00:00",   # max modified_gmt of last successful scan
+    "healthy": {"123": "<sha256>", ...},         # ids judged OK + fingerprint of what was judged
+    "pending": [456, ...]                        # flagged/unreached ids to re-check next run
+  }
+
+A run only reads posts modified since the watermark plus the pending ids; a post whose
+hash is unchanged since it was judged healthy is not analyzed again.
+If the config fingerprint changes (MIN_WORDS etc.), the state is ignored -> full rescan.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+STATE_DIR = os.environ.get("STATE_DIR", "state").strip() or "state"
+
+
+def post_hash(title_html: str, content_html: str, category_name: str) -> str:
+    """sha256 over everything should_fix_post looks at (content + title + category)."""
+    h = hashlib.sha256()
+    for part in (content_html or "", title_html or "", category_name or ""):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ScanState:
+    def __init__(self, config: str, path: Optional[str] = None):
+        self.path = path or os.path.join(STATE_DIR, "recover_scan.json")
+        self.config = config
+        self.modified_after: Optional[str] = None
+        self.healthy: Dict[int, str] = {}
+        self.pending: Set[int] = set()
+        self.loaded = False
+        # collected during the current run
+        self._max_modified: Optional[str] = None
+
+    def load(self) -> "ScanState":
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return self
+        if not isinstance(data, dict) or data.get("config") != self.config:
+            print(f"[STATE] {self.path} ignored (missing or thresholds changed) -> full rescan")
+            return self
+        self.modified_after = data.get("modified_after") or None
+        self.healthy = {int(k): v for k, v in (data.get("healthy") or {}).items()}
+        self.pending = {int(x) for x in (data.get("pending") or [])}
+        self.loaded = bool(self.modified_after)
+        return self
+
+    def query_after(self, overlap_hours: int = 24) -> Optional[str]:
+        """
+        modified_after value for the WP query. WP compares against the site-local
+        post_modified column, so go back `overlap_hours` to cover any timezone offset;
+        the overlap is cheap because unchanged hashes are skipped.
+        """
+        if not self.modified_after:
+            return None
+        try:
+            dt = datetime.fromisoformat(self.modified_after.replace("Z", ""))
+        except ValueError:
+            return None
+        return (dt - timedelta(hours=overlap_hours)).strftime("%Y-%m-%dT%H:%M:%S")
+
+    # -------------------------
+    # per-post bookkeeping
+    # -------------------------
+    def seen(self, post: dict) -> None:
+        mod = post.get("modified_gmt")
+        if mod and (self._max_modified is None or mod > self._max_modified):
+            self._max_modified = mod
+
+    def is_known_healthy(self, pid: int, digest: str) -> bool:
+        return self.healthy.get(pid) == digest
+
+    def mark_healthy(self, pid: int, digest: str) -> None:
+        self.healthy[pid] = digest
+        self.pending.discard(pid)
+
+    def mark_pending(self, pid: int) -> None:
+        self.healthy.pop(pid, None)
+        self.pending.add(pid)
+
+    def forget(self, pids: Iterable[int]) -> None:
+        """Posts that no longer exist as publish/future (trashed, deleted, unpublished)."""
+        for pid in pids:
+            self.healthy.pop(pid, None)
+            self.pending.discard(pid)
+
+    def save(self) -> None:
+        """Persist after a successful scan (watermark only moves forward)."""
+        wm = self.modified_after
+        if self._max_modified and (not wm or self._max_modified > wm):
+            wm = self._max_modified
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = {
+            "config": self.config,
+            "modified_after": wm,
+            "healthy": {str(k): v for k, v in sorted(self.healthy.items())},
+            "pending": sorted(self.pending),
+            "saved_at": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+        print(f"[STATE] saved {self.path} modified_after={wm} healthy={len(self.healthy)} pending={len(self.pending)}")
+
+
+def config_fingerprint(values: Dict[str, object]) -> str:
+    raw = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def ids_not_in(posts: List[dict], ids: Set[int]) -> List[int]:
+    have = {int(p["id"]) for p in posts}
+    return sorted(i for i in ids if i not in have)
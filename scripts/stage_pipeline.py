@@ -0,0 +1,174 @@
+"""
+Staged pipeline executor for the autopost scripts.
+
+Each stage has its own worker threads and a bounded input queue, so a network
+stage (OpenAI, Unsplash, WP upload) of item N overlaps with the other stages of
+items N-1 / N+1 and the run takes roughly as long as the slowest stage instead
+of the sum of all stages. Bounded queues give backpressure: a fast stage stops
+pulling new work once the next stage is STAGE_QUEUE items behind.
+
+- fn(item) -> item for the next stage (usually the same dict, filled in)
+- an exception in a stage marks the item failed; later stages skip it and
+  run() returns it with the error, the other items keep going
+- ordered=True runs the stage with one worker in input order (e.g. publish)
+
+Per stage it logs items, busy / idle (waiting for input) / blocked (waiting
+for the next queue) time, rate (items per second of stage capacity) and the
+input queue depth.
+
+Optional ENV:
+  STAGE_QUEUE=2   max items waiting in front of each stage
+"""
+
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+STAGE_QUEUE = int(os.environ.get("STAGE_QUEUE", "2"))
+
+_DONE = object()
+
+
+class Stage:
+    def __init__(self, name: str, fn: Callable[[Any], Any], workers: int = 1, ordered: bool = False):
+        self.name = name
+        self.fn = fn
+        self.ordered = ordered
+        self.workers = 1 if ordered else max(int(workers), 1)
+
+        self._lock = threading.Lock()
+        self.items = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.idle = 0.0
+        self.blocked = 0.0
+        self.q_max = 0
+        self.q_sum = 0
+        self.q_n = 0
+
+    def _add(self, **kw) -> None:
+        with self._lock:
+            for k, v in kw.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def capacity_time(self) -> float:
+        # busy 시간을 워커 수로 나눈 값 = 이 스테이지만 돌렸을 때 걸리는 시간
+        return self.busy / self.workers
+
+    def format_stats(self) -> str:
+        rate = self.items / self.capacity_time() if self.busy > 0 else 0.0
+        q_avg = self.q_sum / self.q_n if self.q_n else 0.0
+        return (f"{self.name:<10} workers={self.workers} items={self.items} failed={self.failed} "
+                f"busy={self.busy:.1f}s idle={self.idle:.1f}s blocked={self.blocked:.1f}s "
+                f"rate={rate:.2f}/s q_avg={q_avg:.1f} q_max={self.q_max}")
+
+
+class StagePipeline:
+    def __init__(self, stages: Sequence[Stage], queue_size: int = STAGE_QUEUE):
+        if not stages:
+            raise ValueError("StagePipeline needs at least one stage")
+        self.stages = list(stages)
+        self.queue_size = max(queue_size, 1)
+        self.wall = 0.0
+
+    def run(self, items: Iterable[Any]) -> List[Tuple[Any, Optional[BaseException]]]:
+        """
+        Runs every item through all stages. Returns (item, error) per input
+        item in input order; error is None when every stage succeeded.
+        """
+        t0 = time.perf_counter()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        results = {}
+        res_lock = threading.Lock()
+
+        def emit(i: int, msg) -> float:
+            if msg is _DONE and i + 1 < len(self.stages):
+                queues[i + 1].put(_DONE)
+                return 0.0
+            if msg is _DONE:
+                return 0.0
+            if i + 1 < len(self.stages):
+                t = time.perf_counter()
+                queues[i + 1].put(msg)
+                return time.perf_counter() - t
+            with res_lock:
+                results[msg[0]] = (msg[1], msg[2])
+            return 0.0
+
+        def process(stage: Stage, msg):
+            seq, item, err = msg
+            if err is not None:
+                return (seq, item, err)
+            t = time.perf_counter()
+            try:
+                item = stage.fn(item)
+            except (Exception, SystemExit) as e:
+                err = e
+                stage._add(failed=1)
+            stage._add(items=1, busy=time.perf_counter() - t)
+            return (seq, item, err)
+
+        remaining = [s.workers for s in self.stages]
+        rem_lock = threading.Lock()
+
+        def worker(i: int):
+            stage = self.stages[i]
+            q = queues[i]
+            pending = {}
+            next_seq = 0
+            while True:
+                depth = q.qsize()
+                t = time.perf_counter()
+                msg = q.get()
+                stage._add(idle=time.perf_counter() - t, q_sum=depth, q_n=1)
+                with stage._lock:
+                    stage.q_max = max(stage.q_max, depth)
+
+                if msg is _DONE:
+                    q.put(_DONE)  # 같은 스테이지의 다른 워커도 종료하도록
+                    with rem_lock:
+                        remaining[i] -= 1
+                        last = remaining[i] == 0
+                    if last:
+                        emit(i, _DONE)
+                    return
+
+                if not stage.ordered:
+                    stage._add(blocked=emit(i, process(stage, msg)))
+                    continue
+
+                # ordered: 입력 순서(seq)대로만 처리
+                pending[msg[0]] = msg
+                while next_seq in pending:
+                    out = process(stage, pending.pop(next_seq))
+                    next_seq += 1
+                    stage._add(blocked=emit(i, out))
+
+        threads = []
+        for i, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                th = threading.Thread(target=worker, args=(i,), name=f"stage-{stage.name}", daemon=True)
+                th.start()
+                threads.append(th)
+
+        n = 0
+        for n, item in enumerate(items, 1):
+            queues[0].put((n - 1, item, None))
+        queues[0].put(_DONE)
+
+        for th in threads:
+            th.join()
+
+        self.wall = time.perf_counter() - t0
+        self.print_stats()
+        return [results[i] for i in range(n)]
+
+    def print_stats(self) -> None:
+        for stage in self.stages:
+            print(f"[STAGE] {stage.format_stats()}")
+        slowest = max(self.stages, key=lambda s: s.capacity_time())
+        serial = sum(s.busy for s in self.stages)
+        print(f"[STAGE] wall={self.wall:.1f}s serial={serial:.1f}s "
+              f"slowest={slowest.name}({slowest.capacity_time():.1f}s)")
@@ -0,0 +1,333 @@
+"""
+Featured image (thumbnail) rendering for wp_autopost_cluster.py, single or batched.
+
+ThumbnailRenderer prepares what every thumbnail shares once (decoded + resized
+background, gold lines / panel / header / brand overlay, fonts); render() only
+draws the title and category text and encodes the JPEG.
+
+ThumbnailPool spreads rendering + optimize=True JPEG encoding over processes:
+- render(title, category): one thumbnail, safe to call from several threads
+  (the cluster "thumbnail" stage workers), so uploads start as each finishes
+- render_batch(items): many (key, title, category), consumed lazily; yields
+  (key, jpeg_bytes, error) in completion order with at most `window` renders
+  in flight, so memory stays bounded for hundreds of thumbnails as long as the
+  caller drops each result after using it (e.g. uploads it)
+
+Every worker process builds its own ThumbnailRenderer once (pool initializer).
+workers <= 1 renders inline. No import-time side effects, so worker processes
+can import this module under any start method.
+
+BackgroundCache resolves the background without the per-run media lookup +
+full-size download: the repo asset (assets/thumbnail_bg.png) first, then an
+on-disk copy per media id (revalidated with ETag/Last-Modified at most every
+THUMB_BG_REVALIDATE_HOURS), and WP only on a miss. The cache holds the decoded,
+already resized 1200x675 RGBA pixels, ready to composite.
+
+Files: $STATE_DIR/thumb_bg/<key>.rgba + <key>.json
+
+Optional ENV:
+  THUMB_WORKERS=min(cpu_count, 4)
+  THUMB_BG_ASSET=assets/thumbnail_bg.png  ("" = always use the WP media id)
+  THUMB_BG_REVALIDATE_HOURS=24
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+THUMB_WORKERS = int(os.environ.get("THUMB_WORKERS", str(min(os.cpu_count() or 1, 4))))
+STATE_DIR = os.environ.get("STATE_DIR", "state").strip() or "state"
+THUMB_BG_ASSET = os.environ.get(
+    "THUMB_BG_ASSET",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "thumbnail_bg.png"),
+).strip()
+THUMB_BG_REVALIDATE_HOURS = float(os.environ.get("THUMB_BG_REVALIDATE_HOURS", "24"))
+
+THUMB_SIZE = (1200, 675)
+THUMB_GOLD = (212, 175, 55, 220)
+
+
+def load_font(size: int) -> ImageFont.ImageFont:
+    for path in [
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    ]:
+        try:
+            return ImageFont.truetype(path, size=size)
+        except Exception:
+            continue
+    return ImageFont.load_default()
+
+
+def wrap_text(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.ImageFont, max_width: int) -> List[str]:
+    words = re.split(r"\s+", (text or "").strip())
+    lines: List[str] = []
+    cur = ""
+    for w in words:
+        test = (cur + " " + w).strip()
+        width = draw.textbbox((0, 0), test, font=font)[2]
+        if width <= max_width:
+            cur = test
+        else:
+            if cur:
+                lines.append(cur)
+            cur = w
+    if cur:
+        lines.append(cur)
+    return lines
+
+
+def decode_background(bg) -> Image.Image:
+    if not isinstance(bg, Image.Image):
+        bg = Image.open(io.BytesIO(bg))
+    return bg.convert("RGBA").resize(THUMB_SIZE)
+
+
+class ThumbnailRenderer:
+    """
+    썸네일 공통 부분을 한 번만 준비: 배경 디코드+리사이즈, 금색 선/패널/헤더 오버레이, 폰트.
+    render()는 제목/카테고리 텍스트만 그려서 합성 (기존 make_featured_image와 같은 픽셀).
+    """
+
+    def __init__(self, bg, header: str, brand: str):
+        # bg: 인코딩된 이미지 bytes 또는 BackgroundCache가 준 1200x675 RGBA Image
+        self.base = bg if isinstance(bg, Image.Image) and bg.size == THUMB_SIZE else decode_background(bg)
+
+        self.font_header = load_font(28)
+        self.font_title = load_font(56)
+        self.font_footer = load_font(24)
+
+        overlay = Image.new("RGBA", THUMB_SIZE, (0, 0, 0, 0))
+        draw = ImageDraw.Draw(overlay)
+        draw.line([(120, 90), (1080, 90)], fill=THUMB_GOLD, width=3)
+        draw.line([(120, 585), (1080, 585)], fill=THUMB_GOLD, width=3)
+
+        panel = (90, 140, 1110, 535)
+        draw.rounded_rectangle(panel, radius=28, fill=(0, 0, 0, 140), outline=(212, 175, 55, 140), width=2)
+
+        w = draw.textbbox((0, 0), header, font=self.font_header)[2]
+        draw.text(((1200 - w) / 2, 170), header, font=self.font_header, fill=THUMB_GOLD)
+        draw.text((170, 500), brand, font=self.font_footer, fill=(255, 255, 255, 210))
+        self.overlay = overlay
+
+    def render(self, title: str, category: str) -> bytes:
+        # 텍스트는 패널 위 오버레이에 그린 뒤 배경과 합성해야 기존과 같은 알파 결과
+        overlay = self.overlay.copy()
+        draw = ImageDraw.Draw(overlay)
+
+        lines = wrap_text(draw, title, self.font_title, 920)
+        y = 250
+        for line in lines[:3]:
+            w = draw.textbbox((0, 0), line, font=self.font_title)[2]
+            draw.text(((1200 - w) / 2, y), line, font=self.font_title, fill=(255, 255, 255, 235))
+            y += 70
+
+        footer_right = (category or "").upper()
+        if footer_right:
+            w = draw.textbbox((0, 0), footer_right, font=self.font_footer)[2]
+            draw.text((1200 - 170 - w, 500), footer_right, font=self.font_footer, fill=THUMB_GOLD)
+
+        out = Image.alpha_composite(self.base, overlay).convert("RGB")
+        buf = io.BytesIO()
+        out.save(buf, format="JPEG", quality=92, optimize=True)
+        return buf.getvalue()
+
+
+# -------------------------
+# process pool
+# -------------------------
+_worker_renderer: Optional[ThumbnailRenderer] = None
+
+
+def _init_worker(bg, header: str, brand: str) -> None:
+    global _worker_renderer
+    _worker_renderer = ThumbnailRenderer(bg, header, brand)
+
+
+def _render_in_worker(title: str, category: str) -> bytes:
+    return _worker_renderer.render(title, category)
+
+
+class ThumbnailPool:
+    def __init__(self, bg, header: str, brand: str, workers: int = THUMB_WORKERS):
+        self.workers = max(int(workers), 1)
+        self.max_in_flight = 0  # render_batch 동시 진행 최대치 (메모리 상한 확인용)
+        self._ex = None
+        self._local = None
+        self._local_lock = threading.Lock()  # inline 모드: PIL 폰트 객체를 스레드끼리 공유하지 않도록
+        if self.workers > 1:
+            self._ex = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                           initargs=(bg, header, brand))
+        else:
+            self._local = ThumbnailRenderer(bg, header, brand)
+
+    def submit(self, title: str, category: str) -> Future:
+        if self._ex is not None:
+            return self._ex.submit(_render_in_worker, title, category)
+        f: Future = Future()
+        try:
+            with self._local_lock:
+                f.set_result(self._local.render(title, category))
+        except Exception as e:
+            f.set_exception(e)
+        return f
+
+    def render(self, title: str, category: str) -> bytes:
+        return self.submit(title, category).result()
+
+    def render_batch(self, items: Iterable[Tuple[object, str, str]],
+                     window: int = 0) -> Iterator[Tuple[object, Optional[bytes], Optional[BaseException]]]:
+        """
+        items: (key, title, category), consumed lazily. Yields (key, jpeg_bytes, None)
+        or (key, None, error) as renders finish, at most `window` in flight.
+        """
+        window = window or self.workers * 2
+        it = iter(items)
+        pending = {}
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < window:
+                try:
+                    key, title, category = next(it)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[self.submit(title, category)] = key
+            self.max_in_flight = max(self.max_in_flight, len(pending))
+            if not pending:
+                return
+            finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for f in finished:
+                key = pending.pop(f)
+                err = f.exception()
+                yield key, (None if err else f.result()), err
+
+    def close(self) -> None:
+        if self._ex is not None:
+            self._ex.shutdown(wait=True, cancel_futures=True)
+            self._ex = None
+
+    def __enter__(self) -> "ThumbnailPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# -------------------------
+# background cache
+# -------------------------
+class BackgroundCache:
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.dir = cache_dir or os.path.join(STATE_DIR, "thumb_bg")
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        return os.path.join(self.dir, key + ".rgba"), os.path.join(self.dir, key + ".json")
+
+    def load(self, key: str) -> Tuple[Optional[Image.Image], dict]:
+        raw_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(raw_path, "rb") as f:
+                raw = f.read()
+        except (OSError, ValueError):
+            return None, {}
+        if len(raw) != THUMB_SIZE[0] * THUMB_SIZE[1] * 4:
+            return None, {}
+        return Image.frombytes("RGBA", THUMB_SIZE, raw), meta
+
+    @staticmethod
+    def _write(path: str, data, mode: str) -> None:
+        tmp = path + ".tmp"
+        with open(tmp, mode) as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def store(self, key: str, im: Image.Image, meta: dict) -> None:
+        os.makedirs(self.dir, exist_ok=True)
+        raw_path, meta_path = self._paths(key)
+        self._write(raw_path, im.tobytes(), "wb")
+        self._write(meta_path, json.dumps(meta), "w")
+
+    def touch(self, key: str, meta: dict) -> None:
+        meta["checked_at"] = time.time()
+        self._write(self._paths(key)[1], json.dumps(meta), "w")
+
+    def from_asset(self, path: str) -> Optional[Image.Image]:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        key = "asset-" + hashlib.sha256(data).hexdigest()[:16]  # 파일이 바뀌면 새 키
+        im, _meta = self.load(key)
+        if im is not None:
+            print(f"[THUMB] background=asset {os.path.basename(path)} (cached 1200x675)")
+            return im
+        im = decode_background(data)
+        self.store(key, im, {"source": os.path.basename(path), "checked_at": time.time()})
+        print(f"[THUMB] background=asset {os.path.basename(path)} (decoded, cached)")
+        return im
+
+    def from_media(self, media_id: int, session, source_url_fn, timeout: int = 30) -> Optional[Image.Image]:
+        """
+        Cached copy of WP media `media_id`. Within THUMB_BG_REVALIDATE_HOURS no request
+        at all; after that one conditional GET (304 = keep). source_url_fn(media_id)
+        (the media lookup) only runs on a miss.
+        """
+        key = f"media-{media_id}"
+        im, meta = self.load(key)
+        if im is not None and time.time() - meta.get("checked_at", 0) < THUMB_BG_REVALIDATE_HOURS * 3600:
+            print(f"[THUMB] background=media {media_id} (cached)")
+            return im
+
+        url = meta.get("source_url") if im is not None else ""
+        headers = {}
+        if url:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        else:
+            url = source_url_fn(media_id)
+            if not url:
+                return None
+        try:
+            r = session.get(url, headers=headers, timeout=timeout)
+            if im is not None and r.status_code == 304:
+                self.touch(key, meta)
+                print(f"[THUMB] background=media {media_id} (revalidated, 304)")
+                return im
+            r.raise_for_status()
+            fresh = decode_background(r.content)
+        except Exception as e:
+            if im is not None:
+                print(f"[THUMB] background=media {media_id} revalidation failed, using cached copy: {str(e)[:200]}")
+                return im
+            print(f"[THUMB] background download failed: {str(e)[:200]}")
+            return None
+        self.store(key, fresh, {
+            "source_url": url,
+            "etag": r.headers.get("ETag", ""),
+            "last_modified": r.headers.get("Last-Modified", ""),
+            "checked_at": time.time(),
+        })
+        print(f"[THUMB] background=media {media_id} (downloaded {len(r.content) / 1e6:.2f}MB, cached)")
+        return fresh
+
+    def resolve(self, media_id: int, session, source_url_fn, timeout: int = 30,
+                asset: str = THUMB_BG_ASSET) -> Optional[Image.Image]:
+        if asset:
+            im = self.from_asset(asset)
+            if im is not None:
+                return im
+        return self.from_media(media_id, session, source_url_fn, timeout)
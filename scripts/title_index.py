@@ -0,0 +1,111 @@
+"""
+Near-duplicate index over post titles (wp_autopost_new.py title selection).
+
+Titles are reduced to a set of normalized tokens. Normalization:
+- lower case, no punctuation
+- no years
+- no stopwords or filler words ("in", "for", "your", "guide", ...)
+- synonyms folded ("top" -> "best", "vs"/"compared" -> "comparison",
+  "alternative" -> "alternatives")
+- a trailing plural "s" dropped
+
+Two titles are compared by the Jaccard similarity of these sets, so
+"Best CRM Tools 2026" and "Top CRM Tools in 2026" score 1.0 while
+"Best CRM Tools 2026" and "Best Email Marketing Tools 2026" score 0.4.
+
+An inverted index (token -> title ids) means a lookup only touches titles that
+share at least one token, so indexing every title of the site stays cheap.
+"""
+
+import re
+from typing import Dict, Iterable, List, Set, Tuple
+
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "for", "to", "in", "on", "with", "your", "you", "our",
+    "is", "are", "how", "what", "which", "why", "that", "this", "from", "by", "at", "it", "its",
+    "guide", "ultimate", "complete", "practical", "review", "reviews", "2025", "2026", "2027",
+}
+_SYNONYMS = {
+    "top": "best", "leading": "best", "greatest": "best",
+    "vs": "comparison", "versus": "comparison", "compared": "comparison", "compare": "comparison",
+    "alternative": "alternatives",
+    "price": "pricing", "prices": "pricing", "cost": "pricing", "costs": "pricing",
+    "smb": "small business", "smbs": "small business", "businesses": "business",
+    "ai-powered": "ai",
+}
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9+\-]*")
+_YEAR_RE = re.compile(r"^(19|20)\d\d$")
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def title_tokens(title: str) -> Set[str]:
+    out: Set[str] = set()
+    for w in _WORD_RE.findall(_TAG_RE.sub(" ", title or "").lower()):
+        if w in _STOPWORDS or _YEAR_RE.match(w):
+            continue
+        for t in _SYNONYMS.get(w, w).split():
+            if len(t) > 3 and t.endswith("s") and not t.endswith("ss"):
+                t = t[:-1]
+            out.add(t)
+    return out
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+
+class TitleIndex:
+    def __init__(self, titles: Iterable[str] = ()):
+        self.titles: List[str] = []
+        self.tokens: List[Set[str]] = []
+        self.postings: Dict[str, List[int]] = {}
+        for t in titles:
+            self.add(t)
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def add(self, title: str) -> None:
+        toks = title_tokens(title)
+        if not toks:
+            return
+        i = len(self.titles)
+        self.titles.append(title)
+        self.tokens.append(toks)
+        for t in toks:
+            self.postings.setdefault(t, []).append(i)
+
+    def nearest(self, title: str) -> Tuple[float, str]:
+        """(best Jaccard similarity, most similar existing title); (0.0, "") if none share a token."""
+        toks = title_tokens(title)
+        seen: Set[int] = set()
+        best, best_title = 0.0, ""
+        for t in toks:
+            for i in self.postings.get(t, ()):
+                if i in seen:
+                    continue
+                seen.add(i)
+                sim = jaccard(toks, self.tokens[i])
+                if sim > best:
+                    best, best_title = sim, self.titles[i]
+        return best, best_title
+
+    def rank(self, candidates: Iterable[str]) -> List[Tuple[float, str, str]]:
+        """
+        Candidates sorted by novelty: (similarity, candidate, nearest existing title),
+        least similar first; ties keep the candidates' own order.
+        Candidates that are near-duplicates of each other count against the later one.
+        """
+        out = []
+        local = TitleIndex()
+        for c in candidates:
+            sim, near = self.nearest(c)
+            lsim, lnear = local.nearest(c)
+            if lsim > sim:
+                sim, near = lsim, lnear
+            out.append((sim, c, near))
+            local.add(c)
+        return sorted(out, key=lambda x: x[0])
@@ -1,16 +1,23 @@
 import os
-import re
-import io
 import html as html_mod
 from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict
 
-import requests
-from requests.auth import HTTPBasicAuth
-from bs4 import BeautifulSoup
-from PIL import Image, ImageDraw, ImageFont
 from openai import OpenAI
 
+from wp_client import WPClient
+from wp_mirror import WPMirror
+from html_pipeline import (
+    HtmlPipeline, soup_text, regex_remove, table_scroll_pass, body_images_pass, reparse_pass, format_timing_totals,
+)
+from stage_pipeline import Stage, StagePipeline
+from openai_stream import StreamValidator
+from run_journal import Journal, USE_JOURNAL
+from image_search import UnsplashSearch
+from media_dedup import MediaIndex
+from thumbnail import THUMB_WORKERS, BackgroundCache, ThumbnailPool, ThumbnailRenderer
+import llm_cache
+
 # =========================
 # ENV (GitHub Secrets)
 # =========================
@@ -33,6 +40,10 @@ SKIP_WEEKDAY = os.environ.get("SKIP_WEEKDAY", "6")  # 6=일요일 스킵(원하
 
 BODY_IMAGE_COUNT = int(os.environ.get("BODY_IMAGE_COUNT", "3"))
 TIMEOUT = int(os.environ.get("HTTP_TIMEOUT", "30"))
+USE_MIRROR = os.environ.get("WP_MIRROR", "1").strip() != "0"  # 0이면 매번 WP에서 직접 목록 조회
+GEN_WORKERS = int(os.environ.get("GEN_WORKERS", "3"))  # 슬롯 여러 개를 채울 때 동시에 생성할 글 수
+UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", "2"))  # 썸네일 업로드 동시 수
+USE_MEDIA_DEDUP = os.environ.get("MEDIA_DEDUP", "1").strip() != "0"  # 같은 바이트면 기존 첨부 재사용 (media_dedup.py)
 
 # 타입 반복 규칙: INFO, INFO, VS
 TYPE_PATTERN = ["INFO", "INFO", "VS"]
@@ -42,108 +53,48 @@ if not (WP_BASE and WP_USER and WP_PASS):
 if not OPENAI_API_KEY:
     raise SystemExit("Missing env: OPENAI_API_KEY")
 
-auth = HTTPBasicAuth(WP_USER, WP_PASS)
+wp = WPClient(WP_BASE, WP_USER, WP_PASS, timeout=TIMEOUT)
+mirror = WPMirror(wp) if USE_MIRROR else None
+journal = Journal("cluster") if USE_JOURNAL else None  # 슬롯별 완료 스테이지 기록 (중단 후 재개용)
+media_index = MediaIndex(wp) if USE_MEDIA_DEDUP else None
+images = UnsplashSearch(wp.session, UNSPLASH_ACCESS_KEY, timeout=TIMEOUT)
 client = OpenAI(api_key=OPENAI_API_KEY)
 
 # =========================
-# WP REST helpers (robust)
+# WP REST helpers (robust, pooled via wp_client)
 # =========================
-def _ensure_json_response(r: requests.Response, context: str) -> None:
-    """
-    GitHub Actions + WAF/보안플러그인 환경에서 HTML/텍스트가 오는 경우가 잦아서
-    content-type 확인 후 JSON이 아니면 바로 원인 출력하고 종료한다.
-    """
-    ct = (r.headers.get("content-type") or "").lower()
-    if "application/json" not in ct:
-        print(f"[{context}] NON-JSON response")
-        print("  status:", r.status_code)
-        print("  content-type:", ct)
-        body = (r.text or "")
-        print("  body(head):", body[:400])
-        # HTTP 에러면 raise
-        try:
-            r.raise_for_status()
-        except Exception:
-            raise
-        # 200인데 HTML이면 대부분 리다이렉트/차단 페이지
-        raise SystemExit(f"{context}: WP did not return JSON (blocked/redirected/WAF).")
-
-def wp_get(path: str, params: Optional[dict] = None):
-    url = f"{WP_BASE}{path}"
-    headers = {"Accept": "application/json"}  # GET에는 Content-Type 넣지 말 것
-    r = requests.get(url, params=params or {}, headers=headers, auth=auth, timeout=TIMEOUT)
-    _ensure_json_response(r, f"GET {path}")
-    r.raise_for_status()
-    return r.json()
-
-def wp_get_list(path: str, params: Optional[dict] = None) -> List[dict]:
-    """
-    list endpoint는 반드시 list[dict]여야 한다.
-    - dict가 오면 WP REST error일 가능성이 크므로 메시지 출력 후 종료
-    - list라도 요소가 str 등으로 섞이면 종료(원인 숨기지 않음)
-    """
-    data = wp_get(path, params)
-    if isinstance(data, dict):
-        code = data.get("code")
-        msg = data.get("message")
-        print(f"[GET {path}] WP API ERROR:", code, "|", msg)
-        raise SystemExit(f"WP API returned error dict: {code}")
+def wp_get(path: str, params: Optional[dict] = None, fields: Optional[tuple] = None):
+    return wp.get_json(path, params, fields=fields)
 
-    if not isinstance(data, list):
-        print(f"[GET {path}] Unexpected JSON type:", type(data))
-        print("  body(head):", str(data)[:400])
-        raise SystemExit("Unexpected WP API response type (not list).")
-
-    if any(not isinstance(x, dict) for x in data):
-        bad = [x for x in data if not isinstance(x, dict)]
-        print(f"[GET {path}] Non-dict items found in list. sample:", bad[:3])
-        raise SystemExit("WP list response contains non-dict items (strings).")
-
-    return data
+def wp_get_list(path: str, params: Optional[dict] = None, fields: Optional[tuple] = None) -> List[dict]:
+    return wp.get_list(path, params, fields=fields)
 
 def wp_post(path: str, payload: dict) -> dict:
-    url = f"{WP_BASE}{path}"
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-    }
-    r = requests.post(url, json=payload, headers=headers, auth=auth, timeout=TIMEOUT)
-    _ensure_json_response(r, f"POST {path}")
-    r.raise_for_status()
-    return r.json()
+    return wp.post_json(path, payload)
 
 def wp_upload_media(file_bytes: bytes, filename: str, mime: str = "image/jpeg") -> int:
-    url = f"{WP_BASE}/wp-json/wp/v2/media"
-    headers = {
-        "Accept": "application/json",
-        "Content-Disposition": f'attachment; filename="{filename}"',
-        "Content-Type": mime,
-    }
-    r = requests.post(url, headers=headers, data=file_bytes, auth=auth, timeout=TIMEOUT)
-    _ensure_json_response(r, "UPLOAD media")
-    r.raise_for_status()
-    j = r.json()
-    mid = j.get("id")
-    if not isinstance(mid, int):
-        print("UPLOAD response(head):", str(j)[:400])
-        raise SystemExit("Media upload did not return numeric id.")
-    return mid
+    if media_index:
+        return media_index.upload(file_bytes, filename, mime=mime)
+    return wp.upload_media(file_bytes, filename, mime=mime)
 
 def wp_get_media_source_url(media_id: int) -> str:
-    j = wp_get(f"/wp-json/wp/v2/media/{media_id}")
+    if mirror:
+        url = mirror.media_source_url(media_id)
+        if url:
+            return url
+    j = wp_get(f"/wp-json/wp/v2/media/{media_id}", fields=("source_url",))
     return j.get("source_url", "")
 
+# _fields projection: 각 호출이 실제로 쓰는 필드만 받는다 (content/_links/yoast_head 제외)
+CATEGORY_FIELDS = ("id", "name", "slug")
+RECENT_POST_FIELDS = ("id", "date", "date_gmt", "title", "categories")  # 타입/카테고리 회전용
+FUTURE_SLOT_FIELDS = ("id", "date")
+
 def wp_get_categories() -> List[dict]:
-    cats: List[dict] = []
-    page = 1
-    while True:
-        chunk = wp_get_list("/wp-json/wp/v2/categories", params={"per_page": 100, "page": page})
-        if not chunk:
-            break
-        cats.extend(chunk)
-        if len(chunk) < 100:
-            break
-        page += 1
+    if mirror:
+        return mirror.categories()
+    # X-WP-TotalPages 기반 병렬 페이지 로딩 (헤더 없으면 순차)
+    cats = wp.get_all_pages("/wp-json/wp/v2/categories", fields=CATEGORY_FIELDS)
 
     # 안전장치: dict만 유지
     cats = [c for c in cats if isinstance(c, dict)]
@@ -155,14 +106,18 @@ def wp_get_recent_posts(limit: int = 30) -> List[dict]:
     WP REST에서 status 파라미터가 환경에 따라 콤마 리스트를 거부하는 경우가 있어
     publish/future를 각각 가져와서 합친다.
     """
+    if mirror:
+        return mirror.recent_posts(("publish", "future"), limit=limit)
     per_page = min(limit, 100)
     pub = wp_get_list(
         "/wp-json/wp/v2/posts",
         params={"per_page": per_page, "status": "publish", "orderby": "date", "order": "desc"},
+        fields=RECENT_POST_FIELDS,
     )
     fut = wp_get_list(
         "/wp-json/wp/v2/posts",
         params={"per_page": per_page, "status": "future", "orderby": "date", "order": "desc"},
+        fields=RECENT_POST_FIELDS,
     )
     posts = (pub or []) + (fut or [])
 
@@ -174,6 +129,8 @@ def wp_get_recent_posts(limit: int = 30) -> List[dict]:
     return posts[:limit]
 
 def wp_get_future_posts_in_range(start_iso: str, end_iso: str) -> List[dict]:
+    if mirror:
+        return mirror.future_posts(start_iso, end_iso)
     return wp_get_list(
         "/wp-json/wp/v2/posts",
         params={
@@ -184,6 +141,7 @@ def wp_get_future_posts_in_range(start_iso: str, end_iso: str) -> List[dict]:
             "orderby": "date",
             "order": "asc",
         },
+        fields=FUTURE_SLOT_FIELDS,
     )
 
 # =========================
@@ -197,184 +155,58 @@ PRICE_PATTERNS = [
     r"\bfrom\s+\$\s?\d[\d,]*(\.\d+)?",
     r"\bstarting\s+at\s+\$\s?\d[\d,]*(\.\d+)?",
 ]
+# literals every match of the pattern above contains (same order) - keep in sync
+PRICE_KEYWORDS = [("$",), ("usd",), ("usd", "달러"), ("원", "krw"), ("$",), ("$",)]
+# compiled once per process (see html_pipeline.regex_remove)
+scrub_price_text = regex_remove(PRICE_PATTERNS, PRICE_KEYWORDS)
 
 def strip_pricing(html: str) -> str:
     if not html:
         return html
-    for pat in PRICE_PATTERNS:
-        html = re.sub(pat, "", html, flags=re.IGNORECASE)
-    return html
+    return scrub_price_text(html)
 
-def fix_tables(html: str) -> str:
-    if not html:
-        return html
-    soup = BeautifulSoup(html, "html.parser")
-    changed = False
-    for table in soup.find_all("table"):
-        if table.parent and table.parent.name == "div" and "table-scroll" in (table.parent.get("class") or []):
-            continue
-        wrapper = soup.new_tag("div")
-        wrapper["class"] = ["table-scroll"]
-        table.wrap(wrapper)
-        changed = True
-    if changed:
-        style_id = "ri-table-scroll-style"
-        if not soup.find("style", attrs={"id": style_id}):
-            style = soup.new_tag("style")
-            style["id"] = style_id
-            style.string = """
+TABLE_SCROLL_CSS = """
 .table-scroll{overflow-x:auto;-webkit-overflow-scrolling:touch;margin:18px 0;border:1px solid rgba(255,255,255,.08);border-radius:12px}
 .table-scroll table{min-width:640px;width:100%;border-collapse:collapse}
 .table-scroll th,.table-scroll td{padding:10px 12px}
 """
-            soup.insert(0, style)
-    return str(soup)
 
-def unsplash_search(query: str, count: int = 3) -> List[str]:
-    if not UNSPLASH_ACCESS_KEY:
-        return []
-    try:
-        url = "https://api.unsplash.com/search/photos"
-        params = {
-            "query": query,
-            "per_page": min(max(count, 3), 10),
-            "orientation": "landscape",
-            "content_filter": "high",
-        }
-        headers = {"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"}
-        r = requests.get(url, params=params, headers=headers, timeout=TIMEOUT)
-        r.raise_for_status()
-        data = r.json()
-        results = data.get("results", [])
-        urls: List[str] = []
-        for item in results:
-            u = item.get("urls", {}).get("regular")
-            if u:
-                urls.append(u)
-        return urls[:count]
-    except Exception:
-        return []
+def fix_tables(html: str) -> str:
+    if not html:
+        return html
+    return HtmlPipeline([("fix_tables", table_scroll_pass(TABLE_SCROLL_CSS))]).run(html)
+
+def unsplash_search(query: str, count: int = 3, pool: str = "") -> List[str]:
+    # 디스크 캐시(TTL/LRU) + 카테고리별 풀: 쿼터 소진 후에도 풀에서 채움 (image_search.py)
+    return images.search(query, count, pool=pool)
+
+def _image_search(topic: str, count: int, pool: str = "") -> List[str]:
+    return unsplash_search(topic, count=count, pool=pool)
 
 def ensure_body_images(html: str, topic: str) -> str:
     if BODY_IMAGE_COUNT <= 0:
         return html
-    soup = BeautifulSoup(html or "", "html.parser")
-    imgs = soup.find_all("img")
-    if len(imgs) >= BODY_IMAGE_COUNT:
-        return str(soup)
-
-    need = BODY_IMAGE_COUNT - len(imgs)
-    urls = unsplash_search(topic, count=max(need, BODY_IMAGE_COUNT))
-    if not urls:
-        return str(soup)
-
-    h2s = soup.find_all(["h2", "h3"])
-    if h2s:
-        insert_points = [h2s[0]]
-        if len(h2s) >= 2:
-            insert_points.append(h2s[len(h2s)//2])
-        if len(h2s) >= 3:
-            insert_points.append(h2s[-1])
-    else:
-        insert_points = [soup.find() or soup]
-
-    used = 0
-    for i in range(need):
-        u = urls[i % len(urls)]
-        fig = soup.new_tag("figure")
-        fig["class"] = ["wp-block-image", "size-large"]
-        img = soup.new_tag("img")
-        img["src"] = u
-        img["alt"] = f"{topic} illustration"
-        img["loading"] = "lazy"
-        img["style"] = "width:100%;border-radius:14px;margin:26px 0;"
-        fig.append(img)
-        anchor = insert_points[used % len(insert_points)]
-        anchor.insert_before(fig)
-        used += 1
-
-    return str(soup)
+    return HtmlPipeline(
+        [("ensure_body_images", body_images_pass(BODY_IMAGE_COUNT, _image_search, topic))]
+    ).run(html)
+
+def build_post_pipeline(topic: str, category: str = "") -> HtmlPipeline:
+    """strip_pricing -> fix_tables -> ensure_body_images 를 한 번의 파싱으로."""
+    passes = [("fix_tables", table_scroll_pass(TABLE_SCROLL_CSS))]
+    if BODY_IMAGE_COUNT > 0:
+        # category: 쿼터 소진 시 같은 카테고리 이미지 풀에서
+        search = (lambda q, n: _image_search(q, n, pool=category)) if category else _image_search
+        # ensure_body_images가 다시 파싱하던 자리 (재파싱으로 바이트가 바뀌는 문서만)
+        passes.append(("reparse", reparse_pass))
+        passes.append(("ensure_body_images", body_images_pass(BODY_IMAGE_COUNT, search, topic)))
+    return HtmlPipeline(passes, pre=[("price_regex", scrub_price_text)])
 
 # =========================
 # Thumbnail generation
 # =========================
-def download_bytes(url: str) -> Optional[bytes]:
-    try:
-        r = requests.get(url, timeout=TIMEOUT)
-        r.raise_for_status()
-        return r.content
-    except Exception:
-        return None
-
-def load_font(size: int) -> ImageFont.ImageFont:
-    for path in [
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-    ]:
-        try:
-            return ImageFont.truetype(path, size=size)
-        except Exception:
-            continue
-    return ImageFont.load_default()
-
-def wrap_text(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.ImageFont, max_width: int) -> List[str]:
-    words = re.split(r"\s+", (text or "").strip())
-    lines: List[str] = []
-    cur = ""
-    for w in words:
-        test = (cur + " " + w).strip()
-        width = draw.textbbox((0, 0), test, font=font)[2]
-        if width <= max_width:
-            cur = test
-        else:
-            if cur:
-                lines.append(cur)
-            cur = w
-    if cur:
-        lines.append(cur)
-    return lines
-
 def make_featured_image(bg_bytes: bytes, title: str, category: str) -> bytes:
-    base = Image.open(io.BytesIO(bg_bytes)).convert("RGBA")
-    base = base.resize((1200, 675))
-
-    overlay = Image.new("RGBA", base.size, (0, 0, 0, 0))
-    draw = ImageDraw.Draw(overlay)
-
-    gold = (212, 175, 55, 220)
-    draw.line([(120, 90), (1080, 90)], fill=gold, width=3)
-    draw.line([(120, 585), (1080, 585)], fill=gold, width=3)
-
-    panel = (90, 140, 1110, 535)
-    draw.rounded_rectangle(panel, radius=28, fill=(0, 0, 0, 140), outline=(212, 175, 55, 140), width=2)
-
-    font_header = load_font(28)
-    font_title = load_font(56)
-    font_footer = load_font(24)
-
-    header = HEADER_TEXT
-    footer_left = SITE_BRAND
-    footer_right = (category or "").upper()
-
-    w = draw.textbbox((0, 0), header, font=font_header)[2]
-    draw.text(((1200 - w) / 2, 170), header, font=font_header, fill=gold)
-
-    lines = wrap_text(draw, title, font_title, 920)
-    y = 250
-    for line in lines[:3]:
-        w = draw.textbbox((0, 0), line, font=font_title)[2]
-        draw.text(((1200 - w) / 2, y), line, font=font_title, fill=(255, 255, 255, 235))
-        y += 70
-
-    draw.text((170, 500), footer_left, font=font_footer, fill=(255, 255, 255, 210))
-    if footer_right:
-        w = draw.textbbox((0, 0), footer_right, font=font_footer)[2]
-        draw.text((1200 - 170 - w, 500), footer_right, font=font_footer, fill=gold)
-
-    out = Image.alpha_composite(base, overlay).convert("RGB")
-    buf = io.BytesIO()
-    out.save(buf, format="JPEG", quality=92, optimize=True)
-    return buf.getvalue()
+    """썸네일 1장 (여러 장이면 ThumbnailPool / ThumbnailRenderer를 재사용)"""
+    return ThumbnailRenderer(bg_bytes, HEADER_TEXT, SITE_BRAND).render(title, category)
 
 # =========================
 # Type + Category rotation logic
@@ -385,7 +217,7 @@ def is_vs_post(title: str) -> bool:
 
 def classify_type_from_post(post: dict) -> str:
     title_html = (post.get("title") or {}).get("rendered", "")
-    title = BeautifulSoup(title_html, "html.parser").get_text(" ", strip=True)
+    title = soup_text(title_html)
     return "VS" if is_vs_post(title) else "INFO"
 
 def next_type_from_recent(recent_posts: List[dict]) -> str:
@@ -449,7 +281,7 @@ def cat_name_from_id(cats: List[dict], cid: int) -> str:
 # =========================
 # AI: generate post
 # =========================
-def ai_generate_article(title: str, category: str, post_type: str) -> str:
+def ai_generate_article(title: str, category: str, post_type: str, tag: str = "") -> str:
     sys = (
         "You are writing for a SaaS/AI tools blog. "
         "Do NOT mention any prices, dollar amounts, plan fees, or currency. "
@@ -492,12 +324,15 @@ Requirements:
 Return HTML only.
 """
 
-    resp = client.chat.completions.create(
+    # 스트리밍 + 중간 검증: fence/h1/가격/HTML 아님이면 바로 끊고 재시도 (fence는 이 파이프라인이 안 지움)
+    # tag(슬롯 시각)로 캐시: 생성 후 글 생성 전에 죽으면 다음 실행이 같은 본문을 재사용
+    # 프롬프트가 (카테고리, 타입)만으로 정해지므로 scope=슬롯: 다른 슬롯이 같은 본문을 받지 않도록
+    return llm_cache.cached_chat(
+        client, f"cluster:{title[:40]}", StreamValidator(), tag=tag, scope=tag,
         model="gpt-4.1-mini",
         messages=[{"role": "system", "content": sys}, {"role": "user", "content": user}],
         temperature=0.6,
     )
-    return resp.choices[0].message.content
 
 # =========================
 # Scheduling slots: daily 1
@@ -521,17 +356,134 @@ def upcoming_slots(now_kst: datetime) -> List[datetime]:
 def iso(dt: datetime) -> str:
     return dt.isoformat()
 
+def plan_slots(targets: List[datetime], cats: List[dict], recent: List[dict]) -> List[dict]:
+    """
+    모든 빈 슬롯의 타입/카테고리/제목을 미리 계산 (생성 순서와 무관하게 회전 유지)
+    """
+    # 현재 패턴/카테고리 시작점 계산
+    cur_type = next_type_from_recent(recent)
+    cur_cat_id = next_category_id(cats, recent)
+
+    cat_ids_all = [c["id"] for c in cats if isinstance(c, dict) and isinstance(c.get("id"), int)]
+
+    plans: List[dict] = []
+    for dt in targets:
+        cat_name = cat_name_from_id(cats, cur_cat_id) or "AI Tools"
+
+        # 타입별 제목 템플릿
+        if cur_type == "VS":
+            # placeholder 대신 카테고리 기반으로 "A/B/C"를 조금 더 자연스럽게
+            title = f"{cat_name}: Top Tools Compared — What to Choose in 2026"
+        else:
+            title = f"Best {cat_name} Tools (2026): A Practical Guide for Small Teams"
+
+        plans.append({"dt": dt, "type": cur_type, "cat_id": cur_cat_id, "cat_name": cat_name, "title": title})
+
+        # 다음 글 준비: 타입 패턴 진행 + 카테고리 회전
+        idx = TYPE_PATTERN.index(cur_type) if cur_type in TYPE_PATTERN else 0
+        cur_type = TYPE_PATTERN[(idx + 1) % len(TYPE_PATTERN)]
+
+        if cur_cat_id in cat_ids_all:
+            cur_idx = cat_ids_all.index(cur_cat_id)
+            cur_cat_id = cat_ids_all[(cur_idx + 1) % len(cat_ids_all)]
+        else:
+            cur_cat_id = cat_ids_all[0]
+    return plans
+
+# ------------------------------
+# 슬롯 스테이지 (stage_pipeline): generate -> html -> thumbnail -> upload -> publish
+# 각 함수는 plan dict를 받아 채워서 다음 스테이지로 넘김
+# 완료된 스테이지는 journal에 남겨서, 중간에 죽은 실행의 다음 실행이 거기서부터 이어감
+# ------------------------------
+def slot_key(plan: dict) -> str:
+    # 같은 슬롯이라도 회전 결과(카테고리/타입)가 바뀌면 다른 글이므로 키에 포함
+    return f"{plan['dt'].isoformat()}|{plan['cat_id']}|{plan['type']}"
+
+def journaled_media_id(plan: dict) -> Optional[int]:
+    """
+    지난 실행이 업로드만 하고 글 생성 전에 죽은 썸네일 (아직 WP에 있으면 재사용).
+    WP에서 지워진 경우(404/410)만 재사용 안 함, 그 외 에러는 그대로 올린다.
+    """
+    rec = journal.get(slot_key(plan), "upload") if journal else None
+    if not rec:
+        return None
+    r = wp.request("GET", f"/wp-json/wp/v2/media/{rec['media_id']}", params={"_fields": "id"},
+                   check_json=False, raise_for_status=False)
+    if r.status_code in (404, 410):
+        print(f"[JOURNAL] media id={rec['media_id']} was deleted in WP, uploading again")
+        return None
+    wp.ensure_json_response(r, f"GET media {rec['media_id']}")
+    r.raise_for_status()
+    return rec["media_id"]
+
+def stage_generate(plan: dict) -> dict:
+    rec = journal.get(slot_key(plan), "html") if journal else None
+    html = journal.get_html(rec["sha"]) if rec else None
+    if html is not None:
+        print(f"[JOURNAL] slot={plan['dt'].isoformat()} resume html sha={rec['sha'][:12]}")
+        plan["html"] = html
+        plan["resumed"] = True
+        return plan
+    plan["html"] = ai_generate_article(plan["title"], plan["cat_name"], plan["type"], tag=plan["dt"].isoformat())
+    return plan
+
+def stage_html(plan: dict) -> dict:
+    if plan.pop("resumed", False):
+        return plan
+    plan["html"] = build_post_pipeline(f"{plan['cat_name']} {plan['type']}", category=plan["cat_name"]).run(plan["html"])
+    if journal:
+        journal.record(slot_key(plan), "html", sha=journal.put_html(plan["html"]))
+    return plan
+
+def stage_thumbnail(plan: dict, thumbs: ThumbnailPool) -> dict:
+    if plan.get("media_id"):
+        return plan  # journal에서 재사용 (main에서 확인)
+    safe_title = html_mod.unescape(soup_text(plan["title"]))
+    plan["thumb"] = thumbs.render(safe_title, plan["cat_name"])
+    return plan
+
+def stage_upload(plan: dict) -> dict:
+    if plan.get("media_id"):
+        return plan
+    dt = plan["dt"]
+    plan["media_id"] = wp_upload_media(plan.pop("thumb"), f"thumb_auto_{dt.strftime('%Y%m%d_%H%M')}.jpg", mime="image/jpeg")
+    if journal:
+        journal.record(slot_key(plan), "upload", media_id=plan["media_id"])
+    return plan
+
+def stage_publish(plan: dict) -> dict:
+    payload = {
+        "title": plan["title"],
+        "status": "future",
+        "date": plan["dt"].isoformat(),
+        "content": plan["html"],
+        "categories": [plan["cat_id"]],
+        "featured_media": plan["media_id"],
+    }
+
+    created = wp_post("/wp-json/wp/v2/posts", payload)
+    llm_cache.consume(plan["dt"].isoformat())  # 템플릿 제목이라 같은 프롬프트가 다시 오므로, 게시 후엔 재사용 금지
+    if journal:
+        journal.finish(slot_key(plan), post_id=created.get("id"))
+    print(
+        f"Created future post id={created.get('id')} "
+        f"date={created.get('date')} type={plan['type']} cat={plan['cat_name']}"
+    )
+    return plan
+
 def main():
+    if mirror:
+        mirror.sync()
+
     cats = wp_get_categories()
     if not cats:
         raise SystemExit("No categories found in WP.")
 
     recent = wp_get_recent_posts(limit=40)
 
-    # 썸네일 배경 다운로드 (FIX: 변수명 오타 THUMBNAIL_BASE_MEDIAID -> THUMBNAIL_BASE_MEDIA_ID)
-    bg_url = wp_get_media_source_url(THUMBNAIL_BASE_MEDIA_ID)
-    bg_bytes = download_bytes(bg_url) if bg_url else None
-    if not bg_bytes:
+    # 썸네일 배경: 저장소 assets/ -> 로컬 캐시(ETag/Last-Modified 재검증) -> 없을 때만 WP에서 다운로드
+    bg = BackgroundCache().resolve(THUMBNAIL_BASE_MEDIA_ID, wp.session, wp_get_media_source_url, timeout=TIMEOUT)
+    if bg is None:
         raise SystemExit("Could not download thumbnail background. Check THUMBNAIL_BASE_MEDIA_ID")
 
     now_kst = datetime.now(tz=KST)
@@ -559,59 +511,53 @@ def main():
         print("No empty slots to fill. Exiting.")
         return
 
-    print(f"Now(KST)={now_kst.isoformat()} | targets={len(targets)}")
-
-    # 현재 패턴/카테고리 시작점 계산
-    cur_type = next_type_from_recent(recent)
-    cur_cat_id = next_category_id(cats, recent)
-
-    cat_ids_all = [c["id"] for c in cats if isinstance(c, dict) and isinstance(c.get("id"), int)]
-
-    for dt in targets:
-        cat_name = cat_name_from_id(cats, cur_cat_id) or "AI Tools"
-
-        # 타입별 제목 템플릿
-        if cur_type == "VS":
-            # placeholder 대신 카테고리 기반으로 "A/B/C"를 조금 더 자연스럽게
-            title = f"{cat_name}: Top Tools Compared — What to Choose in 2026"
-        else:
-            title = f"Best {cat_name} Tools (2026): A Practical Guide for Small Teams"
-
-        # 본문 생성/정리
-        html = ai_generate_article(title, cat_name, cur_type)
-        html = strip_pricing(html)
-        html = fix_tables(html)
-        html = ensure_body_images(html, f"{cat_name} {cur_type}")
-
-        # 썸네일 생성 업로드
-        safe_title = html_mod.unescape(BeautifulSoup(title, "html.parser").get_text(" ", strip=True))
-        thumb_bytes = make_featured_image(bg_bytes, safe_title, cat_name)
-        media_id = wp_upload_media(thumb_bytes, f"thumb_auto_{dt.strftime('%Y%m%d_%H%M')}.jpg", mime="image/jpeg")
+    print(f"Now(KST)={now_kst.isoformat()} | targets={len(targets)} | GEN_WORKERS={GEN_WORKERS}")
+
+    plans = plan_slots(targets, cats, recent)
+    if journal:
+        # 이미 채워진 슬롯/회전이 바뀐 슬롯의 기록은 버림 (남은 건 이번 실행에서 이어서)
+        journal.load().retain(slot_key(p) for p in plans)
+        # 재사용할 썸네일은 워커 스레드가 아니라 여기서 한 번에 확인
+        for plan in plans:
+            media_id = journaled_media_id(plan)
+            if media_id:
+                print(f"[JOURNAL] slot={plan['dt'].isoformat()} reuse media id={media_id}")
+                plan["media_id"] = media_id
+
+    # 썸네일 렌더+JPEG 인코딩은 프로세스 풀에서 (배경/오버레이/폰트는 워커당 한 번만)
+    thumbs = ThumbnailPool(bg, HEADER_TEXT, SITE_BRAND, workers=min(THUMB_WORKERS, len(plans)))
+
+    # 스테이지별 워커 + bounded queue: N번 글 업로드 중에 N+1번 글 생성. 글 생성(publish)은 슬롯 순서대로
+    pipeline = StagePipeline([
+        Stage("generate", stage_generate, workers=GEN_WORKERS),
+        Stage("html", stage_html, workers=2),
+        Stage("thumbnail", lambda plan: stage_thumbnail(plan, thumbs), workers=thumbs.workers),
+        Stage("upload", stage_upload, workers=UPLOAD_WORKERS),
+        Stage("publish", stage_publish, ordered=True),
+    ])
+
+    # 한 슬롯 실패가 나머지 슬롯을 막지 않도록
+    failed: List[str] = []
+    try:
+        for plan, err in pipeline.run(plans):
+            if err is not None:
+                failed.append(plan["dt"].isoformat())
+                print(f"[FAIL] slot={plan['dt'].isoformat()} type={plan['type']} cat={plan['cat_name']}: {str(err)[:300]}")
+    finally:
+        thumbs.close()
 
-        payload = {
-            "title": title,
-            "status": "future",
-            "date": dt.isoformat(),
-            "content": html,
-            "categories": [cur_cat_id],
-            "featured_media": media_id,
-        }
-
-        created = wp_post("/wp-json/wp/v2/posts", payload)
-        print(
-            f"Created future post id={created.get('id')} "
-            f"date={created.get('date')} type={cur_type} cat={cat_name}"
-        )
-
-        # 다음 글 준비: 타입 패턴 진행 + 카테고리 회전
-        idx = TYPE_PATTERN.index(cur_type) if cur_type in TYPE_PATTERN else 0
-        cur_type = TYPE_PATTERN[(idx + 1) % len(TYPE_PATTERN)]
-
-        if cur_cat_id in cat_ids_all:
-            cur_idx = cat_ids_all.index(cur_cat_id)
-            cur_cat_id = cat_ids_all[(cur_idx + 1) % len(cat_ids_all)]
-        else:
-            cur_cat_id = cat_ids_all[0]
+    print(f"[HTML] pipeline timings: {format_timing_totals()}")
+    if failed:
+        raise SystemExit(f"{len(failed)}/{len(plans)} slots failed (filled again next run): {failed}")
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        wp.print_stats()
+        llm_cache.print_stats()
+        images.print_stats()
+        if media_index:
+            media_index.close()
+        if journal:
+            journal.close()
@@ -1,9 +1,16 @@
-import os, re, random, requests
+import os, re, random
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Set
-from requests.auth import HTTPBasicAuth
+from typing import Dict, List, Optional, Tuple
 from openai import OpenAI
 
+from wp_client import WPClient
+from wp_mirror import WPMirror
+from stage_pipeline import Stage, StagePipeline
+from openai_stream import StreamValidator
+from title_index import TitleIndex
+from image_search import UnsplashSearch
+import llm_cache
+
 # ==============================
 # ENV
 # ==============================
@@ -22,13 +29,22 @@ POST_HOUR = int(os.environ.get("POST_HOUR", "10"))
 POST_MINUTE = int(os.environ.get("POST_MINUTE", "0"))
 DAYS_AHEAD_START = int(os.environ.get("DAYS_AHEAD_START", "1"))
 POST_COUNT = int(os.environ.get("POST_COUNT", "1"))
+GEN_WORKERS = int(os.environ.get("GEN_WORKERS", "3"))  # POST_COUNT>1일 때 동시에 생성할 본문 수
 
 # 제목 중복 회피(최근 N개)
 RECENT_TITLE_WINDOW = int(os.environ.get("RECENT_TITLE_WINDOW", "50"))
+# 한 번의 호출로 받을 제목 후보 수 / 기존 제목과 이 이상 비슷하면 탈락 (title_index.py 토큰 Jaccard)
+TITLE_CANDIDATES = int(os.environ.get("TITLE_CANDIDATES", "5"))
+TITLE_SIM_MAX = float(os.environ.get("TITLE_SIM_MAX", "0.6"))
+
+# 로컬 SQLite 미러 사용(기본). 0이면 매번 WP에서 직접 조회
+USE_MIRROR = os.environ.get("WP_MIRROR", "1").strip() != "0"
 
 WP_POST_URL = f"{WP_BASE}/wp-json/wp/v2/posts"
 WP_CAT_URL  = f"{WP_BASE}/wp-json/wp/v2/categories"
-AUTH = HTTPBasicAuth(WP_USER, WP_PASS)
+wp = WPClient(WP_BASE, WP_USER, WP_PASS, timeout=40)
+mirror = WPMirror(wp) if USE_MIRROR else None
+images = UnsplashSearch(wp.session, UNSPLASH_KEY, timeout=20)  # 디스크 캐시 + 카테고리별 이미지 풀 (image_search.py)
 client = OpenAI(api_key=OPENAI_KEY)
 
 # ==============================
@@ -42,44 +58,61 @@ def normalize_title(t: str) -> str:
     t = re.sub(r"\s+", " ", t).strip().lower()
     return t
 
+# 이 스크립트는 status_code를 직접 보고 판단하므로 raise/JSON 체크 없이 Response 반환
 def wp_get(url: str):
-    return requests.get(url, auth=AUTH, timeout=40)
+    return wp.request("GET", url, check_json=False, raise_for_status=False)
 
 def wp_post(url: str, json_data: dict):
-    return requests.post(url, auth=AUTH, json=json_data, timeout=60)
+    return wp.request("POST", url, json=json_data, timeout=60, check_json=False, raise_for_status=False)
 
 def fetch_categories() -> List[dict]:
-    out = []
-    page = 1
-    while True:
-        url = f"{WP_CAT_URL}?per_page=100&page={page}"
-        r = wp_get(url)
-        if r.status_code != 200:
-            break
-        out.extend(r.json() or [])
-        total_pages = int(r.headers.get("X-WP-TotalPages", "1"))
-        if page >= total_pages:
-            break
-        page += 1
+    if mirror:
+        return [c for c in mirror.categories() if c.get("slug") and c.get("id")]
+    # X-WP-TotalPages를 보고 나머지 페이지는 병렬로 (실패한 페이지에서 멈춤)
+    out = wp.get_all_pages(WP_CAT_URL, strict=False, fields=("id", "name", "slug"))
     # "uncategorized" 같은 건 빼고 싶으면 여기서 필터 가능
     out = [c for c in out if c.get("slug") and c.get("id")]
     return out
 
-def fetch_recent_titles() -> Set[str]:
-    titles = set()
+def fetch_recent_titles() -> List[Tuple[str, str]]:
+    """(date, normalized title) of the newest publish + future posts (title hint)"""
+    titles = []
+    if mirror:
+        for status in ("publish", "future"):
+            for date, t in mirror.recent_titles(status, RECENT_TITLE_WINDOW):
+                titles.append((date, normalize_title(t)))
+        return titles
     for status in ("publish", "future"):
-        r = wp_get(f"{WP_POST_URL}?status={status}&per_page=50")
+        r = wp_get(f"{WP_POST_URL}?status={status}&per_page={RECENT_TITLE_WINDOW}&orderby=date&order=desc&_fields=title,date")
         if r.status_code != 200:
             continue
         for p in (r.json() or []):
-            titles.add(normalize_title(p.get("title", {}).get("rendered", "")))
+            titles.append((p.get("date") or "", normalize_title(p.get("title", {}).get("rendered", ""))))
+    return titles
+
+def fetch_all_titles() -> List[str]:
+    """사이트 전체 제목 (publish + future) -> 유사 제목 인덱스용"""
+    if mirror:
+        return mirror.all_titles()
+    titles = []
+    for status in ("publish", "future"):
+        for p in wp.get_all_pages(WP_POST_URL, {"status": status}, strict=False, fields=("title",)):
+            titles.append(strip_tags((p.get("title") or {}).get("rendered", "")))
     return titles
 
 # ==============================
 # Schedule: 10:00 + collision avoid
 # ==============================
 def get_future_dates_set():
-    r = wp_get(WP_POST_URL + "?status=future&per_page=100")
+    if mirror:
+        used = set()
+        for p in mirror.future_posts():
+            try:
+                used.add(datetime.fromisoformat(p["date"]).replace(tzinfo=None))
+            except Exception:
+                pass
+        return used
+    r = wp_get(WP_POST_URL + "?status=future&per_page=100&_fields=date")
     used = set()
     if r.status_code != 200:
         return used
@@ -100,26 +133,17 @@ def next_available_10am(start_day: datetime, used: set):
 # ==============================
 # Inline images
 # ==============================
-def unsplash_random(query: str) -> str:
-    if not UNSPLASH_KEY:
-        return ""
-    q = requests.utils.quote(query)
-    api = f"https://api.unsplash.com/photos/random?query={q}&orientation=landscape&client_id={UNSPLASH_KEY}"
-    r = requests.get(api, timeout=20)
-    if r.status_code == 200:
-        return (r.json().get("urls") or {}).get("regular") or ""
-    return ""
-
-def pick_inline_urls(title: str):
+def pick_inline_urls(title: str, pool: str = ""):
     q1 = title
     q2 = f"{title} software dashboard"
     q3 = f"{title} checklist"
 
+    # 세 검색을 동시에 (캐시 hit이면 호출 없음), 각 결과에서 하나씩 무작위로
     urls = []
-    for q in (q1, q2, q3):
-        u = unsplash_random(q)
-        if u:
-            urls.append(u)
+    for page in images.search_many([q1, q2, q3], count=3, pool=pool):
+        fresh = [u for u in page if u not in urls]
+        if fresh:
+            urls.append(random.choice(fresh))
 
     if len(urls) == 3:
         return urls
@@ -158,42 +182,65 @@ def checklist_html() -> str:
 # ==============================
 # OpenAI: title generation + article generation
 # ==============================
-def call_openai(messages):
-    resp = client.chat.completions.create(
+def call_openai(messages, validator: Optional[StreamValidator] = None, label: str = "openai",
+                tag: str = "", fresh: bool = False, scope: str = ""):
+    # validator가 있으면(본문) 스트리밍으로 받으면서 검증, 문제 있으면 바로 중단
+    # 응답은 llm_cache에 저장 -> 게시 전에 죽으면 다음 실행이 재사용
+    return llm_cache.cached_chat(
+        client, label, validator, tag=tag, fresh=fresh, scope=scope,
         model=MODEL,
         messages=messages,
         temperature=0.6,
-    )
-    return resp.choices[0].message.content.strip()
+    ).strip()
+
+_CAND_PREFIX_RE = re.compile(r"^\s*(?:\d+[.)]|[-*•])\s*")
+
+def recent_title_hint(recent_titles: List[Tuple[str, str]], k: int = 10) -> str:
+    """날짜 최신순 제목 k개 (같은 제목은 한 번만)"""
+    out: List[str] = []
+    for _, t in sorted(recent_titles, reverse=True):
+        if t and t not in out:
+            out.append(t)
+            if len(out) >= k:
+                break
+    return ", ".join(out)
 
-def generate_title(recent_titles: Set[str]) -> str:
-    # 최근 제목 10개만 힌트로 넣고, 중복 피하게
-    hint = ", ".join(list(recent_titles)[:10]) if recent_titles else ""
+def generate_titles(recent_titles: List[Tuple[str, str]], n: int = TITLE_CANDIDATES, tag: str = "",
+                    fresh: bool = False) -> List[str]:
+    # 최근 제목 10개만 힌트로 넣고, 중복 피하게 (앞 job이 고른 제목도 날짜순으로 들어감)
+    hint = recent_title_hint(recent_titles)
     messages = [
         {
             "role": "system",
             "content": (
                 "You create SEO blog post titles for a SaaS/AI tools blog.\n"
-                "Return ONLY one title line.\n"
+                f"Return exactly {n} different title ideas, one per line, nothing else.\n"
                 "Constraints:\n"
                 "- Must be useful for small businesses.\n"
                 "- Include the year 2026.\n"
                 "- Prefer: Best / Comparison / Pricing / Guide / Alternatives.\n"
-                "- Keep it <= 75 characters.\n"
-                "- No quotes.\n"
+                "- Keep each <= 75 characters.\n"
+                "- Cover different tools/topics, not rewordings of one title.\n"
+                "- No quotes, no numbering.\n"
             )
         },
         {
             "role": "user",
-            "content": f"Recent titles to avoid: {hint}\nGenerate ONE new title:"
+            "content": f"Recent titles to avoid: {hint}\nGenerate {n} new titles:"
         }
     ]
-    title = call_openai(messages).splitlines()[0].strip()
-    if len(title) > 75:
-        title = title[:74].rstrip() + "…"
-    return title
+    out = []
+    # scope=슬롯 날짜: 같은 실행의 다른 job이 같은 후보를 캐시에서 받지 않도록 (재실행 시 같은 슬롯은 hit)
+    for line in call_openai(messages, label="titles", tag=tag, fresh=fresh, scope=tag).splitlines():
+        title = _CAND_PREFIX_RE.sub("", line).strip().strip('"').strip()
+        if not title:
+            continue
+        if len(title) > 75:
+            title = title[:74].rstrip() + "…"
+        out.append(title)
+    return out[:n] or ["Best AI Tools for Small Businesses (2026)"]
 
-def generate_article(title: str) -> str:
+def generate_article(title: str, tag: str = "") -> str:
     messages = [
         {
             "role": "system",
@@ -210,20 +257,23 @@ def generate_article(title: str) -> str:
         },
         {"role": "user", "content": f"Title: {title}\nWrite the article:"}
     ]
-    return call_openai(messages)
+    # 이 프롬프트는 pricing 섹션을 요구하므로 가격 개수로는 중단하지 않음
+    return call_openai(messages, StreamValidator(max_prices=None), label=f"new:{title[:40]}", tag=tag)
 
 # ==============================
 # Publish
 # ==============================
-def publish_article(title: str, content: str, category_id: Optional[int], publish_date: datetime):
-    u1, u2, u3 = pick_inline_urls(title)
+def build_content(title: str, content: str, pool: str = "") -> str:
+    u1, u2, u3 = pick_inline_urls(title, pool=pool)
     content = content.replace("[IMAGE_TOP]", img_block(u1, f"{title} cover"))
     content = content.replace("[IMAGE_MID]", img_block(u2, f"{title} example"))
     content = content.replace("[IMAGE_BOT]", img_block(u3, f"{title} checklist"))
 
     if "Save / Print Checklist" not in strip_tags(content):
         content = content.rstrip() + "\n" + checklist_html() + "\n"
+    return content
 
+def publish_article(title: str, content: str, category_id: Optional[int], publish_date: datetime):
     payload = {
         "title": title,
         "content": content,
@@ -238,41 +288,90 @@ def publish_article(title: str, content: str, category_id: Optional[int], publis
     print("WP:", r.status_code, "|", title, "->", publish_date.isoformat(), "| cat:", category_id)
     if r.status_code not in (200, 201):
         print(r.text[:400])
+        return False
+    return True
+
+# ------------------------------
+# 스테이지 (stage_pipeline): title -> article -> images -> publish
+# title은 워커 1개로 순서대로 (recent_titles 중복 회피가 앞 글 제목에 의존)
+# ------------------------------
+def pick_title(index: TitleIndex, recent_titles: List[Tuple[str, str]], tag: str = "") -> str:
+    # 후보 N개를 한 번에 받아 사이트 전체 제목과 비교, 가장 덜 비슷한 것 선택
+    # 전부 탈락이면 한 번만 새로 요청 (캐시 건너뜀), 그래도 없으면 가장 덜 비슷한 후보
+    ranked = []
+    for _try in range(2):
+        ranked = index.rank(generate_titles(recent_titles, tag=tag, fresh=_try > 0))
+        for sim, cand, near in ranked:
+            print(f"[TITLE] sim={sim:.2f} {cand!r}" + (f" ~ {near!r}" if sim >= TITLE_SIM_MAX else ""))
+        if ranked[0][0] < TITLE_SIM_MAX:
+            break
+    sim, title, near = ranked[0]
+    if sim >= TITLE_SIM_MAX:
+        print(f"[WARN] every candidate is close to an existing title; using {title!r} (sim={sim:.2f} ~ {near!r})")
+
+    index.add(title)
+    recent_titles.append((tag, normalize_title(title)))
+    return title
+
+def stage_title(job: dict, index: TitleIndex, recent_titles: List[Tuple[str, str]]) -> dict:
+    job["title"] = pick_title(index, recent_titles, tag=job["date"].isoformat())
+    print("Category:", job["cat_slug"], "->", job["cat_id"])
+    print("Generating:", job["title"])
+    return job
+
+def stage_article(job: dict) -> dict:
+    job["content"] = generate_article(job["title"], tag=job["date"].isoformat())
+    return job
+
+def stage_images(job: dict) -> dict:
+    job["content"] = build_content(job["title"], job["content"], pool=job["cat_slug"])
+    return job
+
+def stage_publish(job: dict) -> dict:
+    if publish_article(job["title"], job["content"], job["cat_id"], job["date"]):
+        llm_cache.consume(job["date"].isoformat())
+    return job
 
 def main():
+    if mirror:
+        mirror.sync(media=False)
+
     cats = fetch_categories()
     if not cats:
         raise RuntimeError("No categories found. Check WP credentials/permissions.")
 
     recent_titles = fetch_recent_titles()
+    index = TitleIndex(fetch_all_titles())
+    print(f"[TITLE] index titles={len(index)} candidates={TITLE_CANDIDATES} sim_max={TITLE_SIM_MAX}")
     used_times = get_future_dates_set()
     start_day = datetime.now() + timedelta(days=DAYS_AHEAD_START)
 
+    # 카테고리/예약 시간은 미리 정하고, 생성은 스테이지 파이프라인으로
+    jobs = []
     for _ in range(POST_COUNT):
         cat = random.choice(cats)
-        cat_id = int(cat["id"])
-        cat_slug = cat.get("slug", "")
-
-        # 제목 생성 + 중복 회피(최대 3번 재시도)
-        title = None
-        for _try in range(3):
-            cand = generate_title(recent_titles)
-            if normalize_title(cand) not in recent_titles:
-                title = cand
-                break
-        if not title:
-            title = generate_title(recent_titles)
-
-        recent_titles.add(normalize_title(title))
-
         publish_date = next_available_10am(start_day, used_times)
         start_day = publish_date + timedelta(days=1)
+        jobs.append({"cat_id": int(cat["id"]), "cat_slug": cat.get("slug", ""), "date": publish_date})
 
-        print("Category:", cat_slug, "->", cat_id)
-        print("Generating:", title)
-        content = generate_article(title)
-
-        publish_article(title, content, cat_id, publish_date)
+    pipeline = StagePipeline([
+        Stage("title", lambda job: stage_title(job, index, recent_titles), ordered=True),
+        Stage("article", stage_article, workers=GEN_WORKERS),
+        Stage("images", stage_images, workers=2),
+        Stage("publish", stage_publish, ordered=True),
+    ])
+    failed = 0
+    for job, err in pipeline.run(jobs):
+        if err is not None:
+            failed += 1
+            print("[FAIL]", job.get("title") or job["cat_slug"], "->", job["date"].isoformat(), "|", str(err)[:300])
+    if failed:
+        raise SystemExit(f"{failed}/{len(jobs)} posts failed")
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        wp.print_stats()
+        llm_cache.print_stats()
+        images.print_stats()
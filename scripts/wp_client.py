@@ -0,0 +1,417 @@
+"""
+Shared WordPress REST client used by every script in this folder.
+
+- One requests.Session per run -> keep-alive, so WP_BASE (WAF 뒤에 있음) pays the
+  TCP+TLS handshake once instead of on every call.
+- Per-host pool sizing: the WP host gets WP_POOL_MAXSIZE connections, any other
+  host (media downloads etc.) the default size. Extra hosts can be tuned with
+  HTTP_POOL_SIZES="api.unsplash.com=4,images.unsplash.com=2".
+- JSON/WAF checks (formerly _ensure_json_response) are built in.
+- Field projection: list/get helpers take `fields=` and send `_fields=` so WP
+  only serialises what the caller needs (no content.rendered, _links, yoast_head...).
+  Post bodies are then loaded in id-batched `include=` requests (get_by_ids).
+- Updates: update_item() probes once whether the server takes POST or only PUT
+  and then sticks to it; batch() sends many writes through /wp-json/batch/v1
+  (max size probed once via OPTIONS, 0 = batch API not available).
+- stats() / print_stats() report requests sent through request() vs connections
+  opened/reused for them, and response bytes received.
+
+Auth is attached per WP request (not on the session) so the same pooled session
+can be used for third-party hosts without leaking WP credentials.
+
+Optional ENV:
+  WP_POOL_MAXSIZE=8        connections kept alive to WP_BASE
+  HTTP_POOL_MAXSIZE=4      connections kept alive per other host
+  HTTP_POOL_SIZES=         host=size,host=size overrides
+  WP_PAGE_WORKERS=4        concurrent page fetches for list endpoints
+  WP_BATCH_MAX=25          cap for items per batch/v1 request (server limit wins if lower)
+"""
+
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple, Sequence, Iterable
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+WP_POOL_MAXSIZE = int(os.environ.get("WP_POOL_MAXSIZE", "8"))
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "4"))
+HTTP_POOL_SIZES = os.environ.get("HTTP_POOL_SIZES", "")
+WP_PAGE_WORKERS = int(os.environ.get("WP_PAGE_WORKERS", "4"))
+WP_BATCH_MAX = int(os.environ.get("WP_BATCH_MAX", "25"))
+
+
+def _parse_pool_sizes(spec: str) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for part in (spec or "").split(","):
+        host, _, size = part.strip().partition("=")
+        if host and size.strip().isdigit():
+            out[host.strip().lower()] = int(size)
+    return out
+
+
+def with_fields(params: Optional[dict], fields: Optional[Sequence[str]]) -> dict:
+    """Copy params and add `_fields=a,b,c` (WP REST field projection)."""
+    q = dict(params or {})
+    if fields:
+        q["_fields"] = ",".join(fields)
+    return q
+
+
+class WPClient:
+    def __init__(self, base: str, user: str, password: str, timeout: int = 30,
+                 pool_maxsize: int = WP_POOL_MAXSIZE):
+        self.base = base.rstrip("/")
+        self.auth = HTTPBasicAuth(user, password)
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self.bytes_in = 0
+        self.sent = 0
+        self.opened = 0
+        self._socks: "weakref.WeakSet" = weakref.WeakSet()  # 이미 센 소켓 (keep-alive 재사용 판별)
+        self._update_method: Optional[str] = None  # "POST" | "PUT", learned on first update
+        self._batch_limit: Optional[int] = None    # probed once per run
+
+        default = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE)
+        self._mount("https://", default)
+        self._mount("http://", default)
+
+        host_sizes = _parse_pool_sizes(HTTP_POOL_SIZES)
+        wp_parts = urlsplit(self.base)
+        if wp_parts.netloc:
+            host_sizes[wp_parts.netloc.lower()] = pool_maxsize
+        for host, size in host_sizes.items():
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+            self._mount(f"https://{host}/", adapter)
+            self._mount(f"http://{host}/", adapter)
+
+    def _mount(self, prefix: str, adapter: HTTPAdapter) -> None:
+        self.session.mount(prefix, adapter)
+
+    # -------------------------
+    # low level
+    # -------------------------
+    def url(self, path: str) -> str:
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base}{path}"
+
+    def is_wp_url(self, url: str) -> bool:
+        return url.startswith(self.base + "/") or url == self.base
+
+    @staticmethod
+    def ensure_json_response(r: requests.Response, context: str) -> None:
+        """
+        GitHub Actions + WAF/보안플러그인 환경에서 HTML/텍스트가 오는 경우가 잦아서
+        content-type 확인 후 JSON이 아니면 바로 원인 출력하고 종료한다.
+        """
+        ct = (r.headers.get("content-type") or "").lower()
+        if "application/json" not in ct:
+            print(f"[{context}] NON-JSON response")
+            print("  status:", r.status_code)
+            print("  content-type:", ct)
+            print("  url:", r.url)
+            body = (r.text or "")
+            print("  body(head):", body[:400])
+            # HTTP 에러면 raise
+            r.raise_for_status()
+            # 200인데 HTML이면 대부분 리다이렉트/차단 페이지
+            raise SystemExit(f"{context}: WP did not return JSON (blocked/redirected/WAF).")
+
+    def request(self, method: str, path: str, *, params: Optional[dict] = None,
+                json: Any = None, data: Any = None, headers: Optional[dict] = None,
+                timeout: Optional[int] = None, check_json: bool = True,
+                raise_for_status: bool = True) -> requests.Response:
+        """
+        Send one request through the pooled session.
+        WP auth is only attached to WP_BASE urls.
+        """
+        url = self.url(path)
+        hdrs = {"Accept": "application/json"}  # GET에는 Content-Type 넣지 말 것
+        if json is not None:
+            hdrs["Content-Type"] = "application/json"
+        hdrs.update(headers or {})
+        r = self.session.request(
+            method,
+            url,
+            params=params,
+            json=json,
+            data=data,
+            headers=hdrs,
+            auth=self.auth if self.is_wp_url(url) else None,
+            timeout=timeout or self.timeout,
+            stream=True,  # 본문을 읽기 전에 어떤 소켓으로 갔는지 확인
+        )
+        sock = getattr(getattr(r.raw, "connection", None), "sock", None)
+        with self._lock:
+            self.sent += 1
+            if sock is not None and sock not in self._socks:
+                self._socks.add(sock)
+                self.opened += 1
+        body = r.content  # 여기서 읽고 커넥션을 풀에 반납
+        with self._lock:
+            self.bytes_in += len(body or b"")
+        if check_json:
+            self.ensure_json_response(r, f"{method} {path}")
+        if raise_for_status:
+            r.raise_for_status()
+        return r
+
+    # -------------------------
+    # JSON helpers
+    # -------------------------
+    def get_json(self, path: str, params: Optional[dict] = None,
+                 fields: Optional[Sequence[str]] = None):
+        return self.request("GET", path, params=with_fields(params, fields)).json()
+
+    def get_list(self, path: str, params: Optional[dict] = None,
+                 fields: Optional[Sequence[str]] = None) -> List[dict]:
+        """
+        list endpoint는 반드시 list[dict]여야 한다.
+        - dict가 오면 WP REST error일 가능성이 크므로 메시지 출력 후 종료
+        - list라도 요소가 str 등으로 섞이면 종료(원인 숨기지 않음)
+        """
+        data = self.get_json(path, params, fields=fields)
+        return self._check_list(path, data)
+
+    @staticmethod
+    def _check_list(path: str, data) -> List[dict]:
+        if isinstance(data, dict):
+            code = data.get("code")
+            msg = data.get("message")
+            print(f"[GET {path}] WP API ERROR:", code, "|", msg)
+            raise SystemExit(f"WP API returned error dict: {code}")
+
+        if not isinstance(data, list):
+            print(f"[GET {path}] Unexpected JSON type:", type(data))
+            print("  body(head):", str(data)[:400])
+            raise SystemExit("Unexpected WP API response type (not list).")
+
+        if any(not isinstance(x, dict) for x in data):
+            bad = [x for x in data if not isinstance(x, dict)]
+            print(f"[GET {path}] Non-dict items found in list. sample:", bad[:3])
+            raise SystemExit("WP list response contains non-dict items (strings).")
+
+        return data
+
+    # -------------------------
+    # pagination
+    # -------------------------
+    def _get_page(self, path: str, params: dict, page: int,
+                  strict: bool) -> Tuple[Optional[List[dict]], Optional[int]]:
+        """
+        Returns (items, total_pages). total_pages is None when WP did not send
+        X-WP-TotalPages / X-WP-Total. items is None for a failed page (strict=False).
+        """
+        q = dict(params)
+        q["page"] = page
+        if strict:
+            r = self.request("GET", path, params=q)
+            items = self._check_list(path, r.json())
+        else:
+            r = self.request("GET", path, params=q, check_json=False, raise_for_status=False)
+            if r.status_code != 200:
+                return None, None
+            try:
+                items = r.json()
+            except ValueError:
+                return None, None
+            if not isinstance(items, list):
+                return None, None
+
+        total_pages = None
+        tp = (r.headers.get("X-WP-TotalPages") or "").strip()
+        total = (r.headers.get("X-WP-Total") or "").strip()
+        if tp.isdigit():
+            total_pages = int(tp)
+        elif total.isdigit():
+            per_page = int(q.get("per_page") or 10)
+            total_pages = (int(total) + per_page - 1) // per_page
+        return items, total_pages
+
+    def get_all_pages(self, path: str, params: Optional[dict] = None, per_page: int = 100,
+                      workers: int = WP_PAGE_WORKERS, strict: bool = True,
+                      fields: Optional[Sequence[str]] = None) -> List[dict]:
+        """
+        Fetch every page of a WP list endpoint.
+        - Page 1 is fetched first; if it carries X-WP-TotalPages (or X-WP-Total),
+          pages 2..N are fetched concurrently (bounded by `workers`) and joined in
+          page order, so the result matches the sequential walk.
+        - Without those headers, fall back to walking pages until a short page.
+        strict=False: a failed page (non-200 / non-list) ends the listing instead of exiting.
+        fields: WP `_fields` projection.
+        """
+        base = with_fields(params, fields)
+        base["per_page"] = per_page
+
+        first, total_pages = self._get_page(path, base, 1, strict)
+        if not first:
+            return []
+        out: List[dict] = list(first)
+
+        if total_pages is not None:
+            rest = list(range(2, total_pages + 1))
+            if not rest:
+                return out
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(rest)))) as ex:
+                chunks = ex.map(lambda pg: self._get_page(path, base, pg, strict)[0], rest)
+                for chunk in chunks:
+                    if not chunk:
+                        # 실패/빈 페이지 이후는 순차 모드와 동일하게 버린다
+                        break
+                    out.extend(chunk)
+            return out
+
+        # fallback: sequential walk
+        page = 1
+        chunk = first
+        while len(chunk) >= per_page:
+            page += 1
+            chunk, _ = self._get_page(path, base, page, strict)
+            if not chunk:
+                break
+            out.extend(chunk)
+        return out
+
+    def get_by_ids(self, path: str, ids: Iterable[int], params: Optional[dict] = None,
+                   fields: Optional[Sequence[str]] = None, batch_size: int = 100,
+                   workers: int = WP_PAGE_WORKERS) -> Dict[int, dict]:
+        """
+        Load specific items with `include=` in id batches (<=100, WP per_page cap).
+        Used to fetch post bodies lazily for just the posts being analyzed.
+        Returns {id: item}; ids WP did not return are simply missing.
+        """
+        id_list = [int(i) for i in ids]
+        if not id_list:
+            return {}
+        if fields and "id" not in fields:
+            fields = ["id"] + list(fields)
+        batch_size = max(1, min(batch_size, 100))
+        batches = [id_list[i:i + batch_size] for i in range(0, len(id_list), batch_size)]
+
+        def _one(batch: List[int]) -> List[dict]:
+            q = dict(params or {})
+            q.update({"include": ",".join(str(i) for i in batch), "per_page": len(batch)})
+            return self.get_list(path, q, fields=fields)
+
+        out: Dict[int, dict] = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches)))) as ex:
+            for items in ex.map(_one, batches):
+                for it in items:
+                    if isinstance(it.get("id"), int):
+                        out[it["id"]] = it
+        return out
+
+    def post_json(self, path: str, payload: dict) -> dict:
+        return self.request("POST", path, json=payload).json()
+
+    def upload_media(self, file_bytes: bytes, filename: str, mime: str = "image/jpeg") -> int:
+        headers = {
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Content-Type": mime,
+        }
+        r = self.request("POST", "/wp-json/wp/v2/media", data=file_bytes, headers=headers)
+        j = r.json()
+        mid = j.get("id")
+        if not isinstance(mid, int):
+            print("UPLOAD response(head):", str(j)[:400])
+            raise SystemExit("Media upload did not return numeric id.")
+        return mid
+
+    # -------------------------
+    # updates (single / batch)
+    # -------------------------
+    def update_item(self, path: str, payload: dict) -> dict:
+        """
+        Update an existing item. WordPress usually takes POST for updates, some hosts
+        only PUT. The first update tries POST then PUT and remembers which one the
+        server accepted, so later updates never upload the payload twice.
+        """
+        if self._update_method:
+            return self.request(self._update_method, path, json=payload, check_json=False).json()
+        r = self.request("POST", path, json=payload, check_json=False, raise_for_status=False)
+        method = "POST"
+        if r.status_code >= 400:
+            r = self.request("PUT", path, json=payload, check_json=False, raise_for_status=False)
+            method = "PUT"
+        r.raise_for_status()
+        self._update_method = method
+        return r.json()
+
+    def batch_limit(self) -> int:
+        """
+        Max requests per /wp-json/batch/v1 call (WP >= 5.6), probed once per run.
+        0 means the batch API is missing or blocked -> use update_item().
+        """
+        if self._batch_limit is not None:
+            return self._batch_limit
+        limit = 0
+        try:
+            r = self.request("OPTIONS", "/wp-json/batch/v1", check_json=False, raise_for_status=False)
+            if r.status_code == 200 and "application/json" in (r.headers.get("content-type") or "").lower():
+                for ep in (r.json().get("endpoints") or []):
+                    max_items = ((ep.get("args") or {}).get("requests") or {}).get("maxItems")
+                    if isinstance(max_items, int):
+                        limit = max_items
+                        break
+        except (requests.RequestException, ValueError, AttributeError):
+            limit = 0
+        self._batch_limit = min(limit, WP_BATCH_MAX) if limit > 0 else 0
+        print(f"[HTTP] batch/v1 limit={self._batch_limit} (server={limit})")
+        return self._batch_limit
+
+    def batch(self, items: List[Tuple[str, str, dict]]) -> List[Tuple[int, Any]]:
+        """
+        Send (method, path, body) writes through /wp-json/batch/v1 in chunks of
+        batch_limit(). Paths are REST routes with or without the /wp-json prefix.
+        Returns [(status, body)] aligned with `items`; status 0 = no per-item result.
+        """
+        limit = self.batch_limit()
+        if limit <= 0:
+            raise RuntimeError("batch/v1 not available")
+        out: List[Tuple[int, Any]] = []
+        for i in range(0, len(items), limit):
+            chunk = items[i:i + limit]
+            reqs = []
+            for method, path, body in chunk:
+                route = path[len("/wp-json"):] if path.startswith("/wp-json/") else path
+                reqs.append({"method": method, "path": route, "body": body})
+            r = self.request("POST", "/wp-json/batch/v1",
+                             json={"validation": "normal", "requests": reqs},
+                             check_json=False, raise_for_status=False)
+            responses: List[Any] = []
+            try:
+                data = r.json()
+                if isinstance(data, dict):
+                    responses = data.get("responses") or []
+            except ValueError:
+                pass
+            for k in range(len(chunk)):
+                resp = responses[k] if k < len(responses) and isinstance(responses[k], dict) else {}
+                out.append((int(resp.get("status") or 0), resp.get("body")))
+        return out
+
+    # -------------------------
+    # connection stats
+    # -------------------------
+    def stats(self) -> Dict[str, int]:
+        """
+        Counted in request(): every request, and every socket seen for the first time
+        (a new connection); the difference is keep-alive reuse. urllib3 pool counters
+        are not used since the pool manager evicts host pools (and their counts).
+        """
+        with self._lock:
+            sent, opened = self.sent, self.opened
+            return {"requests": sent, "opened": opened, "reused": max(sent - opened, 0), "bytes_in": self.bytes_in}
+
+    def print_stats(self) -> None:
+        s = self.stats()
+        print(
+            f"[HTTP] requests={s['requests']} connections_opened={s['opened']} "
+            f"connections_reused={s['reused']} bytes_in={s['bytes_in']}"
+        )
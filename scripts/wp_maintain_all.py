@@ -11,12 +11,13 @@ import random
 from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict, Tuple
 
-import requests
-from requests.auth import HTTPBasicAuth
 from bs4 import BeautifulSoup
 from PIL import Image, ImageDraw, ImageFont
 from openai import OpenAI
 
+from wp_client import WPClient
+from wp_mirror import WPMirror
+
 
 # =========================
 # ENV
@@ -36,31 +37,21 @@ HEADER_TEXT = os.environ.get("HEADER_TEXT", "AI Tools · 2026")
 MIN_PLAIN_TEXT_LEN = int(os.environ.get("MIN_PLAIN_TEXT_LEN", "200"))
 BODY_IMAGE_COUNT = int(os.environ.get("BODY_IMAGE_COUNT", "3"))
 TIMEOUT = int(os.environ.get("HTTP_TIMEOUT", "30"))
+USE_MIRROR = os.environ.get("WP_MIRROR", "1").strip() != "0"
 
 if not (WP_BASE and WP_USER and WP_PASS):
     raise SystemExit("Missing env: WP_BASE, WP_USER, WP_PASS")
 
-auth = HTTPBasicAuth(WP_USER, WP_PASS)
+wp = WPClient(WP_BASE, WP_USER, WP_PASS, timeout=TIMEOUT)
+mirror = WPMirror(wp) if USE_MIRROR else None
 client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 
 
 # =========================
-# SAFE REQUEST WRAPPER
+# SAFE REQUEST WRAPPER (pooled via wp_client)
 # =========================
 def wp_get(path: str, params: Optional[dict] = None):
-    url = f"{WP_BASE}{path}"
-    headers = {
-        "Accept": "application/json"
-    }
-    r = requests.get(
-        url,
-        params=params or {},
-        headers=headers,
-        auth=auth,
-        timeout=TIMEOUT,
-    )
-    r.raise_for_status()
-    return r.json()
+    return wp.request("GET", path, params=params or {}, check_json=False).json()
 
 
 def wp_get_list(path: str, params: Optional[dict] = None):
@@ -69,87 +60,39 @@ def wp_get_list(path: str, params: Optional[dict] = None):
 
 
 def wp_post(path: str, payload: dict):
-    url = f"{WP_BASE}{path}"
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-    }
-    r = requests.post(
-        url,
-        json=payload,
-        headers=headers,
-        auth=auth,
-        timeout=TIMEOUT,
-    )
-    r.raise_for_status()
-    return r.json()
+    return wp.request("POST", path, json=payload, check_json=False).json()
 
 
 def wp_put(path: str, payload: dict):
-    url = f"{WP_BASE}{path}"
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-    }
-
-    # WordPress는 POST로 update 받는 경우 많음
-    r = requests.post(
-        url,
-        json=payload,
-        headers=headers,
-        auth=auth,
-        timeout=TIMEOUT,
-    )
-
-    if r.status_code >= 400:
-        r = requests.put(
-            url,
-            json=payload,
-            headers=headers,
-            auth=auth,
-            timeout=TIMEOUT,
-        )
-
-    r.raise_for_status()
-    return r.json()
+    # WordPress는 POST로 update 받는 경우 많음 (안 되면 PUT, 한 번 정해지면 run 내내 유지)
+    return wp.update_item(path, payload)
 
 
 # =========================
 # CATEGORY FETCH (safe pagination)
 # =========================
 def wp_get_categories() -> List[dict]:
-    cats = []
-    page = 1
-
-    while True:
-        chunk = wp_get_list(
-            "/wp-json/wp/v2/categories",
-            params={
-                "per_page": 100,
-                "page": page
-            }
-        )
-
-        if not chunk:
-            break
-
-        cats.extend(chunk)
+    if mirror:
+        return mirror.categories()
 
-        if len(chunk) < 100:
-            break
-
-        page += 1
-
-    return cats
+    # page 1의 X-WP-TotalPages 기준으로 나머지 페이지 병렬 로딩
+    return wp.get_all_pages("/wp-json/wp/v2/categories", fields=("id", "name", "slug"))
 
 
 # =========================
 # MAIN
 # =========================
 def main():
+    if mirror:
+        # 매일 도는 유지보수 잡이 미러를 최신으로 유지 (posts/categories/media)
+        mirror.sync()
+
     cats = wp_get_categories()
     print(f"Categories loaded: {len(cats)}")
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        wp.print_stats()
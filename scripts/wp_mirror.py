@@ -0,0 +1,393 @@
+"""
+Local SQLite mirror of WP posts (metadata only), categories and media.
+
+Every script used to re-list the same categories / recent posts / future posts / media
+from WP on each run. Instead each run does one incremental sync() and then queries
+the local DB:
+
+  - posts:      publish -> modified_after watermark (only changed rows come back)
+                           + an id-only listing (_fields=id) to drop posts that were
+                           trashed/unpublished/drafted since (they never show up as modified)
+                future  -> full re-list (small; catches scheduled posts that got
+                           published or unscheduled since the last sync)
+  - categories: full list (one request)
+  - media:      modified_after watermark
+
+Rows are keyed by id and only rewritten when modified_gmt changed, so the sync report
+("rows changed") reflects churn. Bodies (content.rendered) are never mirrored.
+
+File: $STATE_DIR/wp_mirror.sqlite (default state/wp_mirror.sqlite)
+
+Usage:
+  python scripts/wp_mirror.py sync        # incremental
+  python scripts/wp_mirror.py sync --full # drop watermarks, re-list everything
+
+Optional ENV:
+  STATE_DIR=state
+  MIRROR_PATH=            explicit sqlite path
+  MIRROR_OVERLAP_HOURS=24 modified_after look-back (WP compares in site-local time)
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+STATE_DIR = os.environ.get("STATE_DIR", "state").strip() or "state"
+MIRROR_PATH = os.environ.get("MIRROR_PATH", "").strip() or os.path.join(STATE_DIR, "wp_mirror.sqlite")
+MIRROR_OVERLAP_HOURS = int(os.environ.get("MIRROR_OVERLAP_HOURS", "24"))
+
+POST_FIELDS = ("id", "status", "date", "date_gmt", "modified_gmt", "slug", "link", "title",
+               "categories", "featured_media")
+CATEGORY_FIELDS = ("id", "name", "slug", "parent", "count")
+MEDIA_FIELDS = ("id", "date_gmt", "modified_gmt", "slug", "mime_type", "source_url")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL,
+    date TEXT,
+    date_gmt TEXT,
+    modified_gmt TEXT,
+    slug TEXT,
+    link TEXT,
+    title TEXT,
+    categories TEXT,
+    primary_cat INTEGER,
+    featured_media INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_posts_status_date ON posts(status, date);
+CREATE INDEX IF NOT EXISTS idx_posts_date_gmt ON posts(date_gmt);
+CREATE TABLE IF NOT EXISTS post_categories (
+    post_id INTEGER NOT NULL,
+    cat_id INTEGER NOT NULL,
+    PRIMARY KEY (post_id, cat_id)
+);
+CREATE INDEX IF NOT EXISTS idx_post_categories_cat ON post_categories(cat_id, post_id);
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    slug TEXT,
+    parent INTEGER,
+    count INTEGER
+);
+CREATE TABLE IF NOT EXISTS media (
+    id INTEGER PRIMARY KEY,
+    date_gmt TEXT,
+    modified_gmt TEXT,
+    slug TEXT,
+    mime_type TEXT,
+    source_url TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _rendered(v) -> str:
+    if isinstance(v, dict):
+        return v.get("rendered", "") or ""
+    return v or ""
+
+
+def _to_gmt(iso: str) -> str:
+    """ISO with offset -> naive UTC string comparable with WP *_gmt columns."""
+    dt = datetime.fromisoformat(iso.replace("Z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+class WPMirror:
+    def __init__(self, wp, path: str = MIRROR_PATH):
+        self.wp = wp
+        self.path = path
+        self._db = None
+        # 조회는 cluster 스테이지 워커 스레드에서도 온다 (sync/쿼리 모두 lock 안에서)
+        self._lock = threading.Lock()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # 첫 sync/조회 때 연다 (모듈 import만으로 state 파일을 만들지 않음)
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.row_factory = sqlite3.Row
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # -------------------------
+    # sync
+    # -------------------------
+    def _meta(self, key: str) -> Optional[str]:
+        row = self.db.execute("SELECT value FROM sync_meta WHERE key=?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def _set_meta(self, key: str, value: Optional[str]) -> None:
+        if value is None:
+            self.db.execute("DELETE FROM sync_meta WHERE key=?", (key,))
+        else:
+            self.db.execute("INSERT OR REPLACE INTO sync_meta(key, value) VALUES(?, ?)", (key, value))
+
+    def _since(self, key: str) -> Optional[str]:
+        wm = self._meta(key)
+        if not wm:
+            return None
+        dt = datetime.fromisoformat(wm) - timedelta(hours=MIRROR_OVERLAP_HOURS)
+        return dt.strftime("%Y-%m-%dT%H:%M:%S")
+
+    def _upsert_post(self, p: dict) -> bool:
+        pid = p.get("id")
+        if not isinstance(pid, int):
+            return False
+        row = self.db.execute("SELECT status, modified_gmt FROM posts WHERE id=?", (pid,)).fetchone()
+        status = p.get("status") or "publish"
+        if row and row["modified_gmt"] == p.get("modified_gmt") and row["status"] == status:
+            return False
+        cats = [c for c in (p.get("categories") or []) if isinstance(c, int)]
+        self.db.execute(
+            "INSERT OR REPLACE INTO posts(id, status, date, date_gmt, modified_gmt, slug, link, title,"
+            " categories, primary_cat, featured_media) VALUES(?,?,?,?,?,?,?,?,?,?,?)",
+            (
+                pid, status, p.get("date"), p.get("date_gmt"), p.get("modified_gmt"), p.get("slug"),
+                p.get("link"), _rendered(p.get("title")), json.dumps(cats),
+                cats[0] if cats else None, p.get("featured_media") or 0,
+            ),
+        )
+        self.db.execute("DELETE FROM post_categories WHERE post_id=?", (pid,))
+        self.db.executemany(
+            "INSERT OR IGNORE INTO post_categories(post_id, cat_id) VALUES(?, ?)",
+            [(pid, c) for c in cats],
+        )
+        return True
+
+    def _delete_posts(self, ids: Sequence[int]) -> int:
+        for pid in ids:
+            self.db.execute("DELETE FROM posts WHERE id=?", (pid,))
+            self.db.execute("DELETE FROM post_categories WHERE post_id=?", (pid,))
+        return len(ids)
+
+    def _sync_categories(self) -> int:
+        cats = self.wp.get_all_pages("/wp-json/wp/v2/categories", fields=CATEGORY_FIELDS)
+        changed = 0
+        seen: Set[int] = set()
+        for c in cats:
+            cid = c.get("id")
+            if not isinstance(cid, int):
+                continue
+            seen.add(cid)
+            new = (c.get("name", ""), c.get("slug", ""), c.get("parent") or 0, c.get("count") or 0)
+            row = self.db.execute("SELECT name, slug, parent, count FROM categories WHERE id=?", (cid,)).fetchone()
+            if row and tuple(row) == new:
+                continue
+            self.db.execute(
+                "INSERT OR REPLACE INTO categories(id, name, slug, parent, count) VALUES(?,?,?,?,?)",
+                (cid,) + new,
+            )
+            changed += 1
+        stale = [r["id"] for r in self.db.execute("SELECT id FROM categories") if r["id"] not in seen]
+        for cid in stale:
+            self.db.execute("DELETE FROM categories WHERE id=?", (cid,))
+        return changed + len(stale)
+
+    def _sync_published(self) -> int:
+        params = {"status": "publish", "orderby": "modified", "order": "asc"}
+        since = self._since("posts_publish_modified")
+        if since:
+            params["modified_after"] = since
+        items = self.wp.get_all_pages("/wp-json/wp/v2/posts", params, fields=POST_FIELDS)
+        changed = sum(1 for p in items if self._upsert_post(p))
+        if since:
+            # 발행 취소/휴지통/초안 전환은 modified_after에 안 잡힌다 -> id만 전체 조회해서 대조
+            ids = self.wp.get_all_pages("/wp-json/wp/v2/posts", {"status": "publish"}, fields=("id",))
+        else:
+            ids = items
+        # rows WP no longer lists as published were trashed/unpublished
+        live = {p["id"] for p in ids if isinstance(p.get("id"), int)}
+        stale = [r["id"] for r in self.db.execute("SELECT id FROM posts WHERE status='publish'") if r["id"] not in live]
+        changed += self._delete_posts(stale)
+        mods = [p.get("modified_gmt") for p in items if p.get("modified_gmt")]
+        prev = self._meta("posts_publish_modified")
+        if mods and (not prev or max(mods) > prev):
+            self._set_meta("posts_publish_modified", max(mods))
+        return changed
+
+    def _sync_future(self) -> int:
+        items = self.wp.get_all_pages(
+            "/wp-json/wp/v2/posts",
+            {"status": "future", "orderby": "date", "order": "asc"},
+            fields=POST_FIELDS,
+        )
+        changed = sum(1 for p in items if self._upsert_post(p))
+
+        # 예약글이 발행/취소되면 future 목록에서 빠진다 -> publish로 다시 조회, 없으면 삭제
+        live = {p["id"] for p in items if isinstance(p.get("id"), int)}
+        gone = [r["id"] for r in self.db.execute("SELECT id FROM posts WHERE status='future'") if r["id"] not in live]
+        if gone:
+            found = self.wp.get_by_ids("/wp-json/wp/v2/posts", gone, {"status": "publish"}, fields=POST_FIELDS)
+            for p in found.values():
+                if self._upsert_post(p):
+                    changed += 1
+            changed += self._delete_posts([i for i in gone if i not in found])
+        return changed
+
+    def _sync_media(self) -> int:
+        params = {"orderby": "modified", "order": "asc"}
+        since = self._since("media_modified")
+        if since:
+            params["modified_after"] = since
+        items = self.wp.get_all_pages("/wp-json/wp/v2/media", params, fields=MEDIA_FIELDS)
+        changed = 0
+        for m in items:
+            mid = m.get("id")
+            if not isinstance(mid, int):
+                continue
+            row = self.db.execute("SELECT modified_gmt FROM media WHERE id=?", (mid,)).fetchone()
+            if row and row["modified_gmt"] == m.get("modified_gmt"):
+                continue
+            self.db.execute(
+                "INSERT OR REPLACE INTO media(id, date_gmt, modified_gmt, slug, mime_type, source_url)"
+                " VALUES(?,?,?,?,?,?)",
+                (mid, m.get("date_gmt"), m.get("modified_gmt"), m.get("slug"), m.get("mime_type"),
+                 m.get("source_url", "")),
+            )
+            changed += 1
+        mods = [m.get("modified_gmt") for m in items if m.get("modified_gmt")]
+        prev = self._meta("media_modified")
+        if mods and (not prev or max(mods) > prev):
+            self._set_meta("media_modified", max(mods))
+        return changed
+
+    def sync(self, full: bool = False, media: bool = True) -> Dict[str, int]:
+        """Incremental sync; returns and prints rows changed + bytes transferred."""
+        before = self.wp.stats()
+        with self._lock:
+            if full:
+                self._set_meta("posts_publish_modified", None)
+                self._set_meta("media_modified", None)
+            report = {
+                "categories": self._sync_categories(),
+                "publish": self._sync_published(),
+                "future": self._sync_future(),
+                "media": self._sync_media() if media else 0,
+            }
+            self._set_meta("last_sync", datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"))
+            self.db.commit()
+        after = self.wp.stats()
+        report["requests"] = after["requests"] - before["requests"]
+        report["bytes"] = after["bytes_in"] - before["bytes_in"]
+        print(
+            f"[MIRROR] sync {'full' if full else 'incremental'} rows_changed="
+            f"cat:{report['categories']} publish:{report['publish']} future:{report['future']} "
+            f"media:{report['media']} requests={report['requests']} bytes={report['bytes']}"
+        )
+        return report
+
+    # -------------------------
+    # queries (local)
+    # -------------------------
+    @staticmethod
+    def _post(row: sqlite3.Row) -> dict:
+        """Row -> dict shaped like the WP REST post (title.rendered etc.)."""
+        return {
+            "id": row["id"],
+            "status": row["status"],
+            "date": row["date"],
+            "date_gmt": row["date_gmt"],
+            "modified_gmt": row["modified_gmt"],
+            "slug": row["slug"],
+            "link": row["link"],
+            "title": {"rendered": row["title"] or ""},
+            "categories": json.loads(row["categories"] or "[]"),
+            "featured_media": row["featured_media"],
+        }
+
+    def _rows(self, sql: str, args: Sequence = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self.db.execute(sql, tuple(args)).fetchall()
+
+    def categories(self) -> List[dict]:
+        rows = self._rows("SELECT id, name, slug, parent, count FROM categories ORDER BY id")
+        return [dict(r) for r in rows]
+
+    def category_map(self) -> Dict[int, str]:
+        return {r["id"]: r["name"] or "" for r in self._rows("SELECT id, name FROM categories")}
+
+    def recent_posts(self, statuses: Sequence[str] = ("publish", "future"), limit: int = 30) -> List[dict]:
+        marks = ",".join("?" for _ in statuses)
+        rows = self._rows(
+            f"SELECT * FROM posts WHERE status IN ({marks}) ORDER BY date DESC LIMIT ?",
+            (*statuses, limit),
+        )
+        return [self._post(r) for r in rows]
+
+    def recent_titles(self, status: str, limit: int = 50) -> List[Tuple[str, str]]:
+        """(date, title) newest first."""
+        rows = self._rows(
+            "SELECT date, title FROM posts WHERE status=? ORDER BY date DESC LIMIT ?", (status, limit)
+        )
+        return [(r["date"] or "", r["title"] or "") for r in rows]
+
+    def all_titles(self, statuses: Sequence[str] = ("publish", "future")) -> List[str]:
+        marks = ",".join("?" for _ in statuses)
+        rows = self._rows(f"SELECT title FROM posts WHERE status IN ({marks})", statuses)
+        return [r["title"] or "" for r in rows]
+
+    def future_posts(self, start_iso: Optional[str] = None, end_iso: Optional[str] = None) -> List[dict]:
+        sql = "SELECT * FROM posts WHERE status='future'"
+        args: List[str] = []
+        if start_iso:
+            sql += " AND date_gmt > ?"
+            args.append(_to_gmt(start_iso))
+        if end_iso:
+            sql += " AND date_gmt < ?"
+            args.append(_to_gmt(end_iso))
+        sql += " ORDER BY date ASC"
+        return [self._post(r) for r in self._rows(sql, args)]
+
+    def related_posts(self, cat_id: int, exclude_id: int, k: int) -> List[dict]:
+        rows = self._rows(
+            "SELECT p.* FROM post_categories pc JOIN posts p ON p.id = pc.post_id"
+            " WHERE pc.cat_id=? AND p.status='publish' AND p.id != ?"
+            " ORDER BY p.date DESC LIMIT ?",
+            (cat_id, exclude_id, k),
+        )
+        return [self._post(r) for r in rows]
+
+    def media_source_url(self, media_id: int) -> str:
+        rows = self._rows("SELECT source_url FROM media WHERE id=?", (media_id,))
+        return (rows[0]["source_url"] or "") if rows else ""
+
+
+def main(argv: List[str]) -> None:
+    if not argv or argv[0] != "sync":
+        raise SystemExit("usage: wp_mirror.py sync [--full]")
+    from wp_client import WPClient
+
+    base = os.environ.get("WP_BASE", "").rstrip("/")
+    user = os.environ.get("WP_USER", "")
+    password = os.environ.get("WP_PASS", "")
+    if not (base and user and password):
+        raise SystemExit("Missing env: WP_BASE, WP_USER, WP_PASS")
+    wp = WPClient(base, user, password, timeout=int(os.environ.get("HTTP_TIMEOUT", "30")))
+    mirror = WPMirror(wp)
+    try:
+        mirror.sync(full="--full" in argv[1:])
+    finally:
+        mirror.close()
+        wp.print_stats()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])